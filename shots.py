@@ -18,8 +18,19 @@
 
 import PySimpleGUI as sg
 import pandas as pd
-import csv, datetime, copy, configparser
+import numpy as np
+import csv, datetime, copy, configparser, hashlib, os, io, mmap, queue, threading, gzip, lzma, sqlite3, collections, base64, tempfile, subprocess
+import concurrent.futures, contextlib, argparse, getpass, sys
 from pathlib import Path
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM # optional, for encrypted outbreak files
+    from cryptography.exceptions import InvalidTag
+except ImportError:
+    AESGCM = None
+try:
+    from matplotlib.figure import Figure # optional, for chart images (plot, export and print)
+except ImportError:
+    Figure = None
 
 
 # TO PONDER
@@ -76,6 +87,7 @@ sg.theme(set_theme)
 # TODO (low priority)
 # Check if there are cli arguments
 # Argument 1 is file name. If it exists, load it (open); if not, create it (new).
+# (--report FOLDER is done, see Note on BATCH REPORTS and cli_arguments())
 
 # Set sane defaults
 shot = {}
@@ -411,20 +423,19 @@ def read_config_from(config_file):
     
     def register_unique_room(input_room_id):
         """
-        Sub function to make sure room IDs are unique.
-        Many buildings in Norway have room 101 (first floor, second room..), so we need something more unique.
-        Format is: <hospital>_<building>_<room_identifier>
-        Each room entry is a dictionary containing status, department and building.
+        Sub function adding a room to its building or department list.
+        Many buildings in Norway have room 101 (first floor, second room..), so we need something more unique:
+        once all rooms are read, each gets an entry by unique room id (see register_unique_rooms()).
         """
         hospital[hospital_id][hosp_element][subsect].append(int(input_room_id)) # single room (not a range), add directly        
-        unique_room_id = (str(hospital_id), str(subsect), str(input_room_id))
-        unique_room_id = '_'.join(unique_room_id) # creates something like: 'MadeUp Hospital_Main building_115'
-        try:
-            hospital[hospital_id][unique_room_id]
-        except:
-            hospital[hospital_id][unique_room_id] = {}
-            hospital[hospital_id][unique_room_id]['status'] = None
-        hospital[hospital_id][unique_room_id][hosp_element] = subsect # this will add both deps and buildings to room_id dict
+    
+    def register_unique_rooms():
+        """
+        Sub function to make sure room IDs are unique. Format is: <hospital>_<building>_<room_identifier> (see hospital_room_ids())
+        e.g. 'MadeUp Hospital_Main building_115'. Each room entry is a dictionary containing status, department and building.
+        """
+        for unique_room_id, (room_departments, room_buildings) in hospital_room_ids(hospital[hospital_id]).items():
+            hospital[hospital_id][unique_room_id] = { 'status': None, 'dep': min(room_departments, default=None), 'bld': min(room_buildings, default=None) }
     
     
     for hospital_id in config.sections():
@@ -475,6 +486,9 @@ def read_config_from(config_file):
                                     for room_x in range(int(rep_beg), int(rep_end)+1): register_unique_room(room_x)  # add single room derived from range ^
                                 except:
                                     continue # in case there's garbage in the file, we won't add it
+                
+                # Rooms of departments are placed in buildings like the rooms of cases (see unique_room_ids()), so all rooms first
+                register_unique_rooms()
     
     
     
@@ -888,6 +902,14 @@ def get_status_line(**kwargs): # TODO this does not work ..
     elif event == 'Save':
         if ofile is None: return shot['status_saving'] # ? saved None file...?
         return f"{shot['status_saved']} {ofile}"
+    elif event == 'Saving':
+        # status(s=Saving,f=<myfile>) will return Saving <file name> .. (save still running on the writer thread)
+        return f"{shot['status_saving']} {ofile} .."
+    elif event == 'Import':
+        # status(s=Import,f=<myfile>,n=<rows>) will return Importing <file name> (<rows>)
+        rows = kwargs.get('n', None)
+        if rows is None: return f"{shot['status_importing']} {ofile}"
+        return f"{shot['status_importing']} {ofile} ({rows})"
 
 
 # Show error popup
@@ -1325,20 +1347,22 @@ def popup_show_hospital_info(**kwargs):
             """
             Provide an overview of current contamination status
             Note: Subject to removal. This is DATA and not CONFIG. This should be in Overview tab.
+            Read from the hospital's heatmap cell (see Note on HEATMAP), so the rooms are not rescanned on every event.
             """
+            hospital_cell = room_heatmap['cells'][('hospital', '')]
             if outbreak_filename is None:
                 rooms_with_deviating_status = []
                 est_contaminated_rooms_int = 'N/A'
                 est_contaminated_rooms_per = 'no data'
             else:
-                if rooms_in_total == 0:
+                if hospital_cell['rooms'] == 0:
                     rooms_with_deviating_status = []
                     est_contaminated_rooms_int = 0
                     est_contaminated_rooms_per = '0.0%'
                 else:
-                    rooms_with_deviating_status = [ x[0] for x in hospital_info.items() if len(str(x)) > 4 and x[1]['status'] != None ] # grab unique rooms with status != None
-                    est_contaminated_rooms_int = len(rooms_with_deviating_status)
-                    est_contaminated_rooms_per = f"{(est_contaminated_rooms_int/rooms_in_total)*100:0.1f}%"
+                    rooms_with_deviating_status = list(room_heatmap['contaminated']) # unique rooms with status != None, or cases
+                    est_contaminated_rooms_int = hospital_cell['contaminated']
+                    est_contaminated_rooms_per = f"{(est_contaminated_rooms_int/hospital_cell['rooms'])*100:0.1f}%"
             return rooms_with_deviating_status, est_contaminated_rooms_int, est_contaminated_rooms_per
         
         def quick_room_coverage(rooms_in_total):
@@ -1518,6 +1542,8 @@ def popup_show_hospital_info(**kwargs):
         
         
         # Do estimate of infected rooms
+        # Works on a copy of the configured hospital's heatmap (see get_room_heatmap()), handed back when the hospital is saved
+        room_heatmap = build_room_heatmap(hospital_info) if create_new else copy.deepcopy(get_room_heatmap())
         rooms_with_deviating_status, est_contaminated_rooms_int, est_contaminated_rooms_per = quick_estimate_infected_rooms()
 
         
@@ -1535,8 +1561,8 @@ def popup_show_hospital_info(**kwargs):
         
         # Rooms
         table_rooms = [
-                       [sg.T(f"{shot['msg_hospital_rooms_contaminated']}:", size=tsize_cont), sg.T(f"{est_contaminated_rooms_int} ({est_contaminated_rooms_per})", size=tsize_titl), sg.T(' ', size=tsize_titl), sg.T(' ', size=tsize_cont)],
-                       [sg.T(' ', size=tsize_cont), sg.Button(shot['msg_hospital_rooms_add'], key='add_rooms_button', disabled=add_rooms_disabled), sg.Button(shot['settings_hospital_rooms'], key='view_rooms_button', disabled=view_room_disabled)]
+                       [sg.T(f"{shot['msg_hospital_rooms_contaminated']}:", size=tsize_cont), sg.T(f"{est_contaminated_rooms_int} ({est_contaminated_rooms_per})", size=tsize_titl, key='rooms_contaminated'), sg.T(' ', size=tsize_titl), sg.T(' ', size=tsize_cont)],
+                       [sg.T(' ', size=tsize_cont), sg.Button(shot['msg_hospital_rooms_add'], key='add_rooms_button', disabled=add_rooms_disabled), sg.Button(shot['settings_hospital_rooms'], key='view_rooms_button', disabled=view_room_disabled), sg.Button(shot['msg_hospital_room_status'], key='room_status_button', disabled=view_room_disabled)]
                        ]
         
         
@@ -1588,6 +1614,7 @@ def popup_show_hospital_info(**kwargs):
             manage_hospital_win['bld_view_list'].Update(disabled=view_blds_disabled)
             manage_hospital_win['dep_view_list'].Update(disabled=view_deps_disabled)    
             manage_hospital_win['view_rooms_button'].Update(disabled=view_room_disabled)
+            manage_hospital_win['room_status_button'].Update(disabled=view_room_disabled)
             manage_hospital_win['add_rooms_button'].Update(disabled=add_rooms_disabled)
              
             
@@ -1691,12 +1718,18 @@ def popup_show_hospital_info(**kwargs):
                         hospital_info[unique_room_id]['status'] = None
                         hospital_info[unique_room_id]['bld'] = None if len(room_bld) == 0 else room_bld
                         hospital_info[unique_room_id]['dep'] = None if len(room_dep) == 0 else room_dep
+                        set_heatmap_room(room_heatmap, unique_room_id, status=None, bld=hospital_info[unique_room_id]['bld'], dep=hospital_info[unique_room_id]['dep'])
                     
                     sg.popup(f"{len(room_ids)} {shot['msg_hospital_room_added'].lower()}", title=shot['msg_hospital_rooms_add'], keep_on_top=True)
                 elif len(skipped_rooms) > 0:
                     popup_some_error(f"0 {shot['msg_hospital_room_added'].lower()}.\n{shot['msg_couldnotadd'].capitalize()} {len(skipped_rooms)} {shot['msg_hospital_rooms'].lower()}")
                     print(f"Error: skipped rooms = {skipped_rooms}\nCould not add these :(")
                 
+            elif hosp_info_event == 'room_status_button':
+                new_room_status = popup_room_status(hospital_info)
+                if new_room_status is not None:
+                    set_room_status(*new_room_status, hospital_info=hospital_info, heatmap=room_heatmap)
+                    changes_were_made = True
             elif hosp_info_event == button_doit:
                 if number_of_departments == 0 and number_of_buildings == 0:
                     popup_some_error(f"{shot['msg_hospital_no_buildings']}\n{shot['msg_hospital_no_departments']}\n{shot['msg_hospital_rooms_req']}")
@@ -1758,6 +1791,7 @@ def popup_show_hospital_info(**kwargs):
             manage_hospital_win['bld_line_conts_int'].update(value=number_of_rooms_in_buildings)
             manage_hospital_win['dep_line_conts'].update(value=room_coverage[1])
             manage_hospital_win['dep_line_conts_int'].update(value=number_of_rooms_in_departments)
+            manage_hospital_win['rooms_contaminated'].update(value=f"{est_contaminated_rooms_int} ({est_contaminated_rooms_per})")
             
             
         manage_hospital_win.close()
@@ -1796,6 +1830,8 @@ def popup_show_hospital_info(**kwargs):
             
             # Save hospital information to dict using copy
             shot['hospital'] = copy.deepcopy(hospital_info)
+            shot['epicurve_cube'] = shot['epicurve_cube_rooms'] = None # rooms may have moved (see Note on EPICURVE)
+            shot['chart_images'] = collections.OrderedDict() # so may the buildings in them (see Note on CHART IMAGES)
 
             # Save meta data too
             try:
@@ -1814,6 +1850,7 @@ def popup_show_hospital_info(**kwargs):
             
             # Set configured hospital
             shot['conf_hosp'] = hospital_name
+            shot['heatmap'] = (hospital_topology_key(), room_heatmap, None) # kept up to date above, cases are recounted on use
             
             
             # Debug messages
@@ -2106,329 +2143,4149 @@ def new_outbreak_file():
         
 
     
-def open_outbreak_file():
+def set_outbreak_headers():
     """
-    Back-end function that takes care of opening file and creating the dicts
-    Destructive: User has already chosen to open (and not been/ignored prompt to save any open stuff
-                 so we can relatively safely overwrite the dicts below.
+    Sets the record layouts of outbreak CSV files in shot['headers']
+    The first field of each layout is the rec_type column, so its name is also the rec_type value of that record.
+    shot['rec_types'] maps rec_type value => (shot dict the record is stored in, layout in shot['headers'])
     """
     
-    shot['data'] = {}
-    shot['events'] = {}
-    shot['tseries'] = {}
-    shot['admin'] = {}
-    shot['hospital'] = {}
-
-#                                       len(shot['hospital']['building'])
-#                                                     |
-#                                                     |     len(shot['hospital']['department'])
-#                                                     |                     |               
-#                                                     |                     |        len(shot['hospital']['room'])  
-#                                                     |                     |               |
-#                                                     v                     v               v
-#   shot['hospital'] = {'name': <str>, 'buildings': <int>, 'departments': <int>, 'rooms': <int>, room: <dict>}
-#
-#   shot['hospital']['room'] = []
-#   shot['hospital']['room'] = [<id-str>,<name-str>,<building>,<dep>,
-#       
-        # hospital: buildings, dept, room
-    
-#    shot['rooms'] = {}
-    
-    
     # Headers
     # Note: tstamps values are always automatic timestamps of when record was created (or changed).
     shot['headers'] = {}
-    shot['headers']['generic'] = ['rec_type', 'col_1', 'col_2', 'col_3', 'col_4', 'col_5', 'col_6', 'col_7', 'col_8', 'col_9', 'col_10', 'col_11', 'col_12', 'col_13', 'col_14', 'col_15', 'col_16', 'col_17', 'col_18', 'col_19']
-    
-    # TODO This ^ is ludicrious, get rid of it.
-    # The entire point of this excercise is to use csv.DictReader's ability to _set headers manually_, so we can assert one of the groups (below) based on rectyp column.
-    #
-    # e.g.
-    # example_reader = csv.DictReader(input_file, ['my', 'manually', 'asserted', 'headers'])
-    # for row in example_reader:
-    #   print(row['my'], row['asserted'], 'headers']) etc.
-    #
-    # because 'asserted' field might not be pertinent for this rec_type. etc.
     
+    # The 'generic' header is the first row of any outbreak CSV file (see outbreak_file_sanity_pass())
+    # It just names the columns, the actual layout of a row is asserted by its rec_type column.
+    # This is why we use csv.reader and zip() each row with one of the groups below, instead of csv.DictReader.
+    shot['headers']['generic'] = ['rec_type'] + [ f'col{n}' for n in range(20) ]
     
-    
-    shot['headers']['outbreak'] = ['shot_user', 'shot_version', 'tstamp', 'title', 'hospital', 'start', 'end', 'infection type', 'incubation start', 'incubation end', 'incubation mid', 'sample_types' ]
+    shot['headers']['outbreak'] = ['outbreak', 'shot_user', 'shot_version', 'tstamp', 'title', 'hospital', 'start', 'end', 'infection type', 'incubation start', 'incubation end', 'incubation mid', 'sample_types' ]
     shot['headers']['data'] = ['data', 'author', 'tstamp', 'ch_auth', 'ch_tstamp', 'sample_date', 'sample_type', 'fnr', 'lastname', 'firstname', 'DOB', 'age', 'gender', 'fam_kode', 'role', 'department', 'team', 'room', 'bed', 'spa-type', 'risks']
     shot['headers']['events'] = ['event', 'author', 'tstamp', 'ch_auth', 'ch_tstamp', 'date', 'title', 'contents']
     shot['headers']['tseries'] = ['time series', 'author', 'tstamp', 'ch_auth', 'ch_tstamp', 'title', 'start', 'end', 'details' ]
     
-       
-    global outbreak_filename
-    
-    outbreak_file = open(outbreak_filename)
-    outbreak_reader = csv.DictReader(outbreak_file, delimiter=';')
-
-#    for row in outbreak_reader:
-        
+    # rec_type => (target, layout)
+    shot['rec_types'] = {
+                        'outbreak': ('admin', 'outbreak'),
+                        'data': ('data', 'data'),
+                        'event': ('events', 'events'),
+                        'time series': ('tseries', 'tseries')
+                        }
     
-    outbreak_file.close()
+    # Column types of the linelist (shot['data'] is a pandas DataFrame, see linelist_from_rows())
+    # Columns not listed here are kept as strings (e.g. fnr, which has leading zeroes).
+    shot['dtypes'] = {}
+    shot['dtypes']['data'] = {
+                             'sample_date': 'datetime64[ns]',
+                             'DOB': 'datetime64[ns]',
+                             'age': 'Int16',
+                             'sample_type': 'category',
+                             'gender': 'category',
+                             'role': 'category',
+                             'department': 'category',
+                             'team': 'category',
+                             'room': 'category',
+                             'bed': 'category'
+                             }
+
+
+def linelist_from_rows(rows):
+    """
+    Creates the columnar linelist from a list of data rows (lists of strings, without the rec_type column)
+    Returns a pandas DataFrame with one column per field in shot['headers']['data'] (except rec_type),
+    typed according to shot['dtypes']['data'] (see linelist_set_types()).
+    """
     
+    linelist_fields = shot['headers']['data'][1:]
+    linelist = pd.DataFrame(rows, columns=linelist_fields) if rows else pd.DataFrame({ field: [] for field in linelist_fields }, dtype=object)
+    return linelist_set_types(linelist)
 
 
-def outbreak_file_sanity_pass(my_outbreak_file):
+# Date formats of linelist dates, tried in order: ISO (outbreak files) and DD.MM.YYYY (Norwegian lab and Excel exports)
+# Every value is parsed with these, so the format of one row (or chunk) is never guessed from another.
+linelist_date_formats = ('%Y-%m-%d', '%d.%m.%Y')
+
+
+def parse_linelist_dates(values):
     """
-    Collection of sanity checks of outbreak files run before loading and saving csv files
-    Returns bool. Only True iff all required checks pass.
+    Returns values (Series of str, NaN if missing) as datetime64 Series, using the first of linelist_date_formats that fits each value
+    Values that fit none are NaT, like missing ones (see linelist_set_types() to tell them apart).
+    """
+    values = values.str.strip()
+    dates = pd.to_datetime(values, format=linelist_date_formats[0], errors='coerce')
+    for date_format in linelist_date_formats[1:]:
+        dates = dates.fillna(pd.to_datetime(values.where(dates.isna()), format=date_format, errors='coerce'))
+    return dates
+
+
+def linelist_set_types(linelist):
+    """
+    Sets the column types of a linelist DataFrame of strings (all fields of shot['headers']['data'] except rec_type)
+    according to shot['dtypes']['data']: dates as datetime64, ages as small ints and categorical locations/roles.
+    Empty strings in typed columns become missing values (NaT, <NA> or NaN). Returns the (same) DataFrame.
     """
     
-    # Convert str to path
-    # TODO latest python does not require string object for Path
-    if my_outbreak_file is None:
-        return False
-    else:
-        try:
-            my_outbreak_file = Path(str(my_outbreak_file))
-        except:
-            try:
-                my_outbreak_file = Path(my_outbreak_file) # might be useful for newer pythons..?
-            except:
-                popup_some_error(f"{shot['err_weird_data_string']}")
-                return False
+    for column, dtype in shot['dtypes']['data'].items():
+        values = linelist[column].where(linelist[column] != '') # '' => NaN
+        if dtype.startswith('datetime64'):
+            linelist[column] = parse_linelist_dates(values).astype(dtype)
+        elif dtype == 'Int16':
+            linelist[column] = pd.to_numeric(values, errors='coerce').round().astype(dtype)
+        else:
+            linelist[column] = values.astype(dtype)
     
+    # fill remaining (string) columns so they are never None
+    string_fields = [ field for field in linelist.columns if field not in shot['dtypes']['data'] ]
+    linelist[string_fields] = linelist[string_fields].fillna('')
+    
+    return linelist
 
-    # TODO
-    # Check that file is not open/locked + perm
+
+def read_outbreak_records(outbreak_file):
+    """
+    Single pass streaming reader for outbreak CSV files.
+    Takes an open (text mode) file object and reads it once, row by row.
+    Each row is sent by its rec_type into its target dict using the layout in shot['headers'].
+    Data rows (cases) are collected as plain lists and turned into the columnar linelist at the end (see linelist_from_rows()).
+    Returns dict {'admin': {}, 'data': <DataFrame>, 'events': {}, 'tseries': {}, 'skipped': <int>} where dict records are keyed by running number,
+    or None if the header row is not an outbreak file header.
+    """
     
+    records = { target: {} for target, layout in shot['rec_types'].values() }
+    skipped = 0
     
-    # Note to self:
-    # Path has an OPEN and a READ command
-    #
-    # |  open(self, mode='r', buffering=-1, encoding=None, errors=None, newline=None)
-    # |  Open the file pointed by this path and return a file object, as
-    # |  the built-in open() function does.
-    #
-    # |  read_text(self, encoding=None, errors=None)
-    # |  Open the file in text mode, read it, and close the file.
-    # 
-    # TODO I am not sure whether to use open() or Path.open(). Must educate self.
+    # rec_type => (dict to store in, field names)
+    # looked up once per row, so we avoid any per-row string comparisons
+    routes = { rec_type: (records[target], shot['headers'][layout]) for rec_type, (target, layout) in shot['rec_types'].items() if target != 'data' }
     
+    # Cases are not stored as dicts (see linelist_from_rows())
+    linelist_rows = []
+    linelist_rec_type = shot['headers']['data'][0]
+    linelist_width = len(shot['headers']['data'])
     
+    outbreak_reader = csv.reader(outbreak_file, delimiter=';')
     
-    # Sanity checks
-    # Note: Using readline() solved all my CSV sniffer problems. Use instead of read(1024) in docs.
-    if my_outbreak_file.is_file():
-        test_outbreak_file = open(my_outbreak_file,'r')
-        #test_outbreakf = test_outbreak_file.read(9999) # .sniff(csvfile.read(1024),delimiters=',"')
-        #dialect = csv.Sniffer().sniff(test_outbreak_file.readline())
-        test_outbreak_file.seek(0)
-        
-        if csv.Sniffer().sniff(test_outbreak_file.readline()).delimiter == ";":
-            print('file has delim') # debug
-            
-            if csv.Sniffer().has_header(test_outbreak_file.readline()):
-                print('file has headers')  # debug
-                
-                test_first_row = []
-                test_outbreak_file.seek(0) # re-set reader
-                for row in csv.reader(test_outbreak_file, delimiter = ";"):
-                    test_first_row.append(row)
-                    break
-                
-                if (test_first_row[0][0] == 'rec_type') and (test_first_row[0][1] == 'col0') and (test_first_row[0][2] == 'col1'):
-                    test_outbreak_file.close()
-                    print('OK format') # debug
-                    return True
-                else:
-                    popup_some_error(shot['err_wrong_data_format'])
+    # First row is the generic header
+    header_row = next(outbreak_reader, None)
+    if header_row is None or header_row[:3] != shot['headers']['generic'][:3]:
+        return None
+    
+    for row in outbreak_reader:
+        try:
+            target, fields = routes[row[0]]
+        except (KeyError, IndexError):
+            if row and row[0] == linelist_rec_type:
+                linelist_rows.append(row[1:linelist_width])
             else:
-                popup_some_error(shot['err_no_headers'])
-        else:
-            popup_some_error(shot['err_incorrect_delim'])
-    else:
-        popup_some_error(shot['err_input_notafile'])
-        
-        
-    # close file and leave function
-    test_outbreak_file.close()
-    return False
+                skipped += 1 # empty line or unknown rec_type
+            continue
+        target[len(target)] = dict(zip(fields, row))
+    
+    records['data'] = linelist_from_rows(linelist_rows)
+    records['skipped'] = skipped
+    return records
 
-# File Open popup
-def popup_open_outbreak_file():
+
+# Note on the RECORD INDEX
+# Large outbreak files (years of regional surveillance) are not read into Python objects when opened.
+# Instead, the file is memory-mapped and we keep an index of where each record starts and ends (byte offsets).
+# Admin, event and time series records are few and decoded right away, but cases are only decoded when needed,
+# see get_linelist() (all cases) and get_linelist_rows() (e.g. one page of the linelist view).
+# The index is stored next to the outbreak file, e.g. my_outbreak.csv.idx (numpy .npz file), and rebuilt whenever
+# it does not match the fingerprint of the outbreak file (see outbreak_file_fingerprint()).
+
+def index_filename(my_outbreak_file):
     """
-    graphical user interface part of locating and opening files.
-    'if popup_open_outbreak_file():' conditional will return True if file is sane.
-    returns bool: True if file open success. (If True, set outbreak_filename global to input).
+    Returns Path of the record index belonging to my_outbreak_file
     """
-    
-    # This is weird but it works
-    my_outbreak_file = sg.popup_get_file(shot['file_open'], title=shot['file_open'], save_as=False, multiple_files=False, file_types=(('Outbreak CSV', '*.csv'),), no_window=True, keep_on_top=True)
+    return Path(f"{my_outbreak_file}.idx")
 
-    if type(my_outbreak_file) is str and my_outbreak_file != '':
-            print(f'my_outbreak_file={my_outbreak_file}') # debug
-            print(f'type(my_outbreak_file)={type(my_outbreak_file)}') # debug
-    else:
-        # User clicked cancel
-        # bugfix Cancel op: sg.popup_get_file returns tuple
-        # bugfix cancel x2: 2nd time the sg.popup_get_file which normally is tuple returns empty string
-        return False
-    
-    # set global filename var
-    global outbreak_filename
 
-    # sanity check
-    if outbreak_file_sanity_pass(my_outbreak_file):
-        outbreak_filename = my_outbreak_file
-        return True
-    else:
-        outbreak_filename = None
-        return False
+def build_outbreak_index(outbreak_map):
+    """
+    Builds the byte-offset record index of a memory-mapped outbreak file (vectorized, no per-line Python)
+    A record starts at a line beginning with a known rec_type and ends where the next record starts,
+    so quoted fields containing line breaks stay inside their record.
+    Returns dict {'starts': <int64 array>, 'ends': <int64 array>, 'rec_type': <int8 array>}
+    where rec_type is the position of the record's rec_type in shot['rec_types'].
+    """
+    file_bytes = np.frombuffer(outbreak_map, dtype=np.uint8)
+    line_starts = np.concatenate(([0], np.flatnonzero(file_bytes == ord('\n')) + 1))
+    line_starts = line_starts[line_starts < len(file_bytes)]
     
+    line_rec_types = np.full(len(line_starts), -1, dtype=np.int8)
+    for code, rec_type in enumerate(shot['rec_types']):
+        prefix = f"{rec_type};".encode('utf-8')
+        is_match = line_starts + len(prefix) <= len(file_bytes)
+        for offset, prefix_byte in enumerate(prefix):
+            is_match[is_match] = file_bytes[line_starts[is_match] + offset] == prefix_byte
+        line_rec_types[is_match] = code
+    
+    is_record = line_rec_types >= 0
+    record_starts = line_starts[is_record].astype(np.int64)
+    record_ends = np.append(record_starts[1:], len(file_bytes)).astype(np.int64)
+    return {'starts': record_starts, 'ends': record_ends, 'rec_type': line_rec_types[is_record]}
 
 
-# Main Tabs
-# With the exception of welcome tab, all tabs' visibility/active state is conditional
-# All tab functions _return a list_ for PySGUI
-
-# Tab 0: welcome
-def tab_welcome(outbreak_filename):
+def load_outbreak_index(my_outbreak_file, outbreak_map):
     """
-    Returns list containing Welcome tab contents. Content is conditional on file being loaded.
+    Returns the record index of my_outbreak_file, read from its .idx file if still valid.
+    Otherwise the index is built and the .idx file (re)written, if possible.
     """
+    fingerprint = outbreak_file_fingerprint(my_outbreak_file)
+    my_index_file = index_filename(my_outbreak_file)
     
-    welcome_tab_spacer = ' ' * 500 # This is a workaround to avoid having an inner tab frame being smaller than the tab size.
-    
-    if outbreak_filename is None:
-        welcome_tab_filename = shot['msg_no_file_loaded']
-        welcome_tab_loadfile = f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}"
-        welcome_tab_user_key = ' ' * ( len(shot['msg_user']) + 3 )
-        welcome_tab_username = ' ' * 120
-    else:
-        welcome_tab_filename = outbreak_filename
-        welcome_tab_loadfile = shot['msg_file_loaded_ok']
-        welcome_tab_user_key = f"{shot['msg_user']}: "
-        welcome_tab_username = 'user-name-string-here' # TODO: change to shot['username']
-        
+    try:
+        with np.load(my_index_file, allow_pickle=False) as stored_index:
+            if str(stored_index['fingerprint']) == fingerprint:
+                return { key: stored_index[key] for key in ('starts', 'ends', 'rec_type') }
+    except (OSError, KeyError, ValueError):
+        pass # no index (or garbage), build it below
     
-    # TODO
-    shot['version'] = "0.01 alpha" # TODO set dict_version from global string atop
-    my_welcome_tab = [[sg.T(welcome_tab_spacer)],
-                      [sg.Image(filename=None, data=shot['icon_logo'], size=(120,120), pad=(2,2)), sg.T(f"Simple Hospital Outbreak Tracker\nA Free and Open Source Public Health Software Project\nCopyright (C) 2020, GNU GPL v.3. Version: {shot['version']}", font=('Sans serif', 16))],
-                      [sg.T(f"\n{shot['tab']['tip']['welcome']}\n")],
-                      [sg.T(welcome_tab_user_key, key='welcome_tab_username_infokey'), sg.T(welcome_tab_username, key='welcome_tab_username_infoval')],
-                      [sg.T(f"{shot['file_file']}: "), sg.InputText(welcome_tab_filename, key='welcome_tab_file_loaded_infobar', size=(75,1), background_color=None, enable_events=True, disabled=True)],
-                      [sg.T(welcome_tab_loadfile, key='welcome_tab_file_loaded_ok')],
-                      [sg.T(' '), sg.In(' ', visible=False, key=f"+{shot['icon_key_open']}+")],
-                      [sg.Button(shot['icon_new_str'], key=f"-{shot['icon_key_new']}-", size=(24,3), font=("Helvetica", 16)), sg.Button(shot['icon_open_str'], key=f"-{shot['icon_key_open']}-", size=(24,3), font=("Helvetica", 16))],
-                      [sg.T(' \n')]
-                      ]                          
+    outbreak_index = build_outbreak_index(outbreak_map)
+    try:
+        with open(my_index_file, 'wb') as index_file:
+            np.savez(index_file, fingerprint=np.array(fingerprint), **outbreak_index)
+    except OSError:
+        print(f"could not write {my_index_file}") # debug (e.g. read-only share), we'll just rebuild next time
+    return outbreak_index
 
-    return my_welcome_tab
-    
 
-# Tab 1: outbreak
-def tab_outbreak():
-    pass
+def decode_outbreak_records(positions, outbreak_map=None, outbreak_index=None):
+    """
+    Decodes records at positions (array of positions in shot['index']) from the memory-mapped outbreak file
+    Returns list of rows (lists of strings, including the rec_type column) in the order of positions
+    A record's bytes run up to the next record, so they may end with empty lines or lines of unknown rec_type.
+    Those are skipped, as read_outbreak_records() does, so each position gives exactly one row.
+    Set outbreak_map and outbreak_index to decode from a file that is not loaded (yet) instead of shot['mmap'].
+    """
+    if outbreak_map is None: outbreak_map, outbreak_index = shot['mmap'], shot['index']
+    starts = outbreak_index['starts'][positions]
+    ends = outbreak_index['ends'][positions]
+    record_bytes = [ outbreak_map[start:end] for start, end in zip(starts, ends) ]
+    record_bytes = b''.join( record if record.endswith(b'\n') else record + b'\n' for record in record_bytes )
+    return [ row for row in csv.reader(io.StringIO(record_bytes.decode('utf-8'), newline=''), delimiter=';') if row and row[0] in shot['rec_types'] ]
+
+
+def open_outbreak_map(my_outbreak_file):
+    """
+    Lazy variant of reading the outbreak file, used by open_outbreak_file() for large files.
+    Memory-maps my_outbreak_file and loads its record index (shot['mmap'] and shot['index']).
+    Admin, event and time series records are decoded into their dicts, cases stay in the file (shot['data'] is None).
+    Returns bool (False if the header row is not an outbreak file header, the loaded outbreak is left as it was then)
+    Raises OSError or ValueError (e.g. not UTF-8) if the file cannot be read, the loaded outbreak is left as it was then too.
+    """
+    with open(my_outbreak_file, 'rb') as outbreak_file:
+        header_row = next(csv.reader([outbreak_file.readline().decode('utf-8')], delimiter=';'), [])
+        if header_row[:3] != shot['headers']['generic'][:3]:
+            return False
+        outbreak_map = mmap.mmap(outbreak_file.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    # Everything is read before anything is loaded, so a file that fails halfway does not leave a mix of two outbreaks
+    records = {}
+    try:
+        outbreak_index = load_outbreak_index(my_outbreak_file, outbreak_map)
+        for code, (rec_type, (target, layout)) in enumerate(shot['rec_types'].items()):
+            positions = np.flatnonzero(outbreak_index['rec_type'] == code)
+            if target == 'data':
+                records['data_positions'] = positions # decoded by get_linelist()
+            else:
+                fields = shot['headers'][layout]
+                records[target] = { key: dict(zip(fields, row)) for key, row in enumerate(decode_outbreak_records(positions, outbreak_map, outbreak_index)) }
+    except BaseException:
+        outbreak_map.close()
+        raise
     
+    close_outbreak_map(decode=False)
+    shot.update(records)
+    shot['mmap'] = outbreak_map
+    shot['index'] = outbreak_index
+    shot['data'] = None
+    return True
 
-def tab_epicurve():
-    pass
 
+def close_outbreak_map(decode=True):
+    """
+    Closes the memory-mapped outbreak file (if any). Cases not decoded yet are decoded first.
+    Must be done before the outbreak file is rewritten.
+    Set decode=False when the loaded records are about to be replaced anyway (opening another file), so nothing is decoded.
+    """
+    if shot.get('mmap') is None:
+        return
+    if decode: get_linelist()
+    shot['mmap'].close()
+    shot['mmap'] = None
+    shot['index'] = None
 
-            # # if filename not None
-            # # display 1 tab: "Welcome"
-            # # This tab shows 2 buttons (New and Open)
-            # # When new and open leads to verified file => 3 more tabs become accessible: Overview | Linelist | Epicurve
-            # # So that the tab-line becomes
-            # #
-            # # Welcome | Overview | Linelist | Epicurve
-            # # Welcome | Outbreak | Linelist | Epicurve
-            # # Velkommen | Utbrudd | Tilfeller | Epikurve
-            
-            
-        
-    
-    
-    # if self.content_type == 'table':
-        # self.table_data = []
-        
-        # if self.frame_title == 'overview':
-            # # Read data from file into dictionary
-            # pass
-            
-            # # Put dictionary into PySGUI table list
 
-            
-    # # Use this somewhere else..? For putting up the csv, of course.
+def get_linelist():
+    """
+    Returns the linelist (shot['data'])
+    If the outbreak file was opened lazily, all cases are decoded from the memory-mapped file first (once).
+    Cases added since the linelist was last read (shot['data_appended'], see append_linelist()) are joined to it in one go.
+    Use this instead of shot['data'] whenever the whole linelist is needed.
+    """
+    if shot['data'] is None:
+        linelist_width = len(shot['headers']['data'])
+        shot['data'] = linelist_from_rows([ row[1:linelist_width] for row in decode_outbreak_records(shot['data_positions']) ])
+    if shot['data_appended']:
+        shot['data'] = linelist_concat([shot['data']] + shot['data_appended'])
+        shot['data_appended'] = []
+    return shot['data']
 
 
+def get_linelist_rows(first, last):
+    """
+    Returns linelist rows first..last (DataFrame) for e.g. the linelist view.
+    If the outbreak file was opened lazily, only these cases are decoded.
+    """
+    if shot['data'] is not None or shot['data_appended']:
+        return get_linelist().iloc[first:last]
+    linelist_width = len(shot['headers']['data'])
+    linelist_rows = linelist_from_rows([ row[1:linelist_width] for row in decode_outbreak_records(shot['data_positions'][first:last]) ])
+    linelist_rows.index = range(first, first + len(linelist_rows))
+    return linelist_rows
 
-def import_from_csv(input_file):
-    # df.loc[df['column_name'] == some_value]
-    
-    # Read csv into list structure
-    df = pd.read_csv(filename, sep=';', engine='python', header=None)
-    outbreak_data = df.values.tolist() # read everything else into a list of rows
-    #outbreak_inf    
-   
 
-# tab_outbreak_intro = 'Outbreak Overview'
-# outbreak_info = {}
-# outbreak_info['created'] = '2020-05-09'
-# outbreak_info['outbreak began'] = '2020-05-01'
-# outbreak_info['outbreak ended'] = 'N/A'
-# outbreak_info['type'] = 'influenza typeB'
-# outbreak_info['outbreak'] = f"{outbreak_info['type']} outbreak {outbreak_info['outbreak began']}"
-# outbreak_info['basename'] = f"{outbreak_info['outbreak began']}_{outbreak_info['type']}"
-# outbreak_info['filename'] = f"{outbreak_info['basename']}.out"
-# outbreak_info['datafile'] = f"{outbreak_info['basename']}.csv"
+def count_linelist_cases():
+    """
+    Returns int (number of cases in the linelist) without decoding a lazily opened outbreak file
+    """
+    appended_cases = sum( len(new_cases) for new_cases in shot['data_appended'] )
+    if shot['data'] is None:
+        return len(shot['data_positions']) + appended_cases
+    return len(shot['data']) + appended_cases
 
 
+# Note on the CACHE
+# Staff reopen the same outbreak files many times a day, so after parsing an outbreak file we write its decoded
+# records to a binary cache next to it, e.g. my_outbreak.csv.cache (numpy .npz file, no pickles).
+# The cache is valid when the outbreak file has the same size and either the same mtime or the same content (sha256),
+# i.e. copying the file around does not invalidate it. Journals are replayed on top of cached records as usual.
+# The sha256 is computed while the file is parsed or written anyway (see HashingStream), so the file is never read twice.
+# A cache found valid by its sha256 gets the new mtime, so the next open does not hash the file again.
 
+outbreak_cache_version = 1 # bump when the cache layout changes
 
-# LINELIST tab functions
-def add_linelist_cases():
+def cache_filename(my_outbreak_file):
     """
-    Table-view to add >1 case
+    Returns Path of the binary cache belonging to my_outbreak_file
     """
+    return Path(f"{my_outbreak_file}.cache")
+
 
-def add_linelist_case():
+def outbreak_file_hash(my_outbreak_file):
     """
-    Application-view to add cases one-by-one
-    Built to spec
+    Returns sha256 hex digest of the contents of my_outbreak_file (read in 1 MiB chunks)
     """
-    pass
-    
-    # LEGEND OF DATABASE FIELDS (by spec)
-    #
-    # NO                        EN              Tool tip
-    # ID <auto increment>
-    # P-Dato                    Sample date     Dato prøvetaking (bærerskap), eller symptom start (illness onset)
-    # P-Mat                     Sample type     Prøvematriale, select from drop-down corresponding to infection type OR freetext
-    # Fnr                       SSN             
-    # Etternavn
-    # Fornavn 
-    # Fødselsdato               DOB             Fra FNR på Norsk
-    # Alder                     Age             Fra FNR på Norsk
-    # Kjønn                     Sex             Fra FNR på Norsk
-    # Fam. kode                                 ???
-    # Status                    Status          Pasient, pårørende, ansatt, ekstern
-    # Avdeling                  Dept
-    # Arbeids team              Team
-    # Rom                       Room            Choose from hospital settings
-    # Seng                      Bed             Choose from hospital settings
-    # Spa-type                                  Type MRSA (sjekk "spa type" på engelsk)
-    # Risikofaktorer            Risk factors    Factors that amplify risk for infection or outcome
+    file_hash = hashlib.sha256()
+    with open(my_outbreak_file, 'rb') as outbreak_file:
+        for chunk in iter(lambda: outbreak_file.read(1024 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def write_outbreak_cache(my_outbreak_file, records, file_sha256=None):
+    """
+    Writes records (from read_outbreak_records()) to the binary cache of my_outbreak_file
+    file_sha256 (hex digest) is the sha256 of my_outbreak_file if already known (see HashingStream), else it is read to hash it.
+    Linelist columns are stored by type: dates as datetime64, ages as int16 + mask, categories as codes + labels
+    and strings as unicode arrays. Dict records are stored as a 2D unicode array in their shot['headers'] layout.
+    Returns bool (False if the cache could not be written, e.g. read-only share)
+    Encrypted outbreak files are never cached (the cache is not encrypted), and their stale caches are removed.
+    """
+    if outbreak_file_encrypted(my_outbreak_file):
+        if cache_filename(my_outbreak_file).is_file(): cache_filename(my_outbreak_file).unlink()
+        return False
     
-    # NOTA BENE
-    # P-mat avhengig av infeksjonstype
-    # Hvilken sykdom det er snakk om
-    # 
-    # Noro - oppkast, diare
-    # Influensa - dyp neseprøve
-    # ESBL - 
-    # 
-    #
-    #
-    #
+    file_stat = Path(my_outbreak_file).stat()
+    arrays = {
+             'version': np.array(outbreak_cache_version),
+             'signature': np.array([file_stat.st_size, file_stat.st_mtime_ns], dtype=np.int64),
+             'sha256': np.array(file_sha256 or outbreak_file_hash(my_outbreak_file)),
+             'fields': np.array(shot['headers']['data'])
+             }
+    
+    for n, column in enumerate(records['data'].columns):
+        values = records['data'][column]
+        dtype = shot['dtypes']['data'].get(column, 'str')
+        if dtype.startswith('datetime64'):
+            arrays[f'data_{n}'] = values.to_numpy(dtype='datetime64[ns]')
+        elif dtype == 'Int16':
+            arrays[f'data_{n}'] = values.fillna(0).to_numpy(dtype=np.int16)
+            arrays[f'data_{n}_mask'] = values.isna().to_numpy()
+        elif dtype == 'category':
+            arrays[f'data_{n}'] = values.cat.codes.to_numpy()
+            arrays[f'data_{n}_labels'] = np.array(values.cat.categories.astype(str), dtype=str)
+        else:
+            arrays[f'data_{n}'] = np.array(values.tolist(), dtype=str)
     
+    for target, layout in shot['rec_types'].values():
+        if target == 'data': continue
+        fields = shot['headers'][layout]
+        arrays[f'{target}_keys'] = np.array(list(records[target].keys()), dtype=np.int64)
+        arrays[target] = np.array([ [ record.get(field, '') for field in fields ] for record in records[target].values() ], dtype=str).reshape(-1, len(fields))
     
-
+    my_cache_file = cache_filename(my_outbreak_file)
+    try:
+        atomic_write_file(my_cache_file, lambda cache_file: np.savez(cache_file, **arrays))
+    except OSError:
+        print(f"could not write {my_cache_file}") # debug
+        return False
+    return True
+
+
+def read_outbreak_cache(my_outbreak_file):
+    """
+    Returns records (as read_outbreak_records() would) from the binary cache of my_outbreak_file,
+    or None if there is no valid cache.
+    """
+    my_cache_file = cache_filename(my_outbreak_file)
+    if not my_cache_file.is_file():
+        return None
+    
+    file_stat = Path(my_outbreak_file).stat()
+    
+    try:
+        with np.load(my_cache_file, allow_pickle=False) as cached:
+            if int(cached['version']) != outbreak_cache_version or list(cached['fields']) != shot['headers']['data']:
+                return None
+            cached_size, cached_mtime = cached['signature']
+            if cached_size != file_stat.st_size:
+                return None
+            cached_sha256 = str(cached['sha256'])
+            new_mtime = cached_mtime != file_stat.st_mtime_ns
+            if new_mtime and cached_sha256 != outbreak_file_hash(my_outbreak_file):
+                return None
+            
+            linelist = {}
+            for n, column in enumerate(shot['headers']['data'][1:]):
+                dtype = shot['dtypes']['data'].get(column, 'str')
+                values = cached[f'data_{n}']
+                if dtype.startswith('datetime64'):
+                    linelist[column] = values.astype(dtype)
+                elif dtype == 'Int16':
+                    linelist[column] = pd.arrays.IntegerArray(values, cached[f'data_{n}_mask'])
+                elif dtype == 'category':
+                    linelist[column] = pd.Categorical.from_codes(values, categories=cached[f'data_{n}_labels'].astype(object))
+                else:
+                    linelist[column] = values.astype(object)
+            
+            records = {'data': pd.DataFrame(linelist, columns=shot['headers']['data'][1:]), 'skipped': 0}
+            
+            for target, layout in shot['rec_types'].values():
+                if target == 'data': continue
+                fields = shot['headers'][layout]
+                records[target] = { int(key): dict(zip(fields, row)) for key, row in zip(cached[f'{target}_keys'], cached[target].tolist()) }
+    except (OSError, KeyError, ValueError):
+        print(f"ignoring unreadable cache {my_cache_file}") # debug
+        return None
+    
+    # Same contents, new mtime (e.g. copied): store the new mtime, so the file is not hashed again next time
+    if new_mtime:
+        write_outbreak_cache(my_outbreak_file, records, cached_sha256)
+    
+    return records
+
+
+# Note on COMPRESSION
+# Outbreak files may be stored compressed as my_outbreak.csv.gz (gzip) or my_outbreak.csv.xz (xz), going by file name.
+# They are (de)compressed on the fly while reading and writing, so the whole file never sits in memory.
+# Journal and cache files stay uncompressed. Compressed files are never memory-mapped (see open_outbreak_file()).
+
+def outbreak_file_compression(my_outbreak_file):
+    """
+    Returns the compression of my_outbreak_file going by its file name: 'gzip' (.gz), 'xz' (.xz) or None (plain)
+    """
+    return {'.gz': 'gzip', '.xz': 'xz'}.get(Path(my_outbreak_file).suffix.lower(), None)
+
+
+@contextlib.contextmanager
+def open_csv_stream(my_file, encoding='utf-8', file_hash=None):
+    """
+    Opens my_file (outbreak file or spreadsheet) for reading as text for csv.reader, use as "with open_csv_stream(f) as x:"
+    Encrypted files (see Note on ENCRYPTION) are decrypted and .gz/.xz files decompressed on the fly.
+    Raises ValueError if my_file is encrypted and the password is wrong (or missing), or the file is damaged.
+    file_hash (hashlib object) is updated with the bytes of my_file as they are read, and with the rest when done.
+    """
+    with contextlib.ExitStack() as layers:
+        binary_stream = layers.enter_context(open(my_file, 'rb'))
+        if file_hash is not None:
+            hashing_stream = HashingStream(binary_stream, file_hash)
+            binary_stream = io.BufferedReader(hashing_stream)
+        if binary_stream.peek(len(encryption_magic))[:len(encryption_magic)] == encryption_magic:
+            binary_stream = layers.enter_context(EncryptedReader(binary_stream, shot.get('encryption_password')))
+        
+        compression = outbreak_file_compression(my_file)
+        if compression == 'gzip':
+            binary_stream = layers.enter_context(gzip.GzipFile(fileobj=binary_stream, mode='rb'))
+        elif compression == 'xz':
+            binary_stream = layers.enter_context(lzma.LZMAFile(binary_stream, mode='rb'))
+        
+        yield layers.enter_context(io.TextIOWrapper(binary_stream, encoding=encoding, newline=''))
+        
+        # Whatever the reader left (e.g. past the end of a compressed stream) is part of the file too
+        if file_hash is not None:
+            while hashing_stream.read(1024 * 1024):
+                pass
+
+
+@contextlib.contextmanager
+def outbreak_writer_stream(binary_file, my_outbreak_file, password=None):
+    """
+    Returns text stream writing into binary_file, use as "with outbreak_writer_stream(f, my_outbreak_file) as x:"
+    Contents are compressed the way the name of my_outbreak_file says (see outbreak_file_compression())
+    and encrypted with password, if set (the outbreak's, see Note on ENCRYPTION). binary_file is left open.
+    """
+    with contextlib.ExitStack() as layers:
+        binary_stream = binary_file
+        if password:
+            binary_stream = layers.enter_context(EncryptedWriter(binary_stream, password))
+        
+        compression = outbreak_file_compression(my_outbreak_file)
+        if compression == 'gzip':
+            # name the contents after the outbreak file, not the temporary file we are writing to (see atomic_write_file())
+            binary_stream = layers.enter_context(gzip.GzipFile(filename=Path(my_outbreak_file).name, mode='wb', compresslevel=6, fileobj=binary_stream))
+        elif compression == 'xz':
+            binary_stream = layers.enter_context(lzma.LZMAFile(binary_stream, mode='wb', preset=6))
+        
+        text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+        try:
+            yield text_stream
+        finally:
+            text_stream.detach() # flushes, and leaves closing the layers below to us
+
+
+# Note on ENCRYPTION
+# Outbreak files can be encrypted at rest with a password (Settings > Data file encryption, see popup_encryption_password()).
+# This needs the cryptography package (AES-GCM), SHOT works without it but cannot read or write encrypted files then.
+#
+# Encrypted files start with a 36 byte header: b'SHOTENC1', a random 16 byte salt (the key is derived from the password
+# with scrypt), a random 8 byte nonce prefix and the chunk size (4 bytes, big-endian). The (compressed) CSV follows
+# in chunks of chunk size bytes, each encrypted and authenticated on its own with nonce = prefix + chunk number.
+# The header and a final-chunk flag are authenticated along with every chunk, and the final chunk is always shorter
+# than the others (possibly empty), so reordered, altered, swapped or truncated files are all rejected.
+# Chunks are decrypted as they are read and encrypted as they are written, so there is never a second plaintext copy.
+#
+# Encrypted files are always saved in full: journals and binary caches would be plaintext, so they are not used
+# (and removed when an encrypted file is saved). Encrypted files are not memory-mapped either.
+#
+# Whether an outbreak is saved encrypted belongs to the outbreak, not to SHOT: shot['outbreak_password'] is the password
+# the loaded outbreak is saved with (None: saved as plaintext). Opening an encrypted file sets it, opening a plaintext file
+# or starting a new outbreak clears it, and Settings > Data file encryption changes it for the loaded outbreak.
+# shot['encryption_password'] is only the password tried when reading encrypted files (e.g. opening or comparing them).
+
+encryption_magic = b'SHOTENC1'
+encryption_chunk_bytes = 64 * 1024
+encryption_tag_bytes = 16
+
+
+def encryption_key(password, salt):
+    """
+    Returns 256 bit key derived from password (str) and salt (bytes) using scrypt
+    """
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=2**14, r=8, p=1, dklen=32)
+
+
+def outbreak_file_encrypted(my_outbreak_file):
+    """
+    Returns bool: True if my_outbreak_file is encrypted (see Note on ENCRYPTION)
+    """
+    with open(my_outbreak_file, 'rb') as outbreak_file:
+        return outbreak_file.read(len(encryption_magic)) == encryption_magic
+
+
+def set_encryption_password(password):
+    """
+    Sets the password tried when reading encrypted outbreak files (see Note on ENCRYPTION)
+    password (str or None): None or empty string forgets the password. The password is never stored on disk.
+    """
+    shot['encryption_password'] = password or None
+
+
+def set_outbreak_password(password):
+    """
+    Sets the password the loaded outbreak is saved with, and tried when reading (see Note on ENCRYPTION)
+    password (str or None): None or empty string saves the loaded outbreak as plaintext from the next save on.
+    """
+    set_encryption_password(password)
+    shot['outbreak_password'] = password or None
+
+
+class HashingStream(io.RawIOBase):
+    """
+    Binary stream passing what is read from or written to binary_file through, adding it to file_hash (hashlib object)
+    on the way, so a file is hashed while it is read or written (see Note on the CACHE). binary_file is left open.
+    """
+    def __init__(self, binary_file, file_hash):
+        self.binary_file = binary_file
+        self.file_hash = file_hash
+    
+    def readable(self):
+        return self.binary_file.readable()
+    
+    def writable(self):
+        return self.binary_file.writable()
+    
+    def readinto(self, buffer):
+        size = self.binary_file.readinto(buffer)
+        self.file_hash.update(memoryview(buffer)[:size])
+        return size
+    
+    def write(self, data):
+        self.file_hash.update(data)
+        self.binary_file.write(data)
+        return len(data)
+
+
+class EncryptedWriter(io.RawIOBase):
+    """
+    Binary stream that encrypts what is written to it into binary_file, chunk by chunk (see Note on ENCRYPTION)
+    close() writes the final chunk, binary_file is left open.
+    """
+    def __init__(self, binary_file, password):
+        if AESGCM is None:
+            raise ValueError(shot['err_encryption_unavailable'])
+        salt = os.urandom(16)
+        self.nonce_prefix = os.urandom(8)
+        self.header = encryption_magic + salt + self.nonce_prefix + encryption_chunk_bytes.to_bytes(4, 'big')
+        self.cipher = AESGCM(encryption_key(password, salt))
+        self.binary_file = binary_file
+        self.chunk_number = 0
+        self.pending = bytearray()
+        binary_file.write(self.header)
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed file')
+        self.pending += data
+        # Always keep the last full chunk back, it might be the final one (which must be shorter, see close())
+        while len(self.pending) > encryption_chunk_bytes:
+            self.write_chunk(bytes(self.pending[:encryption_chunk_bytes]))
+            del self.pending[:encryption_chunk_bytes]
+        return len(data)
+    
+    def write_chunk(self, chunk, final=False):
+        nonce = self.nonce_prefix + self.chunk_number.to_bytes(4, 'big')
+        self.binary_file.write(self.cipher.encrypt(nonce, chunk, self.header + (b'\x01' if final else b'\x00')))
+        self.chunk_number += 1
+    
+    def close(self):
+        if not self.closed:
+            if len(self.pending) == encryption_chunk_bytes:
+                self.write_chunk(bytes(self.pending))
+                self.pending = bytearray()
+            self.write_chunk(bytes(self.pending), final=True)
+        super().close()
+
+
+class EncryptedReader(io.RawIOBase):
+    """
+    Binary stream of the decrypted contents of binary_file, decrypted chunk by chunk as it is read (see Note on ENCRYPTION)
+    Raises ValueError if the password is wrong or the file is damaged. binary_file is left open.
+    """
+    def __init__(self, binary_file, password):
+        if AESGCM is None:
+            raise ValueError(shot['err_encryption_unavailable'])
+        if not password:
+            raise ValueError(shot['err_encryption_password'])
+        self.header = binary_file.read(len(encryption_magic) + 28)
+        if len(self.header) != len(encryption_magic) + 28 or not self.header.startswith(encryption_magic):
+            raise ValueError(shot['err_encryption_password'])
+        salt = self.header[8:24]
+        self.nonce_prefix = self.header[24:32]
+        self.chunk_bytes = int.from_bytes(self.header[32:36], 'big')
+        self.cipher = AESGCM(encryption_key(password, salt))
+        self.binary_file = binary_file
+        self.chunk_number = 0
+        self.chunk = b''
+        self.chunk_offset = 0
+        self.final_read = False
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while self.chunk_offset >= len(self.chunk) and not self.final_read:
+            self.read_chunk()
+        size = min(len(buffer), len(self.chunk) - self.chunk_offset)
+        buffer[:size] = self.chunk[self.chunk_offset:self.chunk_offset + size]
+        self.chunk_offset += size
+        return size
+    
+    def read_chunk(self):
+        encrypted_chunk = self.binary_file.read(self.chunk_bytes + encryption_tag_bytes)
+        final = len(encrypted_chunk) < self.chunk_bytes + encryption_tag_bytes # an empty read means the file was cut short
+        nonce = self.nonce_prefix + self.chunk_number.to_bytes(4, 'big')
+        try:
+            self.chunk = self.cipher.decrypt(nonce, encrypted_chunk, self.header + (b'\x01' if final else b'\x00'))
+        except InvalidTag:
+            raise ValueError(shot['err_encryption_password'])
+        self.chunk_offset = 0
+        self.chunk_number += 1
+        self.final_read = final
+
+
+# Note on the SQLITE BACKEND
+# Outbreak files named .sqlite or .db are SQLite databases instead of CSV files (CSV stays the import/export format, Save As).
+# There is one table per rec_type ("outbreak", "data", "event" and "time series") with the fields of its shot['headers']
+# layout (except rec_type) as TEXT columns, plus key (the record key, see read_outbreak_records()).
+# Values are stored as in CSV files, i.e. dates as ISO strings, which sort and compare as dates.
+# Cases are indexed on fnr and sample_date, and on department and room (each with sample_date, for lookups like
+# every case in ward X in the last 14 days), see query_outbreak_database(). Filters on those fields are run there too
+# (see database_filter_selection()), reading the database read-only.
+# Saving the open database updates the changed records in one transaction, so no journal is needed.
+# Databases are not encrypted (see Note on ENCRYPTION), saving one fails while encryption is on.
+
+outbreak_database_suffixes = ('.sqlite', '.db')
+
+# index name => indexed case fields
+outbreak_database_indexes = {
+                            'data_fnr': ('fnr',),
+                            'data_sample_date': ('sample_date',),
+                            'data_department': ('department', 'sample_date'),
+                            'data_room': ('room', 'sample_date')
+                            }
+
+
+def outbreak_file_backend(my_outbreak_file):
+    """
+    Returns the storage of my_outbreak_file going by its file name: 'sqlite' (.sqlite or .db) or 'csv'
+    """
+    return 'sqlite' if Path(my_outbreak_file).suffix.lower() in outbreak_database_suffixes else 'csv'
+
+
+def sql_name(name):
+    """
+    Returns name (str) quoted as SQL identifier, e.g. "time series" or "spa-type"
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def outbreak_database_sane(my_outbreak_file):
+    """
+    Returns bool: True if my_outbreak_file is an SQLite database with a linelist table (opened read-only, nothing is created)
+    """
+    try:
+        with contextlib.closing(connect_outbreak_database_readonly(my_outbreak_file)) as connection:
+            return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (shot['headers']['data'][0],)).fetchone() is not None
+    except sqlite3.Error:
+        return False
+
+
+def connect_outbreak_database_readonly(my_outbreak_file):
+    """
+    Returns sqlite3 connection to my_outbreak_file that can only read (nothing is created, sqlite3.Error if it is not a database)
+    """
+    return sqlite3.connect(f"{Path(my_outbreak_file).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def connect_outbreak_database(my_outbreak_file):
+    """
+    Returns sqlite3 connection to my_outbreak_file. Tables and indexes are created if missing.
+    """
+    connection = sqlite3.connect(str(my_outbreak_file))
+    for rec_type, (target, layout) in shot['rec_types'].items():
+        columns = ', '.join( f"{sql_name(field)} TEXT NOT NULL DEFAULT ''" for field in shot['headers'][layout][1:] )
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {sql_name(rec_type)} (key INTEGER PRIMARY KEY, {columns})")
+    for index_name, index_fields in outbreak_database_indexes.items():
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {sql_name(index_name)} ON {sql_name(shot['headers']['data'][0])} ({', '.join( sql_name(field) for field in index_fields )})")
+    connection.commit()
+    return connection
+
+
+def linelist_from_database(cursor):
+    """
+    Returns linelist DataFrame (see linelist_from_rows()) keyed by record key from a cursor over rows of the linelist table
+    """
+    rows = cursor.fetchall()
+    linelist = linelist_from_rows([ list(row[1:]) for row in rows ])
+    linelist.index = [ row[0] for row in rows ]
+    return linelist
+
+
+def read_outbreak_database(my_outbreak_file):
+    """
+    Returns records (as read_outbreak_file() would) from the outbreak database my_outbreak_file
+    """
+    records = { 'skipped': 0, 'journal_rows': 0 }
+    with contextlib.closing(connect_outbreak_database(my_outbreak_file)) as connection:
+        for rec_type, (target, layout) in shot['rec_types'].items():
+            cursor = connection.execute(f"SELECT * FROM {sql_name(rec_type)} ORDER BY key")
+            if target == 'data':
+                records['data'] = linelist_from_database(cursor)
+            else:
+                fields = shot['headers'][layout]
+                records[target] = { row[0]: dict(zip(fields, (rec_type,) + row[1:])) for row in cursor }
+    return records
+
+
+def write_outbreak_database(my_outbreak_file, records):
+    """
+    Replaces all records in the outbreak database my_outbreak_file with records (see snapshot_outbreak_records())
+    Done in one transaction, so a crash leaves the database as it was.
+    """
+    if records.get('outbreak_password'):
+        raise ValueError(shot['err_encryption_database'])
+    
+    with contextlib.closing(connect_outbreak_database(my_outbreak_file)) as connection:
+        with connection:
+            for rec_type, (target, layout) in shot['rec_types'].items():
+                keys, rows = outbreak_rows(target, records=records)
+                connection.execute(f"DELETE FROM {sql_name(rec_type)}")
+                connection.executemany(f"INSERT INTO {sql_name(rec_type)} VALUES ({', '.join('?' * len(shot['headers'][layout]))})",
+                                       ( [int(key)] + row[1:] for key, row in zip(keys, rows) ))
+
+
+def update_outbreak_database(my_outbreak_file, journal_rows):
+    """
+    Applies journal_rows (from journal_rows_from_changes()) to the outbreak database my_outbreak_file, in one transaction
+    """
+    if shot.get('outbreak_password'):
+        raise ValueError(shot['err_encryption_database'])
+    
+    with contextlib.closing(connect_outbreak_database(my_outbreak_file)) as connection:
+        with connection:
+            for row in journal_rows:
+                if row[0] == 'delete':
+                    connection.execute(f"DELETE FROM {sql_name(row[2])} WHERE key = ?", (int(row[1]),))
+                else:
+                    connection.execute(f"INSERT OR REPLACE INTO {sql_name(row[2])} VALUES ({', '.join('?' * (len(row) - 2))})", [int(row[1])] + row[3:])
+
+
+def query_outbreak_database(my_outbreak_file, department=None, room=None, fnr=None, since=None, until=None):
+    """
+    Returns the cases in the outbreak database my_outbreak_file matching all of the conditions given,
+    as linelist DataFrame keyed by record key. Lookups go through the indexes (see outbreak_database_indexes).
+    department, room and fnr are a value (str) or any of several (tuple or list), compared as stored.
+    since and until (date, datetime or ISO date string) limit sample_date, both inclusive (cases without one drop out).
+    The database is only read. E.g. every case in ward X in the last 14 days:
+    query_outbreak_database(my_file, department='X', since=datetime.date.today() - datetime.timedelta(days=14))
+    """
+    conditions = []
+    parameters = []
+    for field, values in ('fnr', fnr), ('department', department), ('room', room):
+        if values is None: continue
+        values = [ str(value) for value in ((values,) if type(values) is str else values) ]
+        conditions.append(f"{sql_name(field)} IN ({', '.join('?' * len(values))})")
+        parameters += values
+    for comparison, day in ('>=', since), ('<=', until):
+        if day is None: continue
+        conditions.append(f"sample_date {comparison} ? AND sample_date != ''")
+        parameters.append(pd.Timestamp(day).strftime('%Y-%m-%d'))
+    
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    with contextlib.closing(connect_outbreak_database_readonly(my_outbreak_file)) as connection:
+        cursor = connection.execute(f"SELECT * FROM {sql_name(shot['headers']['data'][0])}{where} ORDER BY key", parameters)
+        return linelist_from_database(cursor)
+
+
+def database_filter_selection(my_outbreak_file, linelist, filter_spec):
+    """
+    Returns the selection (see Note on FILTERING) of filter_spec on linelist, looked up in the outbreak database my_outbreak_file
+    (see query_outbreak_database()), which linelist must have been read from, unchanged since.
+    Returns None if filter_spec has conditions the database indexes do not cover (see outbreak_database_indexes).
+    """
+    if not set(filter_spec) <= {'sample_date', 'department', 'room', 'fnr'}:
+        return None
+    for field in set(filter_spec) - {'sample_date'}:
+        # values are compared stripped in memory (see get_filter_bitmap()) but as stored in the database
+        values = linelist[field].cat.categories if isinstance(linelist[field].dtype, pd.CategoricalDtype) else linelist[field].unique()
+        values = pd.Index(values).astype(str)
+        if (values != values.str.strip()).any():
+            return None
+    since, until = [ None if bound in (None, '') else bound for bound in filter_spec.get('sample_date', (None, None)) ]
+    cases = query_outbreak_database(my_outbreak_file, department=filter_spec.get('department'), room=filter_spec.get('room'),
+                                    fnr=filter_spec.get('fnr'), since=since, until=until)
+    return linelist.index.isin(cases.index)
+
+
+def open_outbreak_file():
+    """
+    Back-end function that takes care of opening file and creating the dicts
+    Destructive: User has already chosen to open (and not been/ignored prompt to save any open stuff
+                 so we can relatively safely overwrite the dicts below.
+    Returns bool (True if the file was read into shot['data'], shot['events'], shot['tseries'] and shot['admin'])
+    The file is read in full before any of these are replaced, so if it cannot be read the loaded outbreak stays as it was.
+    """
+
+#                                       len(shot['hospital']['building'])
+#                                                     |
+#                                                     |     len(shot['hospital']['department'])
+#                                                     |                     |               
+#                                                     |                     |        len(shot['hospital']['room'])  
+#                                                     |                     |               |
+#                                                     v                     v               v
+#   shot['hospital'] = {'name': <str>, 'buildings': <int>, 'departments': <int>, 'rooms': <int>, room: <dict>}
+#
+#   shot['hospital']['room'] = []
+#   shot['hospital']['room'] = [<id-str>,<name-str>,<building>,<dep>,
+#       
+        # hospital: buildings, dept, room
+    
+#    shot['rooms'] = {}
+    
+    global outbreak_filename
+    
+    # Large files are memory-mapped and cases decoded on demand (see open_outbreak_map()), even if they have a binary cache:
+    # mapping costs the same whatever the size, while the cache still decodes every case.
+    # A journal must be replayed on top of the cases though, so those files are read in full (so are compressed and encrypted files).
+    # Databases are not memory-mapped at all (see Note on the SQLITE BACKEND).
+    if Path(outbreak_filename).stat().st_size > shot['lazy_open_bytes'] and outbreak_file_backend(outbreak_filename) == 'csv' and outbreak_file_compression(outbreak_filename) is None and not outbreak_file_encrypted(outbreak_filename) and not journal_filename(outbreak_filename).is_file():
+        try:
+            is_outbreak_file = open_outbreak_map(outbreak_filename)
+        except (OSError, ValueError) as read_error:
+            popup_some_error(str(read_error))
+            return False
+        if not is_outbreak_file:
+            popup_some_error(shot['err_wrong_data_format'])
+            return False
+        shot['filter'] = {} # values of another file's cases (see Note on FILTERING)
+        shot['outbreak_password'] = None # encrypted files are never mapped
+        shot['journal_rows'] = 0
+        shot['hospital'] = outbreak_hospital(shot['admin']) or shot.get('hospital') or {}
+        reset_record_changes()
+        records_replaced()
+        return True
+    
+    try:
+        records = read_outbreak_file(outbreak_filename)
+    except (OSError, ValueError) as read_error:
+        # e.g. encrypted file that fails authentication somewhere past the header (see EncryptedReader)
+        popup_some_error(str(read_error))
+        return False
+    if records is None:
+        popup_some_error(shot['err_wrong_data_format'])
+        return False
+    
+    close_outbreak_map(decode=False)
+    shot['filter'] = {} # values of another file's cases (see Note on FILTERING)
+    shot['outbreak_password'] = shot.get('encryption_password') if outbreak_file_encrypted(outbreak_filename) else None # see Note on ENCRYPTION
+    
+    # Changes saved since last compaction (see save_outbreak_file())
+    shot['journal_rows'] = records['journal_rows']
+    reset_record_changes()
+    
+    for target in 'admin', 'data', 'events', 'tseries':
+        shot[target] = records[target]
+    shot['hospital'] = outbreak_hospital(shot['admin']) or shot.get('hospital') or {} # else the configured one
+    records_replaced()
+    
+    return True
+
+
+def outbreak_hospital(admin):
+    """
+    Returns the configured hospital (dict like shot['hospital']) named in the outbreak header of admin records (dict like shot['admin']),
+    or None if it names none, or one that is not configured.
+    """
+    outbreak_info = admin[min(admin)] if admin else {}
+    return hospital.get(outbreak_info.get('hospital') or '')
+
+
+def read_outbreak_file(my_outbreak_file):
+    """
+    Reads all records of my_outbreak_file without touching the loaded outbreak (used by open_outbreak_file() and comparisons)
+    Uses the binary cache if valid, otherwise the file is parsed (and cached). The journal, if any, is replayed on top.
+    Returns records dict (see read_outbreak_records()) with 'journal_rows' added, or None if not an outbreak file.
+    """
+    
+    if outbreak_file_backend(my_outbreak_file) == 'sqlite':
+        return read_outbreak_database(my_outbreak_file) if outbreak_database_sane(my_outbreak_file) else None
+    
+    # Skip parsing altogether if we have a valid binary cache (see read_outbreak_cache())
+    records = read_outbreak_cache(my_outbreak_file)
+    
+    if records is None:
+        # Read the file once, routing each row by rec_type (and hashing it for the cache)
+        file_hash = hashlib.sha256()
+        with open_csv_stream(my_outbreak_file, file_hash=file_hash) as outbreak_file:
+            records = read_outbreak_records(outbreak_file)
+        
+        if records is None:
+            return None
+        
+        if records['skipped'] > 0:
+            print(f"skipped {records['skipped']} rows with unknown rec_type in {my_outbreak_file}") # debug
+        
+        write_outbreak_cache(my_outbreak_file, records, file_hash.hexdigest())
+    
+    records['journal_rows'] = read_outbreak_journal(my_outbreak_file, records)
+    return records
+
+
+def outbreak_file_sanity_pass(my_outbreak_file):
+    """
+    Collection of sanity checks of outbreak files run before loading and saving csv files
+    Returns bool. Only True iff all required checks pass.
+    Only the header row is read, the records are read by open_outbreak_file().
+    """
+    
+    # Convert str to path
+    # TODO latest python does not require string object for Path
+    if my_outbreak_file is None:
+        return False
+    else:
+        try:
+            my_outbreak_file = Path(str(my_outbreak_file))
+        except:
+            try:
+                my_outbreak_file = Path(my_outbreak_file) # might be useful for newer pythons..?
+            except:
+                popup_some_error(f"{shot['err_weird_data_string']}")
+                return False
+    
+
+    # TODO
+    # Check that file is not open/locked + perm
+    
+    
+    # Sanity checks
+    # Note: We only need the first line. The header row is fixed (see set_outbreak_headers()),
+    # so there's no need to have csv.Sniffer guess the dialect from it.
+    if not my_outbreak_file.is_file():
+        popup_some_error(shot['err_input_notafile'])
+        return False
+    
+    # Databases have no header row to check (see Note on the SQLITE BACKEND)
+    if outbreak_file_backend(my_outbreak_file) == 'sqlite':
+        if outbreak_database_sane(my_outbreak_file): return True
+        popup_some_error(shot['err_wrong_data_format'])
+        return False
+    
+    # Encrypted files need the password (see Note on ENCRYPTION)
+    file_encrypted = outbreak_file_encrypted(my_outbreak_file)
+    if file_encrypted:
+        if AESGCM is None:
+            popup_some_error(shot['err_encryption_unavailable'])
+            return False
+        if not shot.get('encryption_password') and not popup_encryption_password():
+            return False
+    
+    try:
+        with open_csv_stream(my_outbreak_file) as test_outbreak_file:
+            test_first_line = test_outbreak_file.readline()
+    except (OSError, EOFError, ValueError, lzma.LZMAError):
+        # wrong password, broken .gz/.xz file, or not text
+        popup_some_error(shot['err_encryption_password'] if file_encrypted else shot['err_wrong_data_format'])
+        return False
+    
+    if ';' not in test_first_line:
+        popup_some_error(shot['err_incorrect_delim'])
+        return False
+    
+    test_first_row = next(csv.reader([test_first_line], delimiter=';'))
+    
+    if test_first_row[0] != shot['headers']['generic'][0]:
+        popup_some_error(shot['err_no_headers'])
+    elif test_first_row[:3] == shot['headers']['generic'][:3]:
+        print('OK format') # debug
+        return True
+    else:
+        popup_some_error(shot['err_wrong_data_format'])
+    
+    return False
+
+def linelist_concat(linelists):
+    """
+    Concatenates linelists (DataFrames from linelist_from_rows()) keeping the column types of shot['dtypes']['data']
+    pandas falls back to object columns when categories differ, so those columns are re-typed afterwards.
+    """
+    linelists = [ linelist for linelist in linelists if len(linelist) > 0 ] or linelists[:1]
+    if len(linelists) == 1:
+        return linelists[0].copy()
+    
+    # Give category columns the same categories up front, so pd.concat keeps them categorical (re-typing is slow)
+    linelists = [ linelist.copy(deep=False) for linelist in linelists ]
+    for column, dtype in shot['dtypes']['data'].items():
+        if dtype != 'category' or not all( isinstance(linelist[column].dtype, pd.CategoricalDtype) for linelist in linelists ):
+            continue
+        categories = linelists[0][column].cat.categories.append([ linelist[column].cat.categories for linelist in linelists[1:] ]).unique()
+        for linelist in linelists:
+            if not linelist[column].cat.categories.equals(categories):
+                linelist[column] = linelist[column].cat.set_categories(categories)
+    
+    linelist = pd.concat(linelists)
+    for column, dtype in shot['dtypes']['data'].items():
+        if linelist[column].dtype != dtype:
+            linelist[column] = linelist[column].astype(dtype)
+    return linelist
+
+
+def linelist_to_rows(linelist):
+    """
+    The opposite of linelist_from_rows()
+    Returns a list of data rows (lists of strings, including the rec_type column) ready for csv.writer
+    Dates are written as ISO dates (YYYY-MM-DD) and missing values as empty strings.
+    """
+    as_strings = {}
+    for column in linelist.columns:
+        values = linelist[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+        as_strings[column] = values.astype(object).where(values.notna(), '').astype(str)
+    
+    rec_type = shot['headers']['data'][0]
+    return [ [rec_type] + row for row in pd.DataFrame(as_strings, index=linelist.index).values.tolist() ]
+
+
+def outbreak_rows(target, keys=None, records=None):
+    """
+    Returns the records of shot[target] ('admin', 'data', 'events' or 'tseries') as CSV rows in their shot['headers'] layout
+    Only records in keys are returned if keys (list) is set. Keys of deleted records are ignored.
+    Set records (dict like shot, see snapshot_outbreak_records()) to use other records than the loaded ones.
+    returns two lists: record keys and rows, so call using "my_keys, my_rows = outbreak_rows('events')"
+    """
+    if target == 'data':
+        linelist = get_linelist() if records is None else records['data']
+        if keys is not None: linelist = linelist.loc[linelist.index.intersection(keys)]
+        return list(linelist.index), linelist_to_rows(linelist)
+    
+    if records is None: records = shot
+    layout = [ layout for rec_target, layout in shot['rec_types'].values() if rec_target == target ][0]
+    fields = shot['headers'][layout]
+    if keys is None: keys = list(records[target].keys())
+    keys = [ key for key in keys if key in records[target] ]
+    return keys, [ [ records[target][key].get(field, '') for field in fields ] for key in keys ]
+
+
+def atomic_write_file(my_file, write_contents):
+    """
+    Crash-safe replacement of my_file: write_contents(binary file object) writes the new contents to a temporary file
+    in the same folder, which is flushed to disk and then renamed over my_file.
+    If SHOT (or the machine) dies halfway, my_file is either the old or the new version, never a truncated mix.
+    Errors are raised (OSError), and the temporary file is removed.
+    """
+    my_file = Path(my_file)
+    my_temp_file = my_file.with_name(f".{my_file.name}.tmp") # same folder, so the rename never crosses file systems
+    try:
+        with open(my_temp_file, 'wb') as temp_file:
+            write_contents(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(my_temp_file, my_file)
+    except BaseException:
+        if my_temp_file.is_file(): my_temp_file.unlink()
+        raise
+    
+    # The rename itself lives in the folder, so sync that too (POSIX only, Windows cannot open folders)
+    if os.name == 'posix':
+        folder = os.open(my_file.parent, os.O_RDONLY)
+        try:
+            os.fsync(folder)
+        finally:
+            os.close(folder)
+
+
+def write_outbreak_file(my_outbreak_file, records=None, file_hash=None):
+    """
+    Writes all loaded records (shot['admin'], shot['data'], shot['events'] and shot['tseries']) to my_outbreak_file
+    or the ones in records (see snapshot_outbreak_records()), if set. The file is replaced atomically (atomic_write_file())
+    This is a full rewrite, see save_outbreak_file() for when we only append to the journal.
+    The file is encrypted if the outbreak has a password (shot['outbreak_password'], or the one in records).
+    file_hash (hashlib object) is updated with the bytes written, e.g. for the cache (see Note on the CACHE).
+    """
+    password = (shot if records is None else records).get('outbreak_password')
+    
+    def write_records(binary_file):
+        if file_hash is not None: binary_file = HashingStream(binary_file, file_hash)
+        with outbreak_writer_stream(binary_file, my_outbreak_file, password) as outbreak_file:
+            outbreak_writer = csv.writer(outbreak_file, delimiter=';')
+            outbreak_writer.writerow(shot['headers']['generic'])
+            for target in 'admin', 'data', 'events', 'tseries':
+                outbreak_writer.writerows(outbreak_rows(target, records=records)[1])
+    
+    atomic_write_file(my_outbreak_file, write_records)
+
+
+# Note on the JOURNAL
+# Rewriting a large outbreak file on every save is slow (network home drives), while most saves only change a couple of rows.
+# So by default, saving only appends new, changed or deleted records to a journal file next to the outbreak file,
+# e.g. my_outbreak.csv.journal, which is replayed on top of the outbreak file when opened.
+#
+# The journal is a ;-separated file too. First line identifies the version of the outbreak file it belongs to,
+# the rest are changes, in order:
+#
+#   journal;<outbreak file fingerprint>
+#   upsert;<record key>;<rec_type>;<fields in the layout of rec_type> ...
+#   delete;<record key>;<rec_type>
+#
+# Record keys are the running numbers records are stored by (see read_outbreak_records()).
+# Compaction (compact_outbreak_journal()) writes the outbreak file in full and removes the journal.
+# If SHOT dies between the two, the journal no longer matches the fingerprint of the outbreak file and is ignored.
+#
+# Saving from the GUI happens on a background writer thread (save_writer()), so a slow share does not freeze the window.
+# Everything touching shot (what to write, renumbering, resetting changes) is done on the GUI thread before the save
+# is queued; the writer only gets its own copy of the records and does the file I/O. Saves are written in queued order.
+
+def journal_filename(my_outbreak_file):
+    """
+    Returns Path of the journal belonging to my_outbreak_file
+    """
+    return Path(f"{my_outbreak_file}.journal")
+
+
+def outbreak_file_fingerprint(my_outbreak_file):
+    """
+    Returns a short string identifying the current contents of my_outbreak_file (size and hash of the last 4 KiB)
+    Cheap to compute, and survives copying files around (unlike mtime).
+    """
+    my_outbreak_file = Path(my_outbreak_file)
+    file_size = my_outbreak_file.stat().st_size
+    with open(my_outbreak_file, 'rb') as outbreak_file:
+        outbreak_file.seek(max(0, file_size - 4096))
+        file_tail = outbreak_file.read()
+    return f"{file_size}:{hashlib.sha1(file_tail).hexdigest()}"
+
+
+def reset_record_changes():
+    """
+    Empties the register of unsaved changes, i.e. what the next journal save will append.
+    shot['changed'][target][key] is True for new or changed records and False for deleted records.
+    """
+    shot['changed'] = { target: {} for target, layout in shot['rec_types'].values() }
+
+
+def mark_record_changed(target, key, deleted=False):
+    """
+    Registers that record key of shot[target] was added, changed or deleted (deleted=True) since last save
+    """
+    shot['changed'][target][key] = not deleted
+    if target == 'data': linelist_changed()
+    if target == 'tseries': shot['tseries_version'] += 1 # see Note on TIME SERIES
+
+
+def renumber_records():
+    """
+    Re-sets record keys to 0..n (in key order), as they would be after reading the outbreak file from scratch
+    Must only be done right after a full write of the outbreak file (keys in the journal refer to the old numbers).
+    """
+    shot['data'] = get_linelist().sort_index().reset_index(drop=True)
+    for target in 'admin', 'events', 'tseries':
+        shot[target] = dict(enumerate( record for key, record in sorted(shot[target].items()) ))
+    records_replaced()
+
+
+def read_outbreak_journal(my_outbreak_file, records):
+    """
+    Replays the journal of my_outbreak_file (if any) on top of records from read_outbreak_records()
+    Only the last change of each record is applied. Changes the records dict in place.
+    Returns int (number of journal rows read, 0 if there is no valid journal)
+    """
+    my_journal_file = journal_filename(my_outbreak_file)
+    if not my_journal_file.is_file():
+        return 0
+    
+    last_change = {}
+    journal_rows = 0
+    with open(my_journal_file, newline='', encoding='utf-8') as journal_file:
+        journal_reader = csv.reader(journal_file, delimiter=';')
+        journal_header = next(journal_reader, [])
+        if journal_header[:2] != ['journal', outbreak_file_fingerprint(my_outbreak_file)]:
+            print(f"ignoring stale journal {my_journal_file}") # debug
+            return 0
+        for row in journal_reader:
+            if len(row) < 3 or not row[1].isdigit() or row[2] not in shot['rec_types']:
+                continue # garbage
+            if row[0] == 'upsert' and len(row) != 2 + len(shot['headers'][shot['rec_types'][row[2]][1]]):
+                continue # cut short, e.g. SHOT died while appending it
+            last_change[(row[2], int(row[1]))] = row[2:] if row[0] == 'upsert' else None
+            journal_rows += 1
+    
+    # Apply changes
+    linelist_upserts = {}
+    linelist_deletes = []
+    linelist_width = len(shot['headers']['data'])
+    for (rec_type, key), row in last_change.items():
+        target, layout = shot['rec_types'][rec_type]
+        if target == 'data':
+            if row is None:
+                linelist_deletes.append(key)
+            else:
+                linelist_upserts[key] = row[1:linelist_width]
+        elif row is None:
+            records[target].pop(key, None)
+        else:
+            records[target][key] = dict(zip(shot['headers'][layout], row))
+    
+    if linelist_upserts or linelist_deletes:
+        linelist = records['data']
+        replaced = linelist.index.intersection(list(linelist_upserts.keys()) + linelist_deletes)
+        changed = linelist_from_rows(list(linelist_upserts.values()))
+        changed.index = list(linelist_upserts.keys())
+        records['data'] = linelist_concat([linelist.drop(index=replaced), changed]).sort_index()
+    
+    return journal_rows
+
+
+def journal_rows_from_changes():
+    """
+    Returns list of journal rows for new, changed and deleted records (see mark_record_changed())
+    """
+    journal_rows = []
+    for target, changes in shot['changed'].items():
+        if not changes: continue
+        rec_type = [ rec_type for rec_type, (rec_target, layout) in shot['rec_types'].items() if rec_target == target ][0]
+        upsert_keys, upsert_rows = outbreak_rows(target, [ key for key, exists in changes.items() if exists ])
+        journal_rows += [ ['upsert', key] + row for key, row in zip(upsert_keys, upsert_rows) ]
+        journal_rows += [ ['delete', key, rec_type] for key, exists in changes.items() if not exists ]
+    return journal_rows
+
+
+def append_outbreak_journal(my_outbreak_file, journal_rows):
+    """
+    Appends journal_rows (from journal_rows_from_changes()) to the journal of my_outbreak_file and syncs it to disk
+    """
+    if not journal_rows:
+        return
+    
+    my_journal_file = journal_filename(my_outbreak_file)
+    new_journal = not my_journal_file.is_file()
+    with open(my_journal_file, 'a', newline='', encoding='utf-8') as journal_file:
+        journal_writer = csv.writer(journal_file, delimiter=';')
+        if new_journal:
+            journal_writer.writerow(['journal', outbreak_file_fingerprint(my_outbreak_file)])
+        journal_writer.writerows(journal_rows)
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+
+def snapshot_outbreak_records():
+    """
+    Prepares a full write: renumbers the loaded records and returns a copy of them
+    (dict with 'admin', 'data', 'events' and 'tseries') that can be written while the user goes on editing.
+    Record keys are renumbered first, so they match the file as it will be read back (the journal is removed on write).
+    """
+    close_outbreak_map() # we are about to rewrite the file it maps
+    renumber_records()
+    reset_record_changes()
+    shot['journal_rows'] = 0
+    records = { target: shot[target].copy() if target == 'data' else copy.deepcopy(shot[target]) for target in ('admin', 'data', 'events', 'tseries') }
+    records['outbreak_password'] = shot.get('outbreak_password') # saved as it is now, whatever happens meanwhile
+    return records
+
+
+def write_outbreak_snapshot(my_outbreak_file, records):
+    """
+    Writes records (from snapshot_outbreak_records()) to my_outbreak_file, removes its journal and refreshes its cache
+    """
+    if outbreak_file_backend(my_outbreak_file) == 'sqlite':
+        write_outbreak_database(my_outbreak_file, records)
+        return
+    
+    file_hash = hashlib.sha256()
+    write_outbreak_file(my_outbreak_file, records, file_hash)
+    my_journal_file = journal_filename(my_outbreak_file)
+    if my_journal_file.is_file():
+        my_journal_file.unlink()
+    write_outbreak_cache(my_outbreak_file, records, file_hash.hexdigest())
+
+
+def compact_outbreak_journal(my_outbreak_file):
+    """
+    Folds the journal back into the outbreak file:
+    writes all loaded records (outbreak file + journal + unsaved changes) to my_outbreak_file, then removes the journal.
+    This is done right away (not on the writer thread), see save_outbreak_file() for saving from the GUI.
+    """
+    write_outbreak_snapshot(my_outbreak_file, snapshot_outbreak_records())
+
+
+def save_writer():
+    """
+    Background writer thread (started by start_save_writer()), runs until SHOT exits
+    Takes save jobs ('journal', 'database' or 'full', <file>, <journal rows or records>) from shot['save_jobs'], in order,
+    and reports each one to shot['save_results'] as ('saved', <file>, None) or ('error', <file>, <error message>)
+    """
+    while True:
+        save_kind, my_outbreak_file, save_contents = shot['save_jobs'].get()
+        try:
+            if save_kind == 'journal':
+                append_outbreak_journal(my_outbreak_file, save_contents)
+            elif save_kind == 'database':
+                update_outbreak_database(my_outbreak_file, save_contents)
+            else:
+                write_outbreak_snapshot(my_outbreak_file, save_contents)
+            shot['save_results'].put(('saved', my_outbreak_file, None))
+        except Exception as save_error:
+            print(f"save of {my_outbreak_file} failed: {save_error}") # debug
+            shot['save_results'].put(('error', my_outbreak_file, str(save_error)))
+        finally:
+            shot['save_jobs'].task_done()
+
+
+def start_save_writer():
+    """
+    Starts the background writer thread, unless it is already running
+    """
+    if shot.get('save_jobs') is not None:
+        return
+    shot['save_jobs'] = queue.Queue()
+    shot['save_results'] = queue.Queue()
+    threading.Thread(target=save_writer, name='shot-save-writer', daemon=True).start()
+
+
+def save_pending():
+    """
+    Returns bool: True if the writer thread has saves queued or in progress
+    """
+    return shot.get('save_jobs') is not None and shot['save_jobs'].unfinished_tasks > 0
+
+
+def get_save_results():
+    """
+    Returns list of saves finished by the writer thread since last call: (result, file, error message)
+    where result is 'saved' or 'error'. After an error, the next save is a full write (see save_outbreak_file()).
+    """
+    save_results = []
+    while shot.get('save_results') is not None:
+        try:
+            save_results.append(shot['save_results'].get_nowait())
+        except queue.Empty:
+            break
+    for save_result, my_outbreak_file, save_error in save_results:
+        if save_result == 'error': shot['save_full_next'] = True
+    return save_results
+
+
+def show_save_results(status_bar):
+    """
+    Reports the saves finished by the writer thread (see get_save_results()) in status_bar (sg.Text of the main window),
+    and failed ones in an error popup as well
+    """
+    for save_result, saved_file, save_error in get_save_results():
+        if save_result == 'saved':
+            status_bar.Update(value=get_status_line(s='Save', f=Path(saved_file).name))
+        else:
+            popup_some_error(f"{shot['err_save_failed']} {saved_file}\n\n{save_error}")
+            status_bar.Update(value=get_status_line())
+
+
+def save_outbreak_file(my_outbreak_file):
+    """
+    Saves the loaded outbreak to my_outbreak_file, on the background writer thread (see save_writer())
+    In journal mode (shot['save_mode'] == 'journal') saving the open file only appends changes to its journal.
+    The journal is compacted when it grows past shot['journal_compact_rows'] rows (or a tenth of the linelist, if larger).
+    Otherwise (full mode, Save As to another file, encryption or after a failed save) all records are written.
+    Saving the open database only updates changed records (see update_outbreak_database()).
+    Returns right away, check get_save_results() for the outcome.
+    """
+    start_save_writer()
+    same_file = str(my_outbreak_file) == str(outbreak_filename) and Path(my_outbreak_file).is_file()
+    
+    if outbreak_file_backend(my_outbreak_file) == 'sqlite' and same_file and not shot.get('save_full_next', False):
+        journal_rows = journal_rows_from_changes()
+        reset_record_changes()
+        shot['save_jobs'].put(('database', my_outbreak_file, journal_rows))
+        return
+    
+    journal_save = shot['save_mode'] == 'journal' and same_file and outbreak_file_backend(my_outbreak_file) == 'csv' and not shot.get('outbreak_password')
+    
+    if journal_save and not shot.get('save_full_next', False):
+        journal_rows = journal_rows_from_changes()
+        if shot['journal_rows'] + len(journal_rows) <= max(shot['journal_compact_rows'], count_linelist_cases() // 10):
+            shot['journal_rows'] += len(journal_rows)
+            reset_record_changes()
+            shot['save_jobs'].put(('journal', my_outbreak_file, journal_rows))
+            return
+    
+    # Full write (or compaction of the journal)
+    shot['save_full_next'] = False
+    shot['save_jobs'].put(('full', my_outbreak_file, snapshot_outbreak_records()))
+
+
+# Encryption password popup
+def popup_encryption_password(new_password=False):
+    """
+    Asks for the password of encrypted outbreak files and sets it (see set_encryption_password())
+    new_password=True (Settings > Data file encryption): asks twice and sets it for the loaded outbreak (see set_outbreak_password()),
+    an empty password turns its encryption off.
+    returns bool: True if a password was set
+    """
+    password_prompt = shot['msg_encryption_new_password'] if new_password else shot['msg_encryption_password']
+    password = sg.popup_get_text(password_prompt, title=shot['settings_encryption'], password_char='*', keep_on_top=True)
+    if password is None: return False # user clicked cancel
+    
+    if password == '':
+        if new_password:
+            set_outbreak_password(None)
+            sg.popup(shot['msg_encryption_off'], title=shot['settings_encryption'], keep_on_top=True)
+        return False
+    
+    if new_password:
+        password_repeat = sg.popup_get_text(shot['msg_encryption_repeat'], title=shot['settings_encryption'], password_char='*', keep_on_top=True)
+        if password_repeat is None: return False
+        if password_repeat != password:
+            popup_some_error(shot['err_encryption_mismatch'])
+            return False
+    
+    if new_password:
+        set_outbreak_password(password)
+        sg.popup(shot['msg_encryption_on'], title=shot['settings_encryption'], keep_on_top=True)
+    else:
+        set_encryption_password(password)
+    return True
+
+
+# File Open popup
+def popup_open_outbreak_file():
+    """
+    graphical user interface part of locating and opening files.
+    'if popup_open_outbreak_file():' conditional will return True if file is sane.
+    returns bool: True if file open success. (If True, set outbreak_filename global to input).
+    """
+    
+    # This is weird but it works
+    my_outbreak_file = sg.popup_get_file(shot['file_open'], title=shot['file_open'], save_as=False, multiple_files=False, file_types=shot['outbreak_file_types'], no_window=True, keep_on_top=True)
+
+    if type(my_outbreak_file) is str and my_outbreak_file != '':
+            print(f'my_outbreak_file={my_outbreak_file}') # debug
+            print(f'type(my_outbreak_file)={type(my_outbreak_file)}') # debug
+    else:
+        # User clicked cancel
+        # bugfix Cancel op: sg.popup_get_file returns tuple
+        # bugfix cancel x2: 2nd time the sg.popup_get_file which normally is tuple returns empty string
+        return False
+    
+    # set global filename var
+    global outbreak_filename
+
+    # sanity check
+    if outbreak_file_sanity_pass(my_outbreak_file):
+        outbreak_filename = my_outbreak_file
+        return True
+    else:
+        outbreak_filename = None
+        return False
+    
+
+
+# FILTERING
+# A filter (shot['filter']) is a dict field => condition, and keeps the cases that meet every condition:
+#
+#   {'sample_date': ('2020-05-01', '2020-05-31'),   from, to (either None for open-ended), also 'DOB'
+#    'age': (18, 67),                               from, to (ditto), both included
+#    'department': ('Surgery', 'ICU'),              any of these values, also for role, sample_type, gender, room ...
+#    'risks': ('catheter', 'dialysis')}             any of these words (case-insensitive) in the risk factors
+#
+# The filter is compiled to a selection: a numpy bool array with one element per case in the linelist, in linelist order.
+# Charts and exports take the selection and pick the cases from the column(s) they need, so no rows are ever copied
+# (see epicurve_selection_bins(), gchart_gaps() and export_linelist_sheet()).
+# Each value of a categorical field gets a bitmap (bool array, from the category codes in one comparison),
+# and conditions are combined with bitwise OR (values of a field) and AND (fields). Bitmaps and the selection
+# are kept (shot['filter_bitmaps'], shot['filter_selection']) until the linelist changes (see shot['data_version']).
+
+filter_date_fields = ('sample_date', 'DOB')
+filter_range_fields = ('age',)
+filter_word_fields = ('risks',)
+
+
+def filter_key(filter_spec):
+    """
+    Returns filter_spec (dict, see Note on FILTERING) as a hashable key (tuple), e.g. to tell whether cached results are still valid
+    """
+    return tuple(sorted( (field, tuple(condition)) for field, condition in (filter_spec or {}).items() ))
+
+
+def get_filter_bitmap(linelist, field, value):
+    """
+    Returns bitmap (numpy bool array) of the cases in linelist where field is value (str, '' for missing)
+    or, for the fields in filter_word_fields, contains the word value. Bitmaps are kept until the linelist changes.
+    """
+    cache_key = shot['data_version']
+    if shot.get('filter_bitmaps') is None or shot['filter_bitmaps'][0] != cache_key:
+        shot['filter_bitmaps'] = (cache_key, {})
+    bitmaps = shot['filter_bitmaps'][1]
+    
+    if (field, value) not in bitmaps:
+        column = linelist[field]
+        if field in filter_word_fields:
+            bitmaps[(field, value)] = column.astype(object).fillna('').astype(str).str.casefold().str.contains(str(value).casefold(), regex=False).to_numpy(dtype=bool)
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            # One comparison of the category codes, whatever the number of cases
+            categories = column.cat.categories.astype(str).str.strip()
+            codes = column.cat.codes.to_numpy()
+            if value == '':
+                bitmaps[(field, value)] = codes == -1
+            else:
+                bitmaps[(field, value)] = np.isin(codes, np.flatnonzero(categories == value))
+        else:
+            bitmaps[(field, value)] = (column.astype(object).fillna('').astype(str).str.strip() == value).to_numpy(dtype=bool)
+    return bitmaps[(field, value)]
+
+
+def filter_selection(linelist, filter_spec):
+    """
+    Compiles filter_spec (dict, see Note on FILTERING) to a selection of the cases in linelist (numpy bool array, in linelist order)
+    Unknown fields raise KeyError, and dates or ages that do not parse raise ValueError.
+    """
+    selection = np.ones(len(linelist), dtype=bool)
+    for field, condition in (filter_spec or {}).items():
+        if field in filter_date_fields or field in filter_range_fields:
+            if field in filter_date_fields:
+                values = linelist[field].to_numpy(dtype='datetime64[D]')
+                bounds = [ None if bound in (None, '') else np.datetime64(pd.to_datetime(bound, errors='raise').date(), 'D') for bound in condition ]
+            else:
+                values = linelist[field].to_numpy(dtype=np.float64, na_value=np.nan)
+                bounds = [ None if bound in (None, '') else float(bound) for bound in condition ]
+            # Missing values compare False, so cases without a date (or age) drop out of a range
+            if bounds[0] is not None: selection &= values >= bounds[0]
+            if bounds[1] is not None: selection &= values <= bounds[1]
+        else:
+            field_selection = np.zeros(len(linelist), dtype=bool)
+            for value in condition:
+                field_selection |= get_filter_bitmap(linelist, field, value)
+            selection &= field_selection
+    return selection
+
+
+def get_filter_selection():
+    """
+    Returns the selection (numpy bool array, see Note on FILTERING) of shot['filter'] on the loaded linelist,
+    or None if there is no filter. Kept (shot['filter_selection']) until the linelist or filter changes.
+    An outbreak database without unsaved case changes is asked instead, if it can be (see database_filter_selection()).
+    """
+    if not shot.get('filter'):
+        return None
+    linelist = get_linelist()
+    cache_key = (shot['data_version'], filter_key(shot['filter']))
+    if shot.get('filter_selection') is None or shot['filter_selection'][0] != cache_key:
+        selection = None
+        if outbreak_filename is not None and outbreak_file_backend(outbreak_filename) == 'sqlite' and not shot['changed']['data']:
+            selection = database_filter_selection(outbreak_filename, linelist, shot['filter']) # saved as loaded, so the indexes can answer
+        if selection is None:
+            selection = filter_selection(linelist, shot['filter'])
+        shot['filter_selection'] = (cache_key, selection)
+    return shot['filter_selection'][1]
+
+
+def export_linelist_sheet(my_file, selection=None):
+    """
+    Writes the cases of the loaded linelist to spreadsheet (CSV) my_file, with the column names of the outbreak file
+    (so it can be imported again). Only the cases in selection (numpy bool array, see Note on FILTERING) if set.
+    Cases are converted a chunk (shot['import_chunk_rows']) at a time, and my_file is replaced atomically.
+    Returns int (number of cases written). Errors are raised (OSError).
+    """
+    linelist = get_linelist()
+    positions = np.arange(len(linelist)) if selection is None else np.flatnonzero(selection)
+    chunk_rows = shot['import_chunk_rows']
+    
+    def write_sheet(sheet_file):
+        sheet = io.TextIOWrapper(sheet_file, encoding='utf-8', newline='')
+        sheet_writer = csv.writer(sheet, delimiter=';')
+        sheet_writer.writerow(shot['headers']['data'][1:])
+        for first in range(0, len(positions), chunk_rows):
+            sheet_writer.writerows( row[1:] for row in linelist_to_rows(linelist.take(positions[first:first + chunk_rows])) )
+        sheet.flush()
+        sheet.detach() # leave sheet_file open for atomic_write_file()
+    
+    atomic_write_file(my_file, write_sheet)
+    return len(positions)
+
+
+def popup_filter():
+    """
+    Lets the user set the filter (shot['filter'], see Note on FILTERING) on the loaded linelist
+    Values to choose from are the ones in the linelist. returns bool: True if the filter was changed (or cleared)
+    """
+    linelist = get_linelist()
+    my_filter = shot.get('filter') or {}
+    choice_fields = ('department', 'role', 'sample_type', 'gender')
+    choice_names = (shot['msg_hospital_department'], shot['msg_strata_role'], shot['msg_sample_type'], shot['msg_strata_gender'])
+    
+    def choices(field):
+        return sorted({ str(value).strip() for value in linelist[field].dropna().unique() } - {''})
+    
+    def bound(field, n):
+        return str(my_filter.get(field, ('', ''))[n] or '')
+    
+    filter_layout = [
+                    [sg.T(f"{shot['msg_filter_dates']}: ", size=(24,1)), sg.In(bound('sample_date', 0), key='FILTER_date_from', size=(12,1)), sg.T('-'), sg.In(bound('sample_date', 1), key='FILTER_date_to', size=(12,1))],
+                    [sg.T(f"{shot['msg_filter_ages']}: ", size=(24,1)), sg.In(bound('age', 0), key='FILTER_age_from', size=(12,1)), sg.T('-'), sg.In(bound('age', 1), key='FILTER_age_to', size=(12,1))],
+                    [ sg.Column([[sg.T(choice_name)], [sg.Listbox(choices(field), default_values=[ value for value in my_filter.get(field, ()) ], select_mode=sg.LISTBOX_SELECT_MODE_MULTIPLE, size=(20,8), key=f"FILTER_{field}")]]) for field, choice_name in zip(choice_fields, choice_names) ],
+                    [sg.T(f"{shot['msg_filter_risks']}: ", size=(24,1)), sg.In(', '.join(my_filter.get('risks', ())), key='FILTER_risks', size=(40,1))],
+                    [sg.Button('OK', key='FILTER_ok'), sg.Button(shot['msg_filter_clear'], key='FILTER_clear'), sg.Button(shot['msg_cancel'], key='FILTER_cancel')]
+                    ]
+    filter_window = sg.Window(shot['stats_filtering'], layout=filter_layout, margins=(2, 2), resizable=True, keep_on_top=True)
+    
+    filter_changed = False
+    while True:
+        filter_event, filter_values = filter_window.read()
+        if filter_event in (sg.WIN_CLOSED, 'FILTER_cancel'):
+            break
+        if filter_event == 'FILTER_clear':
+            shot['filter'] = {}
+            filter_changed = True
+            break
+        
+        # FILTER_ok
+        new_filter = {}
+        for field, from_key, to_key in (('sample_date', 'FILTER_date_from', 'FILTER_date_to'), ('age', 'FILTER_age_from', 'FILTER_age_to')):
+            if filter_values[from_key].strip() or filter_values[to_key].strip():
+                new_filter[field] = (filter_values[from_key].strip() or None, filter_values[to_key].strip() or None)
+        for field in choice_fields:
+            if filter_values[f"FILTER_{field}"]: new_filter[field] = tuple(filter_values[f"FILTER_{field}"])
+        risk_words = tuple( word.strip() for word in filter_values['FILTER_risks'].split(sep=',') if word.strip() )
+        if risk_words: new_filter['risks'] = risk_words
+        
+        try:
+            filter_selection(linelist.iloc[:0], new_filter) # dates and ages parse?
+        except (ValueError, TypeError):
+            popup_some_error(shot['err_filter_value'])
+            continue
+        shot['filter'] = new_filter
+        filter_changed = True
+        break
+    
+    filter_window.close()
+    return filter_changed
+
+
+# EPICURVE
+# Cases are counted per bucket (day, ISO week starting on Monday, or month) of their sample date, which doubles as
+# illness onset (see the legend in add_linelist_case()). Binning is done on whole numpy arrays (no loop over cases):
+# dates become day numbers, day numbers become bucket numbers, and np.unique counts them.
+# The curve runs from the start of the outbreak (or the first case) to its end, or to today while the outbreak
+# is open-ended (end = N/A), and empty buckets in between are filled in with zero.
+#
+# The Epicurve tab draws from a live cube (shot['epicurve_cube'], see get_epicurve_cube()) rather than binning all cases
+# on every redraw: for each bucket size, a Counter of cases per cell (bucket number, department, building, role, gender).
+# Building (and a missing department) come from the room of the case and the room lists of the hospital (shot['hospital']).
+# Cells change by +1/-1 whenever cases are added, removed or edited (see append_linelist(), replace_linelist_cases() and
+# remove_linelist_case()), so stratifying or filtering the curve only adds up cells (see epicurve_cube_bins()).
+# The cube is dropped (None) when the linelist is replaced as a whole or the hospital changes, and rebuilt when next drawn.
+
+epicurve_buckets = ('day', 'week', 'month')
+epicurve_cube_dimensions = ('bucket', 'department', 'building', 'role', 'gender')
+
+
+def outbreak_period():
+    """
+    Returns start and end (numpy datetime64[D], or None if not set) of the loaded outbreak (shot['admin'])
+    An open-ended outbreak (end = N/A) ends today.
+    """
+    outbreak_info = shot['admin'][min(shot['admin'])] if shot.get('admin') else {}
+    period = []
+    for info_type in 'start', 'end':
+        info_date = pd.to_datetime(outbreak_info.get(info_type, ''), errors='coerce')
+        period.append(None if pd.isna(info_date) else np.datetime64(info_date.date(), 'D'))
+    if period[1] is None and outbreak_info:
+        period[1] = np.datetime64(datetime.date.today(), 'D')
+    return period[0], period[1]
+
+
+def epicurve_bucket_numbers(days, bucket):
+    """
+    Returns bucket numbers (numpy int64 array) of days (numpy datetime64[D] array)
+    Bucket numbers count days, weeks (ISO, from Monday) or months since 1970, so consecutive buckets have consecutive numbers.
+    """
+    if bucket == 'month':
+        return days.astype('datetime64[M]').astype(np.int64)
+    day_numbers = days.astype(np.int64)
+    if bucket == 'week':
+        return (day_numbers + 3) // 7 # 1970-01-01 was a Thursday, so weeks since the Monday before it
+    return day_numbers
+
+
+def epicurve_bucket_starts(bucket_numbers, bucket):
+    """
+    The opposite of epicurve_bucket_numbers(): returns first day (numpy datetime64[D] array) of each bucket number
+    """
+    if bucket == 'month':
+        return bucket_numbers.astype('datetime64[M]').astype('datetime64[D]')
+    if bucket == 'week':
+        return (bucket_numbers * 7 - 3).astype('datetime64[D]')
+    return bucket_numbers.astype('datetime64[D]')
+
+
+def epicurve_fill(bucket_numbers, counts, bucket, start=None, end=None):
+    """
+    Returns bucket start dates (numpy datetime64[D] array) and case counts (numpy int64 array) of the whole epicurve,
+    from the counts (numpy arrays) of the bucket_numbers that have cases. Empty buckets are filled in with zero,
+    and the curve runs from start to end (numpy datetime64[D] or None, see outbreak_period()) or wider, if there are cases outside.
+    """
+    period = [ day for day in (start, end) if day is not None ]
+    all_numbers = np.concatenate([bucket_numbers, epicurve_bucket_numbers(np.array(period, dtype='datetime64[D]'), bucket)])
+    if len(all_numbers) == 0:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64)
+    
+    first_bucket, last_bucket = all_numbers.min(), all_numbers.max()
+    curve = np.zeros(last_bucket - first_bucket + 1, dtype=np.int64)
+    curve[bucket_numbers - first_bucket] = counts
+    return epicurve_bucket_starts(np.arange(first_bucket, last_bucket + 1), bucket), curve
+
+
+def epicurve_bins(linelist, bucket='day', start=None, end=None, date_field='sample_date', selection=None):
+    """
+    Bins the cases of linelist (DataFrame) by date_field into buckets ('day', 'week' or 'month', see Note on EPICURVE)
+    start and end (numpy datetime64[D] or None, see outbreak_period()) set the range of the curve,
+    which is widened to include every case. Cases without a date are not counted, nor cases outside selection
+    (numpy bool array, see Note on FILTERING) if set.
+    Returns bucket start dates (numpy datetime64[D] array) and case counts (numpy int64 array), ready to plot.
+    """
+    days = linelist[date_field].to_numpy(dtype='datetime64[D]')
+    if selection is not None: days = days[selection]
+    days = days[~np.isnat(days)]
+    bucket_numbers, counts = np.unique(epicurve_bucket_numbers(days, bucket), return_counts=True)
+    return epicurve_fill(bucket_numbers, counts, bucket, start, end)
+
+
+def hospital_room_places():
+    """
+    Returns dict room (str) => (department, building) of the configured hospital (shot['hospital'] 'dep' and 'bld' room lists)
+    Rooms listed under more than one department (or building) have '' there, as there is no telling which one a case was in.
+    """
+    room_places = {}
+    hospital_info = shot.get('hospital') or {}
+    for place_number, place_type in enumerate(('dep', 'bld')):
+        for place_name, rooms in (hospital_info.get(place_type) or {}).items():
+            for room in rooms:
+                places = room_places.setdefault(str(room).strip(), ['', '', set(), set()])
+                places[place_number + 2].add(place_name)
+    return { room: tuple(next(iter(names)) if len(names) == 1 else '' for names in places[2:]) for room, places in room_places.items() }
+
+
+def epicurve_cube_strata(cases):
+    """
+    Returns the strata of cases (linelist DataFrame) as a DataFrame of strings ('' if unknown), one column per cube dimension
+    but the bucket (see Note on EPICURVE). The department of a case without one is taken from its room, if the hospital knows it.
+    """
+    def strings(column):
+        # Category columns are converted once per category, not once per case
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = np.append(column.cat.categories.astype(str).str.strip().to_numpy(dtype=object), '')
+            return pd.Series(categories[column.cat.codes.to_numpy()], index=column.index) # code -1 (missing) is the last, ''
+        return column.astype(object).where(column.notna(), '').astype(str).str.strip()
+    
+    if shot.get('epicurve_cube_rooms') is None:
+        shot['epicurve_cube_rooms'] = hospital_room_places()
+    room_places = shot['epicurve_cube_rooms']
+    rooms = strings(cases['room'])
+    departments = strings(cases['department'])
+    room_departments = rooms.map({ room: places[0] for room, places in room_places.items() }).fillna('')
+    return pd.DataFrame({
+                          'department': departments.where(departments != '', room_departments),
+                          'building': rooms.map({ room: places[1] for room, places in room_places.items() }).fillna(''),
+                          'role': strings(cases['role']),
+                          'gender': strings(cases['gender'])
+                          }, index=cases.index)
+
+
+def get_epicurve_cube():
+    """
+    Returns the live epicurve cube (see Note on EPICURVE): dict bucket => collections.Counter (cube cell => cases)
+    It is built from the linelist if needed.
+    """
+    if shot.get('epicurve_cube') is None:
+        shot['epicurve_cube'] = { bucket: collections.Counter() for bucket in epicurve_buckets }
+        shot['epicurve_cube_rooms'] = hospital_room_places()
+        update_epicurve_cube(get_linelist(), 1)
+    return shot['epicurve_cube']
+
+
+def update_epicurve_cube(cases, change):
+    """
+    Changes the live epicurve cube by change (1 for added cases, -1 for removed ones) for each of cases (linelist DataFrame)
+    Costs the same whatever the size of the linelist. Does nothing if the cube has not been built (yet).
+    """
+    if shot.get('epicurve_cube') is None:
+        return
+    cases = cases[cases['sample_date'].notna()]
+    if len(cases) == 0:
+        return
+    days = cases['sample_date'].to_numpy(dtype='datetime64[D]')
+    
+    # Number the strata once, then count (bucket, stratum) pairs as single numbers for each bucket size
+    strata = epicurve_cube_strata(cases).groupby(list(epicurve_cube_dimensions[1:]), sort=False)
+    stratum_numbers = strata.ngroup().to_numpy()
+    strata = strata.size().index.tolist() # in order of stratum number
+    for bucket, cube in shot['epicurve_cube'].items():
+        bucket_numbers = epicurve_bucket_numbers(days, bucket)
+        first_bucket = bucket_numbers.min()
+        cell_numbers, counts = np.unique((bucket_numbers - first_bucket) * len(strata) + stratum_numbers, return_counts=True)
+        for cell_number, count in zip(cell_numbers.tolist(), counts.tolist()):
+            cell = (int(first_bucket) + cell_number // len(strata),) + strata[cell_number % len(strata)]
+            cube[cell] += change * count
+            if cube[cell] == 0: del cube[cell]
+
+
+def epicurve_cube_bins(bucket='day', start=None, end=None, strata=None, where=None):
+    """
+    Returns the epicurve of the loaded linelist as epicurve_bins() would, but sliced from the live cube (see get_epicurve_cube()),
+    and the counts per stratum: dict stratum (str, '' if unknown) => counts (numpy int64 array), empty unless strata is given.
+    strata (str) is the cube dimension to stratify by ('department', 'building', 'role' or 'gender'),
+    and where (dict dimension => value) keeps only the cases with those values, e.g. {'department': 'Surgery'}
+    """
+    cube = get_epicurve_cube()[bucket]
+    strata_number = epicurve_cube_dimensions.index(strata) if strata else None
+    where_numbers = [ (epicurve_cube_dimensions.index(dimension), value) for dimension, value in (where or {}).items() ]
+    
+    strata_cells = collections.defaultdict(collections.Counter)
+    for cell, count in cube.items():
+        if all( cell[number] == value for number, value in where_numbers ):
+            strata_cells[cell[strata_number] if strata else ''][cell[0]] += count
+    
+    # The total first, then each stratum on the same buckets
+    bucket_counts = collections.Counter()
+    for stratum_cells in strata_cells.values():
+        bucket_counts.update(stratum_cells)
+    bucket_numbers = np.fromiter(bucket_counts.keys(), dtype=np.int64, count=len(bucket_counts))
+    counts = np.fromiter(bucket_counts.values(), dtype=np.int64, count=len(bucket_counts))
+    bucket_starts, curve = epicurve_fill(bucket_numbers, counts, bucket, start, end)
+    
+    strata_curves = {}
+    if strata and len(curve) > 0:
+        first_bucket = epicurve_bucket_numbers(bucket_starts[:1], bucket)[0]
+        for stratum, stratum_cells in strata_cells.items():
+            strata_curves[stratum] = np.zeros(len(curve), dtype=np.int64)
+            strata_curves[stratum][np.fromiter(stratum_cells.keys(), dtype=np.int64) - first_bucket] = list(stratum_cells.values())
+    return bucket_starts, curve, strata_curves
+
+
+def epicurve_selection_bins(selection, bucket='day', start=None, end=None, strata=None):
+    """
+    Returns the epicurve of the cases in selection (numpy bool array, see Note on FILTERING) of the loaded linelist,
+    as epicurve_cube_bins() would. Filters may use any field, so this bins the selected sample dates (and strata)
+    rather than the cube, which only knows its own dimensions.
+    """
+    linelist = get_linelist()
+    days = linelist['sample_date'].to_numpy(dtype='datetime64[D]')[selection]
+    dated = ~np.isnat(days)
+    bucket_numbers = epicurve_bucket_numbers(days[dated], bucket)
+    bucket_starts, curve = epicurve_fill(*np.unique(bucket_numbers, return_counts=True), bucket, start, end)
+    
+    strata_curves = {}
+    if strata and len(curve) > 0:
+        stratum_numbers, strata_names = pd.factorize(epicurve_cube_strata(linelist)[strata].to_numpy()[selection][dated])
+        first_bucket = epicurve_bucket_numbers(bucket_starts[:1], bucket)[0]
+        cells = np.bincount(stratum_numbers * len(curve) + (bucket_numbers - first_bucket), minlength=len(strata_names) * len(curve))
+        strata_curves = dict(zip(strata_names.tolist(), cells.reshape(len(strata_names), len(curve))))
+    return bucket_starts, curve, strata_curves
+
+
+def epicurve_live_bins(bucket='day', start=None, end=None):
+    """
+    Returns the epicurve of the loaded linelist as epicurve_bins() would, but from the live cube (see get_epicurve_cube())
+    """
+    return epicurve_cube_bins(bucket, start, end)[:2]
+
+
+def epicurve_bucket_label(bucket_start, bucket):
+    """
+    Returns axis label (str) of bucket starting on bucket_start (numpy datetime64[D]), e.g. 2020-05-01, 2020-W18 or 2020-05
+    """
+    bucket_date = pd.Timestamp(bucket_start)
+    if bucket == 'month':
+        return bucket_date.strftime('%Y-%m')
+    if bucket == 'week':
+        iso_year, iso_week, iso_day = bucket_date.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    return bucket_date.strftime('%Y-%m-%d')
+
+
+def epicurve_layers(counts, strata_counts=None):
+    """
+    Returns the layers of stacked epicurve bars, bottom up: list of (label, counts, colour)
+    The largest strata (in strata_counts, from epicurve_cube_bins()) are at the bottom,
+    and strata beyond the colours of shot['epicurve_colours'] are lumped together (in grey).
+    """
+    colours = shot['epicurve_colours']
+    if not strata_counts:
+        return [ ('', counts, colours[0]) ]
+    strata = sorted(strata_counts, key=lambda stratum: -strata_counts[stratum].sum())
+    layers = [ (stratum or shot['msg_unknown'], strata_counts[stratum], colour) for stratum, colour in zip(strata, colours) ]
+    if len(strata) > len(colours):
+        layers.append((shot['msg_other'], sum( strata_counts[stratum] for stratum in strata[len(colours):] ), 'grey'))
+    return layers
+
+
+def draw_epicurve(graph, bucket_starts, counts, bucket, strata_counts=None):
+    """
+    Draws epicurve (from epicurve_bins()) as bar chart on graph (sg.Graph, coordinates as in tab_epicurve())
+    One rectangle per bucket, and a handful of axis labels.
+    With strata_counts (from epicurve_cube_bins()) the bars are stacked by stratum (see epicurve_layers()), with a legend.
+    Periods from the time series records (e.g. ward closures) are shaded behind the bars (see tseries_epicurve_spans()).
+    """
+    graph.erase()
+    width, height = shot['epicurve_graph_size']
+    if len(counts) == 0 or counts.max() == 0:
+        graph.draw_text(shot['msg_epicurve_no_cases'], (width // 2, height // 2))
+        return
+    
+    # Room for axis labels to the left and below the bars
+    left, bottom, top = 40, 30, height - 15
+    bar_width = (width - left - 10) / len(counts)
+    y_scale = (top - bottom) / counts.max()
+    
+    graph.draw_line((left, bottom), (width - 10, bottom))
+    graph.draw_line((left, bottom), (left, top))
+    graph.draw_text(str(counts.max()), (left // 2, top))
+    graph.draw_text('0', (left // 2, bottom))
+    
+    for n, (title, first_day, last_day, first, last) in enumerate(tseries_epicurve_spans(bucket_starts, bucket)):
+        graph.draw_rectangle((left + first * bar_width, top), (left + (last + 1) * bar_width, bottom + 1), fill_color='gainsboro', line_color='gainsboro')
+        graph.draw_text(title[:18], (left + (first + last + 1) * bar_width / 2, top - 6 - (n % 3) * 12), font=('Helvetica', 8)) # staggered, periods may overlap
+    tseries_skipped = get_tseries_index()['skipped']
+    if tseries_skipped > 0:
+        graph.draw_text(f"{tseries_skipped} {shot['msg_tseries_skipped']}", (width // 2, 6), font=('Helvetica', 8), color='red')
+    
+    layers = epicurve_layers(counts, strata_counts)
+    layer_bottom = np.zeros(len(counts), dtype=np.int64)
+    for label, layer_counts, colour in layers:
+        for n in np.flatnonzero(layer_counts):
+            x = left + n * bar_width
+            graph.draw_rectangle((x, bottom + (layer_bottom[n] + layer_counts[n]) * y_scale), (x + max(bar_width - 1, 1), bottom + layer_bottom[n] * y_scale), fill_color=colour, line_color=colour)
+        layer_bottom = layer_bottom + layer_counts
+    
+    # Legend in the top right corner
+    if strata_counts:
+        for n, (label, layer_counts, colour) in enumerate(layers):
+            graph.draw_rectangle((width - 130, top - n * 14), (width - 120, top - n * 14 - 10), fill_color=colour, line_color=colour)
+            graph.draw_text(str(label)[:18], (width - 65, top - n * 14 - 5), font=('Helvetica', 8))
+    
+    label_every = max(1, len(counts) // 6)
+    for n in range(0, len(counts), label_every):
+        graph.draw_text(epicurve_bucket_label(bucket_starts[n], bucket), (left + (n + 0.5) * bar_width, bottom - 12), font=('Helvetica', 8))
+
+
+def epicurve_tab_options(bucket_name, strata_name=None):
+    """
+    Returns bucket and strata (str, strata None for none) of bucket_name and strata_name (as shown in the epicurve tab's drop-downs)
+    """
+    bucket = epicurve_buckets[shot['epicurve_bucket_names'].index(bucket_name)] if bucket_name in shot['epicurve_bucket_names'] else 'day'
+    strata = epicurve_cube_dimensions[shot['epicurve_strata_names'].index(strata_name)] if strata_name in shot['epicurve_strata_names'][1:] else None
+    return bucket, strata
+
+
+def current_epicurve(bucket='day', strata=None):
+    """
+    Returns the epicurve of the loaded outbreak as epicurve_cube_bins() would: from the live cube,
+    or from the filtered cases if there is a filter (see Note on FILTERING)
+    """
+    start, end = outbreak_period()
+    selection = get_filter_selection()
+    if selection is None:
+        return epicurve_cube_bins(bucket, start, end, strata)
+    return epicurve_selection_bins(selection, bucket, start, end, strata)
+
+
+def update_epicurve_tab(window, bucket_name, strata_name=None):
+    """
+    (Re)draws the epicurve tab from the loaded outbreak (see current_epicurve()),
+    binned by bucket_name and stratified by strata_name (as shown in the tab's drop-downs)
+    """
+    bucket, strata = epicurve_tab_options(bucket_name, strata_name)
+    bucket_starts, counts, strata_counts = current_epicurve(bucket, strata)
+    draw_epicurve(window['EPI_graph'], bucket_starts, counts, bucket, strata_counts)
+
+
+# G-CHART
+# A G-chart plots the number of days between consecutive cases (the gaps), and suits rare infections that are
+# watched over long periods (e.g. C. difficile hospital-wide over years), where an epicurve is mostly empty.
+# Sample dates are sorted, and the gaps are the differences between neighbours (0 for cases on the same day).
+# The gaps of a stable infection rate are geometrically distributed around their mean (g-bar), so the control
+# limits are the geometric probability limits at the same false alarm rate as 3 sigma limits (0.135% per side):
+#
+#     p = 1 / (g-bar + 1),   LCL = ln(1 - 0.00135) / ln(1 - p) - 1 (at least 0),   UCL = ln(0.00135) / ln(1 - p) - 1
+#
+# Gaps below the LCL (cases coming closer together) signal more infections, gaps above the UCL signal fewer.
+# With a rolling baseline, each gap is judged against the limits of the gaps just before it (not counting itself),
+# so limits are recalculated as new cases arrive. Everything is done on whole numpy arrays: the rolling g-bar
+# of every gap comes from one cumulative sum, and the limits from one call of np.log.
+
+gchart_alpha = 0.00135
+
+
+def gchart_gaps(linelist, sample_type=None, date_field='sample_date', selection=None):
+    """
+    Returns sorted case dates (numpy datetime64[D] array) and gaps in days between them (numpy int64 array, one shorter)
+    Only cases of sample_type (str, or None for all) with a date_field are counted,
+    and only those in selection (numpy bool array, see Note on FILTERING) if set.
+    """
+    days = linelist[date_field].to_numpy(dtype='datetime64[D]')
+    if sample_type is not None:
+        selection = get_filter_bitmap(linelist, 'sample_type', sample_type) & (True if selection is None else selection)
+    if selection is not None: days = days[selection]
+    days = np.sort(days[~np.isnat(days)])
+    return days, np.diff(days.astype(np.int64))
+
+
+def gchart_limits(gaps, baseline=None):
+    """
+    Returns center line (g-bar), lower and upper control limits (numpy float arrays, one value per gap) of gaps (see Note on G-CHART)
+    baseline (int) is the number of preceding gaps each gap is judged against (rolling),
+    or None to judge all gaps against the g-bar of all gaps. Gaps without preceding gaps get NaN limits.
+    """
+    gaps = np.asarray(gaps, dtype=np.float64)
+    if baseline is None:
+        g_bar = np.full(len(gaps), gaps.mean() if len(gaps) > 0 else np.nan)
+    else:
+        # Sum and count of the (up to) baseline gaps before each gap, from a running sum
+        running_sum = np.concatenate([[0.0], np.cumsum(gaps)])
+        gap_numbers = np.arange(len(gaps))
+        first_gap = np.maximum(gap_numbers - baseline, 0)
+        baseline_count = gap_numbers - first_gap
+        with np.errstate(invalid='ignore', divide='ignore'):
+            g_bar = (running_sum[gap_numbers] - running_sum[first_gap]) / baseline_count
+    
+    # Geometric probability limits. When g-bar is 0 (every case on the same day) so are the limits.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_q = np.log1p(-1 / (g_bar + 1))
+        lcl = np.where(g_bar > 0, np.maximum(np.log1p(-gchart_alpha) / log_q - 1, 0), 0.0)
+        ucl = np.where(g_bar > 0, np.log(gchart_alpha) / log_q - 1, 0.0)
+    lcl[np.isnan(g_bar)] = np.nan
+    ucl[np.isnan(g_bar)] = np.nan
+    return g_bar, lcl, ucl
+
+
+def get_gchart_gaps(sample_type=None):
+    """
+    Returns gchart_gaps() of the loaded linelist (filtered by shot['filter'], see Note on FILTERING).
+    Kept (shot['gchart_gaps']) until the linelist, filter or sample_type changes,
+    so changing the baseline or redrawing does not sort all cases again.
+    """
+    cache_key = (shot['data_version'], filter_key(shot.get('filter')), sample_type)
+    if shot.get('gchart_gaps') is None or shot['gchart_gaps'][0] != cache_key:
+        shot['gchart_gaps'] = (cache_key, gchart_gaps(get_linelist(), sample_type, selection=get_filter_selection()))
+    return shot['gchart_gaps'][1]
+
+
+def draw_gchart(graph, days, gaps, g_bar, lcl, ucl):
+    """
+    Draws G-chart (gaps from gchart_gaps(), limits from gchart_limits()) on graph (sg.Graph, coordinates as in tab_gchart())
+    One point per gap, joined by lines, with center line and control limits. Gaps outside the limits are red.
+    """
+    graph.erase()
+    width, height = shot['gchart_graph_size']
+    if len(gaps) == 0:
+        graph.draw_text(shot['msg_gchart_few_cases'], (width // 2, height // 2))
+        return
+    
+    # Room for axis labels to the left and below the points
+    left, bottom, top = 40, 30, height - 15
+    y_max = max(gaps.max(), 0 if np.isnan(ucl).all() else np.nanmax(ucl), 1)
+    x_step = (width - left - 20) / max(len(gaps) - 1, 1)
+    x = left + 10 + np.arange(len(gaps)) * x_step
+    y = bottom + gaps * ((top - bottom) / y_max)
+    
+    graph.draw_line((left, bottom), (width - 10, bottom))
+    graph.draw_line((left, bottom), (left, top))
+    graph.draw_text(str(int(round(y_max))), (left // 2, top))
+    graph.draw_text('0', (left // 2, bottom))
+    
+    # Center line and limits, drawn as steps where they change (rolling baseline)
+    for line, colour in ((g_bar, 'dark green'), (lcl, 'orange red'), (ucl, 'orange red')):
+        line_y = bottom + line * ((top - bottom) / y_max)
+        drawn = ~np.isnan(line_y)
+        run_starts = np.flatnonzero(drawn & np.concatenate([[True], line_y[1:] != line_y[:-1]]))
+        run_ends = np.flatnonzero(drawn & np.concatenate([line_y[:-1] != line_y[1:], [True]]))
+        for run_start, run_end in zip(run_starts, run_ends):
+            x_from = x[run_start] - x_step / 2 if run_start > 0 else x[run_start]
+            x_to = x[run_end] + x_step / 2 if run_end < len(gaps) - 1 else x[run_end]
+            graph.draw_line((x_from, line_y[run_start]), (x_to, line_y[run_start]), color=colour)
+    
+    # Thousands of gaps are more than there are pixels, so the points are only joined by lines then
+    for n in range(1, len(gaps)):
+        graph.draw_line((x[n - 1], y[n - 1]), (x[n], y[n]), color='steel blue')
+    if len(gaps) <= (width - left) // 4:
+        for n in range(len(gaps)):
+            graph.draw_point((x[n], y[n]), size=5, color='steel blue')
+    with np.errstate(invalid='ignore'):
+        for n in np.flatnonzero((gaps < lcl) | (gaps > ucl)):
+            graph.draw_point((x[n], y[n]), size=7, color='red')
+    
+    label_every = max(1, len(gaps) // 5)
+    for n in range(0, len(gaps), label_every):
+        graph.draw_text(epicurve_bucket_label(days[n + 1], 'day'), (x[n], bottom - 12), font=('Helvetica', 8))
+
+
+def gchart_tab_options(sample_type_name, baseline_name):
+    """
+    Returns sample_type (str, or None for all) and baseline (int, or None for all gaps) of sample_type_name and baseline_name
+    (as shown in the G-chart tab's drop-downs)
+    """
+    sample_type = None if sample_type_name in ('', None, shot['msg_gchart_all']) else sample_type_name
+    baseline = int(baseline_name) if str(baseline_name).isdigit() else None
+    return sample_type, baseline
+
+
+def current_gchart(sample_type=None, baseline=None):
+    """
+    Returns the G-chart of the loaded linelist: case dates and gaps (see get_gchart_gaps()), then g-bar, LCL and UCL (see gchart_limits())
+    """
+    days, gaps = get_gchart_gaps(sample_type)
+    return (days, gaps) + gchart_limits(gaps, baseline)
+
+
+def update_gchart_tab(window, sample_type_name, baseline_name):
+    """
+    (Re)draws the G-chart tab from the loaded linelist, for sample_type_name and baseline_name (as shown in the tab's drop-downs)
+    """
+    draw_gchart(window['GCHART_graph'], *current_gchart(*gchart_tab_options(sample_type_name, baseline_name)))
+    
+    # Sample types of the loaded linelist to choose from
+    sample_types = [ str(sample_type) for sample_type in get_linelist()['sample_type'].dropna().unique() ]
+    window['GCHART_sample_type'].update(values=[shot['msg_gchart_all']] + sorted(sample_types), value=sample_type_name or shot['msg_gchart_all'])
+
+
+# EXPOSURE
+# Cases were most likely exposed between their longest and their shortest incubation period before onset (sample date):
+# the exposure window. Incubation periods are set in days for the outbreak ('incubation start' and 'incubation end',
+# shortest and longest, with 'incubation mid' standing in for a missing one, see incubation_period()).
+#
+# Stays are where people were, and when: the linelist has the room and department of each sample, so a stay is a person
+# (fnr) in a department and room from their first to their last sample there (see linelist_stays()).
+# Stays overlapping a case's exposure window point to where it was infected (its own stays) and by whom (other stays).
+#
+# Stays are looked up in an interval tree (see build_interval_tree()): an implicit binary search tree over the stays
+# sorted by start, where each node also knows the latest end below it. A query skips every subtree that ends before
+# the window, and everything that starts after it, so it costs O(log n + overlaps) instead of a loop over all stays.
+
+interval_tree_leaf_size = 16 # small subtrees are checked in one go with numpy
+
+
+def incubation_period(outbreak_info=None):
+    """
+    Returns shortest and longest incubation period (int days) of outbreak_info (dict, default: the loaded outbreak's header)
+    Returns None if neither is set.
+    """
+    if outbreak_info is None:
+        outbreak_info = shot['admin'][min(shot['admin'])] if shot.get('admin') else {}
+    incubation = {}
+    for info_type in 'incubation start', 'incubation end', 'incubation mid':
+        incubation_days = pd.to_numeric(str(outbreak_info.get(info_type, '')).replace(',', '.'), errors='coerce')
+        if not pd.isna(incubation_days): incubation[info_type] = int(round(float(incubation_days)))
+    
+    shortest = incubation.get('incubation start', incubation.get('incubation mid'))
+    longest = incubation.get('incubation end', incubation.get('incubation mid', shortest))
+    if shortest is None:
+        shortest = longest
+    if shortest is None:
+        return None
+    return min(shortest, longest), max(shortest, longest)
+
+
+def exposure_windows(linelist, incubation):
+    """
+    Returns first and last day of exposure (numpy datetime64[D] arrays, NaT without a sample date) of each case in linelist (DataFrame)
+    incubation (tuple) is the shortest and longest incubation period in days (see incubation_period())
+    """
+    onset = linelist['sample_date'].to_numpy(dtype='datetime64[D]')
+    shortest, longest = incubation
+    return onset - np.timedelta64(longest, 'D'), onset - np.timedelta64(shortest, 'D')
+
+
+def linelist_people(linelist):
+    """
+    Returns the person (Series of str, by record key) of each case in linelist: its fnr,
+    or #<record key> for cases without fnr, which each count as a person of their own.
+    """
+    people = linelist['fnr'].astype(object).where(linelist['fnr'].notna(), '').astype(str).str.strip()
+    return people.where(people != '', '#' + pd.Series(linelist.index.astype(str), index=linelist.index))
+
+
+def linelist_stays(linelist):
+    """
+    Returns the stays (DataFrame: fnr, department, room, start, end) of the people in linelist (see Note on EXPOSURE and linelist_people())
+    """
+    def strings(column):
+        return column.astype(object).where(column.notna(), '').astype(str).str.strip()
+    
+    stays = pd.DataFrame({ 'fnr': linelist_people(linelist), 'department': strings(linelist['department']), 'room': strings(linelist['room']), 'day': linelist['sample_date'] })
+    stays = stays[stays['day'].notna()].groupby(['fnr', 'department', 'room'], sort=False)['day'].agg(['min', 'max'])
+    return stays.rename(columns={'min': 'start', 'max': 'end'}).reset_index()
+
+
+def build_interval_tree(starts, ends):
+    """
+    Returns interval tree (dict, see Note on EXPOSURE) of the intervals starts..ends (numpy arrays of numbers, ends included)
+    Queries (interval_tree_overlaps()) return positions in starts and ends.
+    """
+    order = np.argsort(starts, kind='stable')
+    tree = { 'start': np.asarray(starts)[order], 'end': np.asarray(ends)[order], 'order': order }
+    tree['max_end'] = tree['end'].copy()
+    
+    # Latest end below each node: the node of lo..hi is the middle one, its subtrees lo..mid and mid+1..hi
+    def latest_end(lo, hi):
+        if hi - lo <= interval_tree_leaf_size:
+            return tree['end'][lo:hi].max() if hi > lo else None
+        mid = (lo + hi) // 2
+        below = [ latest for latest in (latest_end(lo, mid), latest_end(mid + 1, hi)) if latest is not None ]
+        tree['max_end'][mid] = max([tree['end'][mid]] + below)
+        return tree['max_end'][mid]
+    
+    latest_end(0, len(order))
+    return tree
+
+
+def interval_tree_overlaps(tree, query_start, query_end):
+    """
+    Returns positions (numpy int array, in the order given to build_interval_tree()) of the intervals in tree
+    overlapping query_start..query_end (ends included)
+    """
+    found = []
+    pending = [ (0, len(tree['order'])) ]
+    while pending:
+        lo, hi = pending.pop()
+        if hi - lo <= interval_tree_leaf_size:
+            overlap = (tree['start'][lo:hi] <= query_end) & (tree['end'][lo:hi] >= query_start)
+            found.append(np.flatnonzero(overlap) + lo)
+            continue
+        mid = (lo + hi) // 2
+        if tree['max_end'][mid] < query_start:
+            continue # everything below ends before the query
+        pending.append((lo, mid))
+        if tree['start'][mid] <= query_end:
+            if tree['end'][mid] >= query_start: found.append(np.array([mid]))
+            pending.append((mid + 1, hi)) # the rest start later, so only if this one starts in time
+    return tree['order'][np.concatenate(found)] if found else np.array([], dtype=np.int64)
+
+
+def exposure_contacts(linelist=None, incubation=None):
+    """
+    Finds the stays (see linelist_stays()) overlapping the exposure window of each case in linelist (default: the loaded one)
+    incubation (tuple, default: incubation_period()) is the shortest and longest incubation period in days.
+    Returns DataFrame, one row per case and stay: case (record key), fnr, contact (fnr of the stay, the case's own stays too),
+    department, room, start and end (of the stay), exposure start and exposure end (of the case). Empty without incubation period.
+    """
+    if linelist is None: linelist = get_linelist()
+    if incubation is None: incubation = incubation_period()
+    contact_columns = ['case', 'fnr', 'contact', 'department', 'room', 'start', 'end', 'exposure start', 'exposure end']
+    if incubation is None or len(linelist) == 0:
+        return pd.DataFrame(columns=contact_columns)
+    
+    stays = linelist_stays(linelist)
+    tree = build_interval_tree(stays['start'].to_numpy(dtype='datetime64[D]').astype(np.int64), stays['end'].to_numpy(dtype='datetime64[D]').astype(np.int64))
+    first_days, last_days = exposure_windows(linelist, incubation)
+    
+    # Cases sampled on the same day share their exposure window, so each window is only looked up once
+    dated = np.flatnonzero(~np.isnat(first_days))
+    windows, window_numbers = np.unique(first_days[dated].astype(np.int64), return_inverse=True)
+    window_length = incubation[1] - incubation[0]
+    window_overlaps = [ interval_tree_overlaps(tree, window, window + window_length) for window in windows.tolist() ]
+    found = [ window_overlaps[window_number] for window_number in window_numbers ]
+    case_positions = np.repeat(dated, [ len(overlaps) for overlaps in found ])
+    if len(case_positions) == 0:
+        return pd.DataFrame(columns=contact_columns)
+    
+    contacts = stays.iloc[np.concatenate(found)].rename(columns={'fnr': 'contact'}).reset_index(drop=True)
+    contacts.insert(0, 'case', linelist.index.to_numpy()[case_positions])
+    contacts.insert(1, 'fnr', linelist_people(linelist).to_numpy()[case_positions])
+    contacts['exposure start'] = pd.to_datetime(first_days[case_positions])
+    contacts['exposure end'] = pd.to_datetime(last_days[case_positions])
+    return contacts[contact_columns]
+
+
+def exposure_places(contacts):
+    """
+    Returns the number of cases exposed (Series, most first) in each department and room, from contacts (see exposure_contacts())
+    """
+    places = contacts.drop_duplicates(['case', 'department', 'room']).groupby(['department', 'room']).size()
+    return places.sort_values(ascending=False)
+
+
+def popup_exposure(contacts):
+    """
+    Shows where cases were exposed (see exposure_places()) and the stays overlapping each exposure window, from contacts (see exposure_contacts())
+    """
+    places = exposure_places(contacts)
+    place_headings = [shot['msg_hospital_department'], shot['msg_hospital_room'], shot['msg_exposed_cases']]
+    place_rows = [ [department, room, cases] for (department, room), cases in places.items() ] or [[ '' for heading in place_headings ]]
+    
+    def days(first, last):
+        return f"{first:%Y-%m-%d} - {last:%Y-%m-%d}"
+    contact_headings = [shot['msg_exposure_case'], shot['msg_exposure_window'], shot['msg_exposure_person'], shot['msg_hospital_department'], shot['msg_hospital_room'], shot['msg_exposure_stay']]
+    contact_rows = [ [contact.fnr, days(contact.exposure_start, contact.exposure_end), contact.contact, contact.department, contact.room, days(contact.start, contact.end)]
+                     for contact in contacts.rename(columns={'exposure start': 'exposure_start', 'exposure end': 'exposure_end'}).itertuples(index=False) ] or [[ '' for heading in contact_headings ]]
+    
+    exposure_win = [
+                   [sg.Table(values=place_rows, headings=place_headings, auto_size_columns=True, num_rows=min(10, len(place_rows)))],
+                   [sg.Table(values=contact_rows, headings=contact_headings, auto_size_columns=True, num_rows=min(25, len(contact_rows)))],
+                   [sg.Button('OK')]
+                   ]
+    exposure = sg.Window(shot['stats_exposure'], layout=exposure_win, margins=(2, 2), resizable=True, keep_on_top=True)
+    exposure.read()
+    exposure.close()
+
+
+# CONTACT GRAPH
+# People (see linelist_people()) are in contact if they stayed in the same place, a room or a bed, at the same time.
+# Places are keyed by the unique room ids of read_config_from(), <hospital>_<building>_<room> (see unique_room_ids()),
+# as room 101 may well exist in every building (such rooms are placed by the department of the case, or left out).
+# A stay in a place runs from the first to the last sample there, extended back by the longest incubation period:
+# a case sampled in a room has most likely been there a while.
+#
+# The graph is built with a sweep line join, not by comparing every pair of stays: stays are sorted by place and start,
+# and each stay meets the stays after it (in the same place) that start before it ends. One np.searchsorted finds where
+# those end for every stay at once (see place_overlaps()). Edges are stored both ways, sorted (compressed sparse rows),
+# so the neighbours of any person are a slice. Connected components (transmission clusters) are found by repeatedly
+# hooking every edge to the lowest label of its ends and compressing label chains (contact_components()), and the
+# shortest chain between two people by a breadth-first search a whole level at a time (shortest_contact_chain()).
+
+def hospital_room_placement(hospital_info):
+    """
+    Returns how rooms of hospital_info (e.g. shot['hospital']) are placed in buildings (see unique_room_id()): dict with
+    name (of the hospital), room_buildings (room (str) => set of buildings listing it) and department_buildings
+    (department => set of the buildings of its rooms that are listed in one building only)
+    """
+    room_buildings = {}
+    for building, building_rooms in (hospital_info.get('bld') or {}).items():
+        for room in building_rooms:
+            room_buildings.setdefault(str(room).strip(), set()).add(building)
+    department_buildings = {}
+    for department, department_rooms in (hospital_info.get('dep') or {}).items():
+        department_buildings[department] = set()
+        for room in department_rooms:
+            buildings = room_buildings.get(str(room).strip(), set())
+            if len(buildings) == 1: department_buildings[department] |= buildings
+    hospital_name = str((hospital_info.get('info') or {}).get('name') or shot.get('conf_hosp') or '')
+    return { 'name': hospital_name, 'room_buildings': room_buildings, 'department_buildings': department_buildings }
+
+
+def unique_room_id(placement, room, department=''):
+    """
+    Returns the unique room id (str) <hospital>_<building>_<room> of room (str) in department (str, '' if unknown),
+    placed by placement (see hospital_room_placement()). The building is '' if the hospital does not list the room.
+    A room listed in several buildings is placed in the building (if only one) that has the department's other rooms,
+    and gets '' if that does not tell.
+    """
+    buildings = placement['room_buildings'].get(room, set())
+    if len(buildings) > 1:
+        buildings = buildings & placement['department_buildings'].get(department, set())
+        if len(buildings) != 1: return '' # no telling which one
+    return f"{placement['name']}_{next(iter(buildings), '')}_{room}"
+
+
+def hospital_room_ids(hospital_info):
+    """
+    Returns dict unique room id (see unique_room_id()) => (set of departments, set of buildings) of every room
+    listed by hospital_info (e.g. shot['hospital'] or hospital['MadeUp Hospital']). A room listed in several buildings
+    is one room per building, and is left out of its department if there is no telling which one is the department's.
+    """
+    placement = hospital_room_placement(hospital_info)
+    room_ids = {}
+    for building, building_rooms in (hospital_info.get('bld') or {}).items():
+        for room in building_rooms:
+            if str(room).strip() == '': continue
+            room_ids.setdefault(f"{placement['name']}_{building}_{str(room).strip()}", (set(), set()))[1].add(building)
+    for department, department_rooms in (hospital_info.get('dep') or {}).items():
+        for room in department_rooms:
+            room_id = unique_room_id(placement, str(room).strip(), department) if str(room).strip() != '' else ''
+            if room_id != '': room_ids.setdefault(room_id, (set(), set()))[0].add(department)
+    return room_ids
+
+
+def unique_room_ids(linelist):
+    """
+    Returns the unique room id (Series of str, by record key, '' without a room) of each case in linelist: <hospital>_<building>_<room>
+    Rooms are placed in buildings by the configured hospital (see unique_room_id()), using the department of the case.
+    Cases in rooms that cannot be placed get '', so they meet no one in a room of another building.
+    """
+    placement = hospital_room_placement(shot.get('hospital') or {})
+    
+    def strings(column):
+        return column.astype(object).where(column.notna(), '').astype(str).str.strip()
+    rooms, departments = strings(linelist['room']), strings(linelist['department'])
+    places = pd.Series(list(zip(rooms, departments)), index=linelist.index, dtype=object)
+    place_ids = { place: unique_room_id(placement, *place) for place in set(places) if place[0] != '' } # once per room and department
+    return places.map(lambda place: place_ids.get(place, '')).astype(str)
+
+
+def place_overlaps(places, starts, ends):
+    """
+    Sweep line join: returns positions (two numpy int arrays, each pair once) of the stays that overlap in time in the same place
+    places (numpy int codes), starts and ends (numpy int days, ends included) describe the stays.
+    """
+    if len(starts) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    order = np.lexsort((starts, places))
+    places, starts, ends = places[order].astype(np.int64), starts[order] - starts.min(), ends[order] - starts.min()
+    
+    # Stays are sorted by place then start, so stay n meets n+1 .. up to the first stay (in its place) starting after it ends.
+    # Putting place and day in one number keeps the search inside the place.
+    place_span = int(ends.max()) + 2
+    meet_until = np.searchsorted(places * place_span + starts, places * place_span + ends, side='right')
+    
+    meetings = meet_until - np.arange(len(order)) - 1
+    first = np.repeat(np.arange(len(order)), meetings)
+    # 1, 2, .. meetings for each stay
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(meetings) - meetings, meetings) + 1
+    return order[first], order[first + offsets]
+
+
+def build_contact_graph(linelist=None, place='room', margin_days=None):
+    """
+    Builds the contact graph (see Note on CONTACT GRAPH) of linelist (default: the loaded one)
+    place is 'room' or 'bed' (same bed in the same room), margin_days (int) how far back stays are extended
+    (default: the longest incubation period, see incubation_period(), or 0).
+    Returns graph dict: people (numpy array of str), edges (DataFrame: a, b (people positions), place, start, end of the overlap),
+    indptr and indices (neighbours of person n are indices[indptr[n]:indptr[n + 1]])
+    """
+    if linelist is None: linelist = get_linelist()
+    if margin_days is None:
+        incubation = incubation_period()
+        margin_days = incubation[1] if incubation else 0
+    
+    # Stays per person and place (see linelist_stays())
+    place_ids = unique_room_ids(linelist)
+    if place == 'bed':
+        beds = linelist['bed'].astype(object).where(linelist['bed'].notna(), '').astype(str).str.strip()
+        place_ids = (place_ids + '_' + beds).where((place_ids != '') & (beds != ''), '')
+    stays = pd.DataFrame({ 'person': linelist_people(linelist), 'place': place_ids, 'day': linelist['sample_date'] })
+    stays = stays[stays['day'].notna() & (stays['place'] != '')].groupby(['person', 'place'], sort=False)['day'].agg(['min', 'max']).reset_index()
+    
+    people, person_numbers = np.unique(stays['person'].to_numpy(dtype=str), return_inverse=True)
+    place_names, place_numbers = np.unique(stays['place'].to_numpy(dtype=str), return_inverse=True)
+    starts = stays['min'].to_numpy(dtype='datetime64[D]').astype(np.int64) - margin_days
+    ends = stays['max'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    stay_a, stay_b = place_overlaps(place_numbers, starts, ends)
+    
+    # One edge per pair of people (the first place they met), none to themselves
+    edges = pd.DataFrame({
+                         'a': np.minimum(person_numbers[stay_a], person_numbers[stay_b]), 'b': np.maximum(person_numbers[stay_a], person_numbers[stay_b]),
+                         'place': place_names[place_numbers[stay_a]],
+                         'start': np.maximum(starts[stay_a], starts[stay_b]).astype('datetime64[D]'), 'end': np.minimum(ends[stay_a], ends[stay_b]).astype('datetime64[D]')
+                         })
+    edges = edges[edges['a'] != edges['b']].sort_values('start', kind='stable').drop_duplicates(['a', 'b']).reset_index(drop=True)
+    
+    # Both ways, sorted by person: compressed sparse rows
+    ends_from = np.concatenate([edges['a'].to_numpy(), edges['b'].to_numpy()])
+    ends_to = np.concatenate([edges['b'].to_numpy(), edges['a'].to_numpy()])
+    order = np.argsort(ends_from, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(ends_from, minlength=len(people)))])
+    return { 'people': people, 'edges': edges, 'indptr': indptr, 'indices': ends_to[order] }
+
+
+def contact_components(graph):
+    """
+    Returns the component (transmission cluster) of each person in graph (numpy int array, the lowest person position in it)
+    """
+    labels = np.arange(len(graph['people']))
+    a, b = graph['edges']['a'].to_numpy(), graph['edges']['b'].to_numpy()
+    while True:
+        # Hook: both ends of every edge take the lowest label of the two, then compress chains of labels
+        lowest = np.minimum(labels[a], labels[b])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[a], lowest)
+        np.minimum.at(hooked, labels[b], lowest)
+        while True:
+            compressed = hooked[hooked]
+            if np.array_equal(compressed, hooked): break
+            hooked = compressed
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def contact_clusters(graph):
+    """
+    Returns the transmission clusters in graph: list of arrays of people (str) in contact, directly or through others,
+    largest first. People without contacts are not listed.
+    """
+    labels = contact_components(graph)
+    cluster_labels, cluster_sizes = np.unique(labels, return_counts=True)
+    order = np.argsort(labels, kind='stable')
+    clusters = np.split(graph['people'][order], np.cumsum(cluster_sizes)[:-1])
+    return sorted([ cluster for cluster in clusters if len(cluster) > 1 ], key=len, reverse=True)
+
+
+def shortest_contact_chain(graph, from_person, to_person):
+    """
+    Returns the shortest chain of contacts (list of people, str) from from_person to to_person (fnr, see linelist_people()),
+    or None if they are not in contact, directly or through others.
+    """
+    people = list(graph['people'])
+    if from_person not in people or to_person not in people:
+        return None
+    source, target = people.index(from_person), people.index(to_person)
+    came_from = np.full(len(people), -1)
+    came_from[source] = source
+    frontier = np.array([source])
+    while len(frontier) > 0 and came_from[target] == -1:
+        # All neighbours of the whole frontier at once
+        first, last = graph['indptr'][frontier], graph['indptr'][frontier + 1]
+        degrees = last - first
+        neighbours = graph['indices'][np.repeat(first - np.cumsum(degrees) + degrees, degrees) + np.arange(degrees.sum())]
+        parents = np.repeat(frontier, degrees)
+        new = came_from[neighbours] == -1
+        neighbours, parents = neighbours[new], parents[new]
+        neighbours, first_seen = np.unique(neighbours, return_index=True)
+        came_from[neighbours] = parents[first_seen]
+        frontier = neighbours
+    
+    if came_from[target] == -1:
+        return None
+    chain = [ target ]
+    while chain[-1] != source:
+        chain.append(came_from[chain[-1]])
+    return [ people[person] for person in reversed(chain) ]
+
+
+def popup_contact_clusters():
+    """
+    Shows the transmission clusters of the loaded linelist (see contact_clusters()), by room or by bed,
+    and the shortest chain of contacts between two people (see shortest_contact_chain())
+    """
+    place_names = [ shot['msg_hospital_room'], shot['msg_contacts_bed'] ]
+    cluster_headings = [shot['msg_contacts_cluster'], shot['msg_contacts_people'], 'fnr']
+    
+    def cluster_rows(graph):
+        return [ [number, len(cluster), ', '.join(cluster)] for number, cluster in enumerate(contact_clusters(graph), 1) ] or [[ '' for heading in cluster_headings ]]
+    
+    graph = build_contact_graph(place='room')
+    contacts_win = [
+                   [sg.T(f"{shot['msg_contacts_place']}:"), sg.Combo(place_names, default_value=place_names[0], key='CONTACT_place', enable_events=True, readonly=True)],
+                   [sg.Table(values=cluster_rows(graph), headings=cluster_headings, key='CONTACT_clusters', auto_size_columns=False, col_widths=[8, 8, 60], num_rows=15, justification='left')],
+                   [sg.T(f"{shot['msg_contacts_from']}:"), sg.In('', key='CONTACT_from', size=(14, 1)), sg.T(f"{shot['msg_contacts_to']}:"), sg.In('', key='CONTACT_to', size=(14, 1)), sg.Button(shot['msg_contacts_chain'], key='CONTACT_chain')],
+                   [sg.T('', key='CONTACT_chain_found', size=(80, 1))],
+                   [sg.Button('OK')]
+                   ]
+    contacts = sg.Window(shot['stats_contacts'], layout=contacts_win, margins=(2, 2), resizable=True, keep_on_top=True, finalize=True)
+    while True:
+        contacts_event, contacts_values = contacts.read()
+        if contacts_event in (None, 'OK'):
+            break
+        elif contacts_event == 'CONTACT_place':
+            graph = build_contact_graph(place='bed' if contacts_values['CONTACT_place'] == place_names[1] else 'room')
+            contacts['CONTACT_clusters'].update(values=cluster_rows(graph))
+        elif contacts_event == 'CONTACT_chain':
+            chain = shortest_contact_chain(graph, contacts_values['CONTACT_from'].strip(), contacts_values['CONTACT_to'].strip())
+            contacts['CONTACT_chain_found'].update(value=shot['msg_contacts_no_chain'] if chain is None else ' - '.join(chain))
+    contacts.close()
+
+
+# ATTACK RATES
+# The attack rate of a department or building is its cases per room (as in compare_outbreak_files(), where it is cases
+# per room of the whole hospital): the rooms listed under it in the hospital's topology (shot['hospital'] 'dep' and 'bld')
+# are the population at risk. Rooms and cases are both keyed by unique room id (see hospital_room_ids() and unique_room_ids()),
+# so room 101 in two buildings is two rooms. Cases in rooms the hospital does not list are not counted, as they have no denominator.
+# The 95% confidence interval is that of a Poisson count (cases) over the rooms, by Byar's approximation.
+#
+# Hospitals may have thousands of rooms, so both sides are kept: the denominators (room => department / building pairs,
+# shot['attack_rate_rooms']) until the topology changes (see hospital_topology_key()), and the cases per room
+# (shot['attack_rate_cases']) until the linelist or filter changes. Rates are then a few np.bincount() calls.
+
+attack_rate_levels = ('department', 'building', 'room') # as shown in the Overview tab
+attack_rate_z = 1.959964 # 95% confidence interval
+
+
+def hospital_topology_key():
+    """
+    Returns a key (tuple) that changes whenever the rooms of the configured hospital (shot['hospital']) change:
+    a different hospital, a saved change (version, updated) or rooms added in place. Made from the room lists themselves.
+    """
+    hospital_info = shot.get('hospital') or {}
+    info = hospital_info.get('info') or {}
+    listed_rooms = tuple( (place_type, str(place), tuple( str(room) for room in rooms )) for place_type in ('dep', 'bld') for place, rooms in (hospital_info.get(place_type) or {}).items() )
+    return (info.get('name') or shot.get('conf_hosp'), info.get('version'), info.get('updated'), listed_rooms)
+
+
+def get_attack_rate_rooms():
+    """
+    Returns the denominators of the configured hospital (see Note on ATTACK RATES), kept until its topology changes.
+    Dict: rooms (numpy array of str, sorted), and per level (department, building, room): names (numpy array of str)
+    and the room and name positions of each (room, name) pair in the topology (two numpy int arrays).
+    """
+    topology_key = hospital_topology_key()
+    if shot.get('attack_rate_rooms') is None or shot['attack_rate_rooms'][0] != topology_key:
+        hospital_info = shot.get('hospital') or {}
+        room_ids = hospital_room_ids(hospital_info)
+        rooms = np.array(sorted(room_ids), dtype=str)
+        denominators = {}
+        for level_number, (level, place_type) in enumerate((('department', 'dep'), ('building', 'bld'))):
+            level_pairs = sorted( (room_id, str(place_name)) for room_id, places in room_ids.items() for place_name in places[level_number] )
+            denominators[level] = (np.array(sorted( str(place_name) for place_name in (hospital_info.get(place_type) or {}) ), dtype=str), level_pairs)
+        
+        for level, (names, level_pairs) in list(denominators.items()):
+            denominators[level] = (
+                                  names,
+                                  np.searchsorted(rooms, np.array([ room for room, place_name in level_pairs ], dtype=str)).astype(np.int64),
+                                  np.searchsorted(names, np.array([ place_name for room, place_name in level_pairs ], dtype=str)).astype(np.int64)
+                                  )
+        denominators['room'] = (rooms, np.arange(len(rooms)), np.arange(len(rooms))) # every room is its own population
+        denominators['rooms'] = rooms
+        shot['attack_rate_rooms'] = (topology_key, denominators)
+    return shot['attack_rate_rooms'][1]
+
+
+def room_case_counts(linelist, selection=None):
+    """
+    Returns the cases per room (Series, unique room id (str) => int, see unique_room_ids()) of linelist,
+    or of the cases in selection (numpy bool array). Cases without a room (or in one that cannot be placed) are not counted.
+    """
+    room_ids = unique_room_ids(linelist)
+    if selection is not None: room_ids = room_ids[selection]
+    room_cases = room_ids.value_counts()
+    return room_cases[room_cases.index != '']
+
+
+def get_room_case_counts():
+    """
+    Returns room_case_counts() of the loaded linelist (filtered by shot['filter'], see Note on FILTERING)
+    Kept (shot['attack_rate_cases']) until the linelist or filter changes.
+    """
+    cache_key = (shot['data_version'], filter_key(shot.get('filter')))
+    if shot.get('attack_rate_cases') is None or shot['attack_rate_cases'][0] != cache_key:
+        shot['attack_rate_cases'] = (cache_key, room_case_counts(get_linelist(), get_filter_selection()))
+    return shot['attack_rate_cases'][1]
+
+
+def poisson_rate_interval(counts, exposure, z=attack_rate_z):
+    """
+    Returns rate, lower and upper confidence limit (numpy float arrays) of counts (events) over exposure (e.g. rooms)
+    The limits are Byar's approximation of the exact Poisson limits. Rates over no exposure are nan.
+    """
+    counts = np.asarray(counts, dtype=float)
+    exposure = np.where(np.asarray(exposure, dtype=float) > 0, exposure, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lower = np.where(counts > 0, counts * (1 - 1 / (9 * counts) - z / (3 * np.sqrt(counts))) ** 3, 0)
+        upper = (counts + 1) * (1 - 1 / (9 * (counts + 1)) + z / (3 * np.sqrt(counts + 1))) ** 3
+    return counts / exposure, lower / exposure, upper / exposure
+
+
+def attack_rates(level='department', room_cases=None):
+    """
+    Returns the attack rates (see Note on ATTACK RATES) of the configured hospital per level (department, building or room),
+    as a DataFrame (index: name) with rooms, rooms_with_cases, cases, attack_rate, ci_low and ci_high, highest rate first.
+    The first row is the whole hospital (index: its name). room_cases (Series, see room_case_counts()) defaults to the loaded linelist.
+    """
+    denominators = get_attack_rate_rooms()
+    if room_cases is None: room_cases = get_room_case_counts()
+    cases_per_room = room_cases.reindex(denominators['rooms'], fill_value=0).to_numpy(dtype=np.int64)
+    names, pair_rooms, pair_names = denominators[level]
+    
+    hospital_info = shot.get('hospital') or {}
+    hospital_name = str((hospital_info.get('info') or {}).get('name') or shot.get('conf_hosp') or '')
+    rates = pd.DataFrame({
+                         'rooms': np.append(len(cases_per_room), np.bincount(pair_names, minlength=len(names))),
+                         'rooms_with_cases': np.append((cases_per_room > 0).sum(), np.bincount(pair_names, weights=cases_per_room[pair_rooms] > 0, minlength=len(names))).astype(np.int64),
+                         'cases': np.append(cases_per_room.sum(), np.bincount(pair_names, weights=cases_per_room[pair_rooms], minlength=len(names))).astype(np.int64)
+                         }, index=np.append(hospital_name, names))
+    rates['attack_rate'], rates['ci_low'], rates['ci_high'] = poisson_rate_interval(rates['cases'], rates['rooms'])
+    return pd.concat([rates.iloc[:1], rates.iloc[1:].sort_values(['attack_rate', 'cases'], ascending=False, kind='stable')])
+
+
+def tab_attack_rates():
+    """
+    Returns list containing the attack rate part of the Overview tab: level drop-down and table (filled by update_overview_tab())
+    """
+    shot['attack_rate_level_names'] = [ shot['msg_hospital_department'], shot['msg_hospital_building'], shot['msg_hospital_room'] ] # as attack_rate_levels
+    attack_rate_headings = [shot['msg_name'], shot['msg_hospital_rooms'], shot['msg_rooms_with_cases'], shot['msg_cases'], shot['msg_attack_rate_per_room'], shot['msg_confidence_interval']]
+    my_attack_rate_rows = [
+                          [sg.T(f"{shot['msg_attack_rate']}: "), sg.Combo(shot['attack_rate_level_names'], default_value=shot['attack_rate_level_names'][0], key='OV_level', enable_events=True, readonly=True)],
+                          [sg.Table(values=[], headings=attack_rate_headings, key='OV_attack_rates', auto_size_columns=False, col_widths=[24, 8, 14, 8, 16, 16], num_rows=15, justification='left')]
+                          ]
+    return my_attack_rate_rows
+
+
+def update_overview_tab(window, level_name):
+    """
+    (Re)fills the attack rate table of the Overview tab from the loaded linelist, for level_name (as shown in its drop-down)
+    """
+    level = attack_rate_levels[shot['attack_rate_level_names'].index(level_name)] if level_name in shot['attack_rate_level_names'] else attack_rate_levels[0]
+    
+    def per_room(rate):
+        return 'N/A' if np.isnan(rate) else f"{rate:0.2f}"
+    rates = attack_rates(level)
+    window['OV_attack_rates'].update(values=[ [name, rooms, rooms_with_cases, cases, per_room(attack_rate), f"{per_room(ci_low)} - {per_room(ci_high)}"]
+                                              for name, (rooms, rooms_with_cases, cases, attack_rate, ci_low, ci_high) in zip(rates.index, rates.itertuples(index=False)) ])
+
+
+# HEATMAP
+# Every room of a hospital has a dict of its own (hospital[...][<hospital>_<building>_<room>], see read_config_from())
+# with its department ('dep'), building ('bld') and status (None, or any value if the room is contaminated or whatnot).
+# Statuses are stored as codes (room_status_codes, e.g. 'atrisk') or the text of a custom status, never as labels
+# in the language of the GUI, so they read the same after changing language (see room_status_label()).
+# The heatmap rolls rooms up the hierarchy: each department, each building and the hospital as a whole have a cell
+# with the number of rooms, rooms with a status, rooms with cases, contaminated rooms (status or cases) and cases.
+#
+# Cells are kept up to date, not recounted: a room's old values are taken out of its cells and its new ones put in
+# (see set_heatmap_room()), so a changed room costs three cells whatever the size of the hospital.
+# Cases per room are counted from the loaded linelist by unique room id (see unique_room_ids()), and only the rooms
+# whose count changed are updated when the linelist does (see update_heatmap_cases()). The hospital info window
+# (popup_show_hospital_info()) edits a copy of the heatmap along with the hospital, rooms and statuses alike
+# (see set_room_status()), and the copy becomes the heatmap of the hospital saved.
+
+heatmap_cell_fields = ('rooms', 'rooms_with_status', 'rooms_with_cases', 'contaminated', 'cases')
+
+# Room statuses to choose from, labelled by shot['msg_hospital_room_status_<code>'] (see set_gui_strings())
+room_status_codes = ('empty', 'niu', 'atrisk', 'contaminated')
+
+
+def hospital_rooms(hospital_info):
+    """
+    Returns dict unique room id => room dict (status, dep, bld) of hospital_info (e.g. shot['hospital'])
+    """
+    return { room_id: room for room_id, room in hospital_info.items() if room_id not in ('info', 'bld', 'dep') and isinstance(room, dict) }
+
+
+def heatmap_room_cells(heatmap, room):
+    """
+    Returns the cells (list of dicts, see Note on HEATMAP) room (heatmap['rooms'] entry) rolls up to: hospital, building and department
+    """
+    room_cells = [ heatmap['cells'][('hospital', '')] ]
+    for place_type in 'bld', 'dep':
+        if room[place_type]:
+            room_cells.append(heatmap['cells'].setdefault((place_type, room[place_type]), dict.fromkeys(heatmap_cell_fields, 0)))
+    return room_cells
+
+
+def set_heatmap_room(heatmap, room_id, **room_values):
+    """
+    Sets room_values (dep, bld, status and/or cases) of room room_id in heatmap, and updates the cells it rolls up to.
+    Rooms not in heatmap are added (e.g. when rooms are added to the hospital).
+    """
+    room = heatmap['rooms'].get(room_id)
+    if room is None:
+        room = heatmap['rooms'][room_id] = { 'dep': None, 'bld': None, 'status': None, 'cases': 0 }
+    else:
+        roll_up_heatmap_room(heatmap, room, -1) # out with the old values
+    room.update(room_values)
+    roll_up_heatmap_room(heatmap, room, 1)
+    
+    if room['status'] is not None or room['cases'] > 0:
+        heatmap['contaminated'].add(room_id)
+    else:
+        heatmap['contaminated'].discard(room_id)
+
+
+def roll_up_heatmap_room(heatmap, room, sign):
+    """
+    Adds (sign 1) or takes out (sign -1) room (heatmap['rooms'] entry) from the cells it rolls up to
+    """
+    room_values = heatmap_room_values(room)
+    for room_cell in heatmap_room_cells(heatmap, room):
+        for field, value in room_values.items(): room_cell[field] += sign * value
+
+
+def heatmap_room_values(room):
+    """
+    Returns what room (heatmap['rooms'] entry) adds to each of its cells (dict, see heatmap_cell_fields)
+    """
+    return {
+           'rooms': 1, 'rooms_with_status': int(room['status'] is not None), 'rooms_with_cases': int(room['cases'] > 0),
+           'contaminated': int(room['status'] is not None or room['cases'] > 0), 'cases': room['cases']
+           }
+
+
+def build_room_heatmap(hospital_info, room_cases=None):
+    """
+    Returns the heatmap (see Note on HEATMAP) of hospital_info (e.g. shot['hospital']): dict with rooms (unique room id => dict),
+    cells ((level, name) => dict of heatmap_cell_fields, level is hospital, bld or dep) and contaminated (set of unique room ids)
+    room_cases (Series, unique room id => cases, see room_id_case_counts()) are added if set.
+    """
+    heatmap = { 'rooms': {}, 'cells': { ('hospital', ''): dict.fromkeys(heatmap_cell_fields, 0) }, 'contaminated': set(), 'room_cases': None }
+    for room_id, room in hospital_rooms(hospital_info).items():
+        set_heatmap_room(heatmap, room_id, dep=room.get('dep'), bld=room.get('bld'), status=room.get('status'))
+    if room_cases is not None:
+        update_heatmap_cases(heatmap, room_cases)
+    return heatmap
+
+
+def update_heatmap_cases(heatmap, room_cases):
+    """
+    Sets the cases of the rooms in heatmap to room_cases (Series, unique room id => cases, see room_id_case_counts())
+    Only rooms whose cases changed since the last update are touched. Cases in rooms unknown to the hospital are left out.
+    """
+    old_cases = heatmap['room_cases'] if heatmap['room_cases'] is not None else room_cases.iloc[:0]
+    old_cases, new_cases = old_cases.align(room_cases, fill_value=0)
+    for room_id, cases in new_cases[old_cases != new_cases].items():
+        if room_id in heatmap['rooms']:
+            set_heatmap_room(heatmap, room_id, cases=int(cases))
+    heatmap['room_cases'] = room_cases
+
+
+def room_id_case_counts(linelist):
+    """
+    Returns the cases per room (Series, unique room id (str) => int, see unique_room_ids()) of linelist
+    """
+    return room_case_counts(linelist)
+
+
+def get_room_heatmap():
+    """
+    Returns the heatmap (see Note on HEATMAP) of the configured hospital with the cases of the loaded linelist (if any)
+    It is built (shot['heatmap']) when the hospital's rooms change (see hospital_topology_key()), and updated when the linelist does.
+    """
+    topology_key = hospital_topology_key()
+    if shot.get('heatmap') is None or shot['heatmap'][0] != topology_key:
+        shot['heatmap'] = (topology_key, build_room_heatmap(shot.get('hospital') or {}), None)
+    heatmap = shot['heatmap'][1]
+    if shot.get('data') is not None or shot.get('data_positions') is not None:
+        cases_key = shot['data_version']
+        if shot['heatmap'][2] != cases_key:
+            update_heatmap_cases(heatmap, room_id_case_counts(get_linelist()))
+            shot['heatmap'] = (topology_key, heatmap, cases_key)
+    return heatmap
+
+
+def room_status_label(status):
+    """
+    Returns the status of a room (code in room_status_codes, text of a custom status or None) as shown in the GUI (str)
+    """
+    if status is None:
+        return shot['msg_hospital_room_status_none']
+    if status in room_status_codes:
+        return shot[f"msg_hospital_room_status_{status}"]
+    return status
+
+
+def set_room_status(room_id, status, hospital_info=None, heatmap=None):
+    """
+    Sets the status (None, code in room_status_codes or text of a custom status, see Note on HEATMAP) of room room_id (unique room id)
+    in hospital_info (default: shot['hospital']) and in its heatmap (default: the configured hospital's, see get_room_heatmap())
+    """
+    if hospital_info is None: hospital_info = shot['hospital']
+    if heatmap is None: heatmap = get_room_heatmap()
+    hospital_info[room_id]['status'] = status
+    set_heatmap_room(heatmap, room_id, status=status)
+
+
+def popup_room_status(hospital_info):
+    """
+    Asks for a room of hospital_info (e.g. shot['hospital']) and its new status (see Note on HEATMAP)
+    Returns unique room id (str) and status (None, code in room_status_codes or custom text), or None if cancelled.
+    """
+    rooms = hospital_rooms(hospital_info)
+    room_ids = sorted(rooms)
+    
+    room_status_win = [
+                      [sg.T(f"{shot['msg_hospital_room']}:"), sg.Combo(room_ids, default_value=room_ids[0] if room_ids else None, key='status_room', enable_events=True, readonly=True, size=(40, 1))],
+                      [sg.Radio(shot['msg_hospital_room_status_none'], 'status radios', key='status_NONE', default=True)] + [ sg.Radio(room_status_label(status), 'status radios', key=f"status_{status}") for status in room_status_codes ],
+                      [sg.Radio(shot['msg_hospital_room_status_custom'], 'status radios', key='status_custom'), sg.T(f"{shot['msg_hospital_room_status_spec']}:"), sg.In('', key='custom_status', size=(22, 1))],
+                      [sg.Button('OK'), sg.Button(shot['msg_cancel'])]
+                      ]
+    room_status = sg.Window(f"{shot['msg_hospital_room']} - {shot['msg_hospital_room_status']}", layout=room_status_win, margins=(2, 2), resizable=False, keep_on_top=True, finalize=True)
+    
+    def show_status(room_id):
+        status = (rooms.get(room_id) or {}).get('status')
+        if status is None:
+            room_status['status_NONE'].update(value=True)
+        elif status in room_status_codes:
+            room_status[f"status_{status}"].update(value=True)
+        else:
+            room_status['status_custom'].update(value=True)
+            room_status['custom_status'].update(value=status)
+    
+    chosen = None
+    if room_ids: show_status(room_ids[0])
+    while True:
+        status_event, status_values = room_status.read()
+        if status_event in (None, shot['msg_cancel']):
+            break
+        elif status_event == 'status_room':
+            room_status['custom_status'].update(value='')
+            show_status(status_values['status_room'])
+        elif status_event == 'OK' and status_values['status_room'] in rooms:
+            if status_values['status_custom']:
+                status = status_values['custom_status'].strip() or None
+            else:
+                status = next(( status for status in room_status_codes if status_values[f"status_{status}"] ), None)
+            chosen = (status_values['status_room'], status)
+            break
+    room_status.close()
+    return chosen
+
+
+# TIME SERIES
+# Time series records (shot['tseries'], see shot['headers']['tseries']) are periods: a title and details, from start
+# to end (dates, end included), e.g. a ward closure or an isolation period. A period without an end is still going.
+# Long surveillance files collect many of them, so they are kept in an interval tree (see build_interval_tree())
+# rather than scanned: "what was going on that day" and "what overlaps these days" cost O(log n + k).
+#
+# The index (shot['tseries_index']) is kept until time series records change (see mark_record_changed()) or are
+# replaced as a whole, e.g. when opening or merging a file. It is used for shading the epicurve (see draw_epicurve()).
+
+tseries_open_end = np.iinfo(np.int64).max // 2 # day number of the end of a period that is still going
+
+
+def tseries_days(tseries_records, field):
+    """
+    Returns the day numbers (numpy int64 array, days since 1970-01-01, -1 if missing or not a date) of field ('start' or 'end')
+    of tseries_records (list of dicts). Each value is parsed on its own: ISO dates (and times), else as in the linelist (see parse_linelist_dates()).
+    """
+    values = pd.Series([ str(record.get(field) or '') for record in tseries_records ], dtype=object).str.strip()
+    days = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    days = days.fillna(parse_linelist_dates(values.where(days.isna())))
+    return np.where(days.isna(), -1, days.to_numpy(dtype='datetime64[D]').astype(np.int64))
+
+
+def build_tseries_index(tseries):
+    """
+    Returns the interval index (see Note on TIME SERIES) of tseries (dict of time series records, e.g. shot['tseries']):
+    dict keys (numpy array of record keys, by start), start and end (day numbers), tree (see build_interval_tree()) and skipped (int)
+    Records without a start date, or ending before they start (or on a day that is not a date), are left out and counted in skipped.
+    """
+    keys = np.array(list(tseries.keys()))
+    starts, ends = tseries_days(tseries.values(), 'start'), tseries_days(tseries.values(), 'end')
+    ends = np.where([ str(record.get('end') or '').strip() in ('', 'N/A') for record in tseries.values() ], tseries_open_end, ends)
+    valid = (starts >= 0) & (ends >= starts)
+    order = np.flatnonzero(valid)[np.argsort(starts[valid], kind='stable')]
+    tseries_index = { 'keys': keys[order], 'start': starts[order], 'end': ends[order], 'skipped': int((~valid).sum()) }
+    tseries_index['tree'] = build_interval_tree(tseries_index['start'], tseries_index['end'])
+    if tseries_index['skipped'] > 0:
+        print(f"skipped {tseries_index['skipped']} time series records without a readable start date, or ending before they start") # debug
+    return tseries_index
+
+
+def get_tseries_index():
+    """
+    Returns build_tseries_index() of the loaded time series records (shot['tseries']), kept until they change
+    """
+    if shot.get('tseries_index') is None or shot['tseries_index'][0] != shot['tseries_version']:
+        shot['tseries_index'] = (shot['tseries_version'], build_tseries_index(shot['tseries']))
+    return shot['tseries_index'][1]
+
+
+def tseries_day_number(day):
+    """
+    Returns the day number (int, days since 1970-01-01) of day (str, date, datetime or numpy datetime64)
+    """
+    return int(np.datetime64(pd.Timestamp(day).date(), 'D').astype(np.int64))
+
+
+def tseries_overlap_positions(first_day, last_day, tseries_index):
+    """
+    Returns the positions (numpy int array, ascending, i.e. by start) in tseries_index of the periods overlapping first_day..last_day
+    """
+    return np.sort(interval_tree_overlaps(tseries_index['tree'], tseries_day_number(first_day), tseries_day_number(last_day)))
+
+
+def tseries_overlapping(first_day, last_day, tseries_index=None):
+    """
+    Returns the keys (list, by start) of the time series records (periods) overlapping first_day..last_day (see tseries_day_number())
+    tseries_index defaults to the loaded records' (see get_tseries_index()).
+    """
+    if tseries_index is None: tseries_index = get_tseries_index()
+    return tseries_index['keys'][tseries_overlap_positions(first_day, last_day, tseries_index)].tolist()
+
+
+def tseries_active_on(day, tseries_index=None):
+    """
+    Returns the keys (list, by start) of the time series records (periods) going on on day (see tseries_day_number())
+    """
+    return tseries_overlapping(day, day, tseries_index)
+
+
+def tseries_epicurve_spans(bucket_starts, bucket):
+    """
+    Returns the periods (time series records) overlapping an epicurve (bucket_starts from epicurve_bins(), bucket as there)
+    as a list of (title, first day, last day, first bucket, last bucket), clipped to the curve, for shading.
+    """
+    if len(bucket_starts) == 0 or not shot.get('tseries'):
+        return []
+    last_day = epicurve_bucket_starts(epicurve_bucket_numbers(bucket_starts[-1:], bucket) + 1, bucket)[0] - np.timedelta64(1, 'D')
+    tseries_index = get_tseries_index()
+    spans = []
+    for position in tseries_overlap_positions(bucket_starts[0], last_day, tseries_index):
+        first = np.datetime64(int(max(tseries_index['start'][position], bucket_starts[0].astype(np.int64))), 'D')
+        last = np.datetime64(int(min(tseries_index['end'][position], last_day.astype(np.int64))), 'D')
+        spans.append((str(shot['tseries'][tseries_index['keys'][position]].get('title') or ''), first, last,
+                      int(np.searchsorted(bucket_starts, first, side='right')) - 1, int(np.searchsorted(bucket_starts, last, side='right')) - 1))
+    return spans
+
+
+# CHART IMAGES
+# The Plot, Export plot image and Print buttons use images of the charts, rendered by matplotlib (optional, see imports).
+# Rendering takes a good part of a second on slow machines, so images are kept (shot['chart_images']) keyed by what is drawn:
+# chart and its options (as chosen in its tab), image format and size, language (of the labels), and the linelist,
+# outbreak period and filter it was drawn from (shot['data_version'], see Note on FILTERING). Showing, exporting and printing
+# the same chart again reuses the image. The least recently used images are dropped beyond shot['chart_image_cache'].
+
+chart_image_formats = ('png', 'svg', 'pdf')
+
+
+def chart_image_key(chart, options, image_format, size):
+    """
+    Returns cache key (tuple) of the image of chart ('epicurve' or 'gchart') with options (tuple, see get_chart_image())
+    """
+    return (chart, tuple(options), image_format, tuple(size), shot['conf_lang'], shot['data_version'], outbreak_period(), filter_key(shot.get('filter')), shot['tseries_version'])
+
+
+def render_chart_image(chart, options, image_format='png', size=None):
+    """
+    Renders chart ('epicurve' or 'gchart') of the loaded outbreak with matplotlib, and returns the image (bytes)
+    options (tuple) are (bucket, strata) for the epicurve (see epicurve_tab_options()) and (sample_type, baseline) for the G-chart
+    (see gchart_tab_options()). image_format is one of chart_image_formats, size (width, height) is in pixels at 100 dpi.
+    """
+    width, height = size or shot['chart_image_size']
+    figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+    axes = figure.add_subplot()
+    
+    if chart == 'epicurve':
+        bucket, strata = options
+        bucket_starts, counts, strata_counts = current_epicurve(bucket, strata)
+        bar_width = {'day': 1, 'week': 7, 'month': 28}[bucket]
+        for title, first_day, last_day, first, last in tseries_epicurve_spans(bucket_starts, bucket):
+            axes.axvspan(first_day, last_day + np.timedelta64(1, 'D'), color='grey', alpha=0.15, zorder=0) # overlapping periods darker
+            axes.text(first_day, 0.98, title, transform=axes.get_xaxis_transform(), fontsize='x-small', va='top')
+        layer_bottom = np.zeros(len(counts), dtype=np.int64)
+        for label, layer_counts, colour in epicurve_layers(counts, strata_counts):
+            axes.bar(bucket_starts, layer_counts, width=bar_width, bottom=layer_bottom, align='edge', color=colour, label=label or None)
+            layer_bottom = layer_bottom + layer_counts
+        if strata_counts: axes.legend(fontsize='small')
+        bucket_name = (shot['msg_bucket_day'], shot['msg_bucket_week'], shot['msg_bucket_month'])[epicurve_buckets.index(bucket)]
+        axes.set_title(shot['stats_epicurve'])
+        axes.set_ylabel(f"{shot['msg_epicurve_bucket']} {bucket_name.lower()}")
+        if len(counts) == 0: axes.text(0.5, 0.5, shot['msg_epicurve_no_cases'], ha='center', transform=axes.transAxes)
+    else:
+        sample_type, baseline = options
+        days, gaps, g_bar, lcl, ucl = current_gchart(sample_type, baseline)
+        # In case order, as in draw_gchart(), labelled with the date of a handful of cases
+        gap_numbers = np.arange(len(gaps))
+        axes.plot(gap_numbers, gaps, marker='o', markersize=3, color='steelblue')
+        axes.step(gap_numbers, g_bar, where='mid', color='darkgreen', label='g-bar')
+        axes.step(gap_numbers, ucl, where='mid', color='orangered', label='UCL')
+        axes.step(gap_numbers, lcl, where='mid', color='orangered', linestyle='--', label='LCL')
+        with np.errstate(invalid='ignore'):
+            outside = (gaps < lcl) | (gaps > ucl)
+        axes.plot(gap_numbers[outside], gaps[outside], 'o', color='red')
+        axes.set_title(f"{shot['stats_gchart']} ({sample_type or shot['msg_gchart_all']})")
+        if len(gaps) == 0:
+            axes.text(0.5, 0.5, shot['msg_gchart_few_cases'], ha='center', transform=axes.transAxes)
+        else:
+            label_numbers = gap_numbers[::max(1, len(gaps) // 5)]
+            axes.set_xticks(label_numbers)
+            axes.set_xticklabels([ epicurve_bucket_label(day, 'day') for day in days[label_numbers + 1] ])
+            axes.legend(fontsize='small')
+    
+    figure.autofmt_xdate()
+    image = io.BytesIO()
+    figure.savefig(image, format=image_format)
+    return image.getvalue()
+
+
+def get_chart_image(chart, options, image_format='png', size=None):
+    """
+    Returns the image (bytes) of chart as render_chart_image() would, from the cache if it has been rendered before (see Note on CHART IMAGES)
+    Returns None if matplotlib is not installed.
+    """
+    if Figure is None:
+        return None
+    size = size or shot['chart_image_size']
+    image_key = chart_image_key(chart, options, image_format, size)
+    chart_images = shot.setdefault('chart_images', collections.OrderedDict())
+    if image_key in chart_images:
+        chart_images.move_to_end(image_key)
+    else:
+        chart_images[image_key] = render_chart_image(chart, options, image_format, size)
+        while len(chart_images) > shot['chart_image_cache']:
+            chart_images.popitem(last=False)
+    return chart_images[image_key]
+
+
+def selected_chart(values):
+    """
+    Returns chart and options (see render_chart_image()) of the chart in the selected tab (values of the main window),
+    the epicurve if no chart tab is selected.
+    """
+    if values.get('MAIN_tabs') == shot['tab']['title']['g-chart']:
+        return 'gchart', gchart_tab_options(values['GCHART_sample_type'], values['GCHART_baseline'])
+    return 'epicurve', epicurve_tab_options(values['EPI_bucket'], values['EPI_strata'])
+
+
+def print_chart_image(image):
+    """
+    Sends image (PDF bytes, see get_chart_image()) to the default printer: by the shell on Windows, lpr elsewhere
+    Errors are raised (OSError, subprocess.CalledProcessError).
+    """
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as print_file:
+        print_file.write(image)
+    if os.name == 'nt':
+        os.startfile(print_file.name, 'print') # the file is left for the print spooler, in the temp folder
+    else:
+        try:
+            subprocess.run(['lpr', print_file.name], check=True)
+        finally:
+            os.unlink(print_file.name)
+
+
+def popup_chart_image(chart_title, image):
+    """
+    Shows image (PNG bytes, see get_chart_image()) in a popup window titled chart_title
+    """
+    chart_layout = [
+                   [sg.Image(data=base64.b64encode(image))],
+                   [sg.Button('OK')]
+                   ]
+    chart_popup = sg.Window(chart_title, layout=chart_layout, margins=(2, 2), resizable=True, keep_on_top=True)
+    chart_popup.read()
+    chart_popup.close()
+
+
+# BATCH REPORTS
+# shots.py --report FOLDER writes a report for every outbreak file in FOLDER, without opening a window (see cli_arguments()):
+# an epicurve and a G-chart image (if matplotlib is installed, see Note on CHART IMAGES) and a table of cases per bucket
+# (and stratum) for each file, named after the file, and summary.csv with one line per file (see summarize_outbreak_file()).
+# Reports go to FOLDER/reports unless told otherwise, and tables and summaries written to FOLDER are never read as outbreak files.
+# Files are reported in parallel by a process pool, like comparisons (see compare_outbreak_files()). Each worker loads
+# one file at a time into its own shot, and draws it with the same functions as the tabs.
+
+report_file_patterns = ('*.csv', '*.csv.gz', '*.csv.xz', '*.sqlite', '*.db')
+
+
+def report_file_name(my_outbreak_file, report_type, report_format):
+    """
+    Returns the name (str) of the report_type ('epicurve', 'gchart', 'table') file of my_outbreak_file, e.g. 2020-05-01_noro_epicurve.png
+    """
+    outbreak_name = Path(my_outbreak_file).name
+    for compressed_suffix in '.gz', '.xz':
+        if outbreak_name.endswith(compressed_suffix): outbreak_name = outbreak_name[:-len(compressed_suffix)]
+    return f"{Path(outbreak_name).stem}_{report_type}.{report_format}"
+
+
+def report_outbreak_file(my_outbreak_file, report_folder, report_options, population=None):
+    """
+    Writes the reports of my_outbreak_file to report_folder (see Note on BATCH REPORTS). Runs in process pool workers.
+    report_options (dict) has bucket, strata (see epicurve_cube_bins()), baseline (see gchart_limits()) and image_format.
+    Returns summary (dict, see summarize_outbreak_file()) with 'reports' added: list of the report file names written.
+    """
+    summary = {
+              'file': str(my_outbreak_file), 'ok': False, 'title': Path(my_outbreak_file).name, 'hospital': '', 'infection type': '',
+              'cases': 0, 'onset': None, 'duration': 0, 'attack_rate': None, 'daily': np.zeros(0, dtype=np.int64), 'reports': []
+              }
+    try:
+        records = read_outbreak_file(my_outbreak_file)
+    except ValueError:
+        records = None # encrypted with another password
+    if records is None:
+        return summary
+    summarize_outbreak_records(summary, records, population)
+    
+    # Load the file into this worker's shot, so the tab functions draw it
+    for target in 'admin', 'data', 'events', 'tseries':
+        shot[target] = records[target]
+    shot['hospital'] = outbreak_hospital(records['admin']) or {}
+    shot['filter'] = {}
+    shot['epicurve_cube_rooms'] = None
+    records_replaced()
+    
+    def write_report(report_type, report_format, contents):
+        report_name = report_file_name(my_outbreak_file, report_type, report_format)
+        atomic_write_file(Path(report_folder) / report_name, lambda report_file: report_file.write(contents))
+        summary['reports'].append(report_name)
+    
+    bucket, strata = report_options['bucket'], report_options['strata']
+    bucket_starts, counts, strata_counts = current_epicurve(bucket, strata)
+    table = pd.DataFrame({ bucket: bucket_starts, shot['msg_epicurve_cases']: counts })
+    for stratum in sorted(strata_counts):
+        table[stratum or shot['msg_unknown']] = strata_counts[stratum]
+    write_report('table', 'csv', table.to_csv(sep=';', index=False).encode('utf-8'))
+    
+    if Figure is not None:
+        image_format = report_options['image_format']
+        write_report('epicurve', image_format, render_chart_image('epicurve', (bucket, strata), image_format))
+        write_report('gchart', image_format, render_chart_image('gchart', (None, report_options['baseline']), image_format))
+    return summary
+
+
+def batch_report(outbreak_folder, report_folder=None, report_options=None, processes=None):
+    """
+    Writes reports of all outbreak files in outbreak_folder to report_folder (default: outbreak_folder/reports), see Note on BATCH REPORTS
+    Progress is printed to the console. Returns int (exit status: 0 if every file was reported, 1 if not).
+    """
+    report_options = { 'bucket': 'week', 'strata': None, 'baseline': None, 'image_format': 'png', **(report_options or {}) }
+    report_folder = Path(report_folder or Path(outbreak_folder) / 'reports')
+    outbreak_files = sorted({ outbreak_file for pattern in report_file_patterns for outbreak_file in Path(outbreak_folder).glob(pattern) })
+    if report_folder.resolve() == Path(outbreak_folder).resolve():
+        # our own tables and summary from an earlier run
+        outbreak_files = [ outbreak_file for outbreak_file in outbreak_files if outbreak_file.name != 'summary.csv' and not outbreak_file.name.endswith(report_file_name('', 'table', 'csv')) ]
+    report_folder.mkdir(parents=True, exist_ok=True)
+    if Figure is None: print(shot['err_matplotlib_missing'])
+    
+    population = { hospital_id: hospital_room_count(hospital[hospital_id]) for hospital_id in hospital.keys() }
+    summaries = [ None ] * len(outbreak_files)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=set_encryption_password, initargs=(shot.get('encryption_password'),)) as pool:
+        pending = { pool.submit(report_outbreak_file, outbreak_file, report_folder, report_options, population): n for n, outbreak_file in enumerate(outbreak_files) }
+        for files_done, finished in enumerate(concurrent.futures.as_completed(pending), 1):
+            outbreak_file = outbreak_files[pending[finished]]
+            try:
+                summaries[pending[finished]] = finished.result()
+            except (OSError, ValueError, KeyError) as report_error:
+                summaries[pending[finished]] = { 'file': str(outbreak_file), 'ok': False, 'title': outbreak_file.name, 'reports': [] }
+                print(f"{outbreak_file}: {report_error}")
+            print(f"{files_done}/{len(outbreak_files)} {outbreak_file.name}{'' if summaries[pending[finished]]['ok'] else ' - ' + shot['err_wrong_data_format']}")
+    
+    summary_columns = ['file', 'ok', 'title', 'hospital', 'infection type', 'cases', 'onset', 'duration', 'attack_rate', 'reports']
+    summary_table = pd.DataFrame([ { column: summary.get(column) for column in summary_columns } for summary in summaries ], columns=summary_columns)
+    summary_table['reports'] = summary_table['reports'].map(lambda reports: ', '.join(reports or []))
+    atomic_write_file(report_folder / 'summary.csv', lambda summary_file: summary_file.write(summary_table.to_csv(sep=';', index=False).encode('utf-8')))
+    print(f"{report_folder / 'summary.csv'}")
+    return 0 if all( summary['ok'] for summary in summaries ) else 1
+
+
+def cli_arguments(arguments=None):
+    """
+    Returns the command line arguments (argparse.Namespace) of arguments (list, default: sys.argv)
+    Without --report, SHOT opens its window as usual.
+    """
+    parser = argparse.ArgumentParser(description='Simple Hospital Outbreak Tracker')
+    parser.add_argument('--report', metavar='FOLDER', help='write reports of all outbreak files in FOLDER without opening a window')
+    parser.add_argument('--output', metavar='FOLDER', help='write reports here instead (default: reports in FOLDER of --report)')
+    parser.add_argument('--bucket', choices=epicurve_buckets, default='week', help='epicurve bucket size (default: week)')
+    parser.add_argument('--strata', choices=epicurve_cube_dimensions[1:], help='stratify epicurves and tables by this')
+    parser.add_argument('--baseline', type=int, help='G-chart limits from this many preceding gaps (default: all gaps)')
+    parser.add_argument('--format', choices=chart_image_formats, default='png', help='chart image format (default: png)')
+    parser.add_argument('--processes', type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--password', action='store_true', help='ask for the password of encrypted outbreak files')
+    return parser.parse_args(arguments)
+
+
+# Main Tabs
+# With the exception of welcome tab, all tabs' visibility/active state is conditional
+# All tab functions _return a list_ for PySGUI
+
+# Tab 0: welcome
+def tab_welcome(outbreak_filename):
+    """
+    Returns list containing Welcome tab contents. Content is conditional on file being loaded.
+    """
+    
+    welcome_tab_spacer = ' ' * 500 # This is a workaround to avoid having an inner tab frame being smaller than the tab size.
+    
+    if outbreak_filename is None:
+        welcome_tab_filename = shot['msg_no_file_loaded']
+        welcome_tab_loadfile = f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}"
+        welcome_tab_user_key = ' ' * ( len(shot['msg_user']) + 3 )
+        welcome_tab_username = ' ' * 120
+    else:
+        welcome_tab_filename = outbreak_filename
+        welcome_tab_loadfile = shot['msg_file_loaded_ok']
+        welcome_tab_user_key = f"{shot['msg_user']}: "
+        welcome_tab_username = 'user-name-string-here' # TODO: change to shot['username']
+        
+    
+    # TODO
+    shot['version'] = "0.01 alpha" # TODO set dict_version from global string atop
+    my_welcome_tab = [[sg.T(welcome_tab_spacer)],
+                      [sg.Image(filename=None, data=shot['icon_logo'], size=(120,120), pad=(2,2)), sg.T(f"Simple Hospital Outbreak Tracker\nA Free and Open Source Public Health Software Project\nCopyright (C) 2020, GNU GPL v.3. Version: {shot['version']}", font=('Sans serif', 16))],
+                      [sg.T(f"\n{shot['tab']['tip']['welcome']}\n")],
+                      [sg.T(welcome_tab_user_key, key='welcome_tab_username_infokey'), sg.T(welcome_tab_username, key='welcome_tab_username_infoval')],
+                      [sg.T(f"{shot['file_file']}: "), sg.InputText(welcome_tab_filename, key='welcome_tab_file_loaded_infobar', size=(75,1), background_color=None, enable_events=True, disabled=True)],
+                      [sg.T(welcome_tab_loadfile, key='welcome_tab_file_loaded_ok')],
+                      [sg.T(' '), sg.In(' ', visible=False, key=f"+{shot['icon_key_open']}+")],
+                      [sg.Button(shot['icon_new_str'], key=f"-{shot['icon_key_new']}-", size=(24,3), font=("Helvetica", 16)), sg.Button(shot['icon_open_str'], key=f"-{shot['icon_key_open']}-", size=(24,3), font=("Helvetica", 16))],
+                      [sg.T(' \n')]
+                      ]                          
+
+    return my_welcome_tab
+    
+
+# Tab 1: outbreak
+def tab_outbreak():
+    pass
+    
+
+def tab_epicurve():
+    """
+    Returns list containing Epicurve tab contents: bucket size drop-down and the graph (drawn by update_epicurve_tab())
+    """
+    shot['epicurve_bucket_names'] = [ shot['msg_bucket_day'], shot['msg_bucket_week'], shot['msg_bucket_month'] ]
+    shot['epicurve_strata_names'] = [ shot['msg_strata_none'], shot['msg_hospital_department'], shot['msg_hospital_building'], shot['msg_strata_role'], shot['msg_strata_gender'] ] # as epicurve_cube_dimensions
+    width, height = shot['epicurve_graph_size']
+    my_epicurve_tab = [
+                      [sg.T(f"{shot['msg_epicurve_bucket']}: "), sg.Combo(shot['epicurve_bucket_names'], default_value=shot['epicurve_bucket_names'][0], key='EPI_bucket', enable_events=True, readonly=True),
+                       sg.T(f"{shot['msg_epicurve_strata']}: "), sg.Combo(shot['epicurve_strata_names'], default_value=shot['epicurve_strata_names'][0], key='EPI_strata', enable_events=True, readonly=True)],
+                      [sg.Graph(canvas_size=(width, height), graph_bottom_left=(0, 0), graph_top_right=(width, height), background_color='white', key='EPI_graph')]
+                      ]
+    return my_epicurve_tab
+
+
+def tab_linelist():
+    """
+    Returns list containing Linelist tab contents: one page of cases (filled by update_linelist_tab()) and buttons to page through
+    """
+    my_linelist_tab = [
+                      [sg.Table(values=[], headings=list(linelist_view_fields), key='LIST_table', auto_size_columns=False, col_widths=[10, 8, 12, 14, 12, 5, 6, 8, 14, 6, 5], num_rows=20, justification='left')],
+                      [sg.Button(shot['msg_linelist_previous'], key='LIST_previous'), sg.Button(shot['msg_linelist_next'], key='LIST_next'), sg.T(' ' * 30, key='LIST_position')]
+                      ]
+    return my_linelist_tab
+
+
+def update_linelist_tab(window, page=0):
+    """
+    Shows page (int, shot['linelist_page_rows'] cases per page, clipped to the cases there are) of the linelist in the Linelist tab
+    Only the cases on the page are decoded if the outbreak file was opened lazily (see get_linelist_rows()).
+    Returns int (the page shown)
+    """
+    page_rows = shot['linelist_page_rows']
+    cases_in_total = count_linelist_cases()
+    page = max(0, min(page, (cases_in_total - 1) // page_rows))
+    first = page * page_rows
+    cases = linelist_strings(get_linelist_rows(first, first + page_rows))
+    window['LIST_table'].update(values=cases[list(linelist_view_fields)].values.tolist())
+    window['LIST_position'].update(value=f"{min(first + 1, cases_in_total)}-{first + len(cases)} / {cases_in_total}")
+    return page
+
+
+def update_selected_tab(window, values):
+    """
+    (Re)draws the selected tab (values['MAIN_tabs']) if it shows data: Overview, G-chart or Epicurve
+    The other tabs are drawn when selected, so opening a large file does not decode all its cases (see Note on the RECORD INDEX).
+    """
+    if values.get('MAIN_tabs') == shot['tab']['title']['overview']:
+        update_overview_tab(window, values['OV_level'])
+    elif values.get('MAIN_tabs') == shot['tab']['title']['g-chart']:
+        update_gchart_tab(window, values['GCHART_sample_type'], values['GCHART_baseline'])
+    elif values.get('MAIN_tabs') == shot['tab']['title']['epicurve'] and shot['tab']['show']['epicurve']:
+        update_epicurve_tab(window, values['EPI_bucket'], values['EPI_strata'])
+
+
+def tab_gchart():
+    """
+    Returns list containing G-chart tab contents: sample type and baseline drop-downs and the graph (drawn by update_gchart_tab())
+    """
+    baseline_names = [shot['msg_gchart_all']] + [ str(baseline) for baseline in shot['gchart_baselines'] ]
+    width, height = shot['gchart_graph_size']
+    my_gchart_tab = [
+                    [sg.T(f"{shot['msg_sample_type']}: "), sg.Combo([shot['msg_gchart_all']], default_value=shot['msg_gchart_all'], key='GCHART_sample_type', enable_events=True, readonly=True, size=(20,1)),
+                     sg.T(f"{shot['msg_gchart_baseline']}: "), sg.Combo(baseline_names, default_value=shot['msg_gchart_all'], key='GCHART_baseline', enable_events=True, readonly=True)],
+                    [sg.Graph(canvas_size=(width, height), graph_bottom_left=(0, 0), graph_top_right=(width, height), background_color='white', key='GCHART_graph')]
+                    ]
+    return my_gchart_tab
+
+
+            # # if filename not None
+            # # display 1 tab: "Welcome"
+            # # This tab shows 2 buttons (New and Open)
+            # # When new and open leads to verified file => 3 more tabs become accessible: Overview | Linelist | Epicurve
+            # # So that the tab-line becomes
+            # #
+            # # Welcome | Overview | Linelist | Epicurve
+            # # Welcome | Outbreak | Linelist | Epicurve
+            # # Velkommen | Utbrudd | Tilfeller | Epikurve
+            
+            
+        
+    
+    
+    # if self.content_type == 'table':
+        # self.table_data = []
+        
+        # if self.frame_title == 'overview':
+            # # Read data from file into dictionary
+            # pass
+            
+            # # Put dictionary into PySGUI table list
+
+            
+    # # Use this somewhere else..? For putting up the csv, of course.
+
+
+
+# Fields shown in the Linelist tab (see tab_linelist())
+linelist_view_fields = ('sample_date', 'sample_type', 'fnr', 'lastname', 'firstname', 'age', 'gender', 'role', 'department', 'room', 'bed')
+
+
+# Spreadsheet column names we recognize, in addition to the field names in shot['headers']['data']
+# (see the legend of database fields in add_linelist_case())
+import_column_aliases = {
+                        'p-dato': 'sample_date', 'sample date': 'sample_date', 'p-mat': 'sample_type', 'sample type': 'sample_type',
+                        'ssn': 'fnr', 'etternavn': 'lastname', 'fornavn': 'firstname', 'fødselsdato': 'DOB', 'alder': 'age',
+                        'kjønn': 'gender', 'sex': 'gender', 'fam. kode': 'fam_kode', 'status': 'role', 'avdeling': 'department',
+                        'dept': 'department', 'arbeids team': 'team', 'rom': 'room', 'seng': 'bed', 'risikofaktorer': 'risks',
+                        'risk factors': 'risks'
+                        }
+
+
+def import_column_map(spreadsheet_header):
+    """
+    Maps spreadsheet column names (list of str) onto linelist fields (case insensitive)
+    Returns dict {spreadsheet column: linelist field}, unrecognized columns are left out.
+    """
+    known_names = dict(import_column_aliases)
+    for field in shot['headers']['data'][1:]:
+        known_names[field.lower()] = field
+        known_names[field.lower().replace('_', ' ')] = field
+    
+    column_map = {}
+    for column in spreadsheet_header:
+        field = known_names.get(str(column).strip().lower())
+        if field is not None and field not in column_map.values():
+            column_map[column] = field
+    return column_map
+
+
+def import_from_csv(input_file, progress=None):
+    """
+    Imports cases from a spreadsheet (CSV export) into the linelist.
+    The file is read in chunks of shot['import_chunk_rows'] rows using the pandas C parser with all columns as strings,
+    through one open_csv_stream() for the header and the rows, so compressed and encrypted spreadsheets read the same.
+    Columns are mapped onto shot['headers']['data'] by name (see import_column_map()), and each chunk is validated
+    and typed before the next is read, so the raw spreadsheet is never held in memory.
+    The chunks are joined to the linelist once, when it is next read (see append_linelist()).
+    Rows without a sample date, or with one that is not a date (see linelist_date_formats), are skipped, and duplicates
+    of cases already in the linelist (or earlier in the file) are handled as set in shot['import_duplicates'] (see add_linelist_cases()).
+    progress (callable or None) is called with the number of rows read after each chunk, e.g. to update the status bar.
+    Returns four ints: rows imported, rows skipped without a sample date, rows skipped with an unreadable sample date
+    and duplicates found, or None if no columns could be mapped.
+    """
+    
+    with open_csv_stream(input_file, encoding='utf-8-sig') as spreadsheet:
+        # Spreadsheets exported from Norwegian Excel use ';', others ',' or tabs. We only need the header line to tell.
+        header_line = spreadsheet.readline()
+        try:
+            delimiter = csv.Sniffer().sniff(header_line, delimiters=';,\t').delimiter
+        except csv.Error:
+            delimiter = ';'
+        
+        header_row = next(csv.reader([header_line], delimiter=delimiter), [])
+        column_map = import_column_map(header_row)
+        if not column_map:
+            return None
+        
+        # The rows follow in the same stream, so columns are known by position (the first of equally named ones).
+        # Not by usecols: pandas then rejects rows shorter than the header, which spreadsheets write for empty trailing cells.
+        column_positions = { header_row.index(column): field for column, field in column_map.items() }
+        spreadsheet_reader = pd.read_csv(spreadsheet, sep=delimiter, engine='c', header=None, names=range(len(header_row)), dtype=str, keep_default_na=False,
+                                         chunksize=shot['import_chunk_rows'])
+        return import_spreadsheet_chunks(spreadsheet_reader, column_positions, progress)
+
+
+def import_spreadsheet_chunks(spreadsheet_reader, column_map, progress=None):
+    """
+    Validates and adds the chunks (DataFrames of strings) of spreadsheet_reader to the linelist, see import_from_csv()
+    column_map (dict) maps the columns of the chunks onto shot['headers']['data'], other columns are left out.
+    Returns four ints: rows imported, rows skipped without a sample date, rows skipped with an unreadable sample date
+    and duplicates found.
+    """
+    
+    # Author and time stamp of the imported records
+    import_author = shot.get('username') or shot.get('conf_user') or ''
+    import_tstamp = datetime.datetime.now().isoformat()
+    
+    linelist_fields = shot['headers']['data'][1:]
+    rows_read = 0
+    rows_skipped = 0
+    rows_bad_dates = 0
+    rows_imported = 0
+    duplicates_found = 0
+    
+    for chunk in spreadsheet_reader:
+        rows_read += len(chunk)
+        chunk = chunk[list(column_map.keys())].rename(columns=column_map)
+        
+        # Fill in the fields the spreadsheet does not have
+        for field in linelist_fields:
+            if field not in chunk.columns: chunk[field] = ''
+        chunk['author'] = chunk['author'].where(chunk['author'] != '', import_author)
+        chunk['tstamp'] = chunk['tstamp'].where(chunk['tstamp'] != '', import_tstamp)
+        
+        # Validate: sample date is required (it is what we plot), unreasonable ages are dropped
+        has_date = chunk['sample_date'].str.strip() != ''
+        chunk = linelist_set_types(chunk[linelist_fields].copy())
+        is_valid = chunk['sample_date'].notna()
+        rows_skipped += int((~has_date).sum())
+        rows_bad_dates += int((has_date & ~is_valid).sum())
+        chunk = chunk[is_valid]
+        chunk.loc[((chunk['age'] < 0) | (chunk['age'] > 130)).fillna(False), 'age'] = pd.NA
+        
+        # Each chunk is checked against the duplicate index as it comes (see Note on DUPLICATES)
+        new_keys, chunk_duplicates = add_linelist_cases(chunk, shot['import_duplicates'])
+        rows_imported += len(new_keys)
+        duplicates_found += chunk_duplicates
+        if progress is not None: progress(rows_read)
+    
+    return rows_imported, rows_skipped, rows_bad_dates, duplicates_found
+
+
+def append_linelist(new_cases):
+    """
+    Appends new_cases (linelist DataFrame) to the linelist, keyed after the last existing record
+    Registers the new records for the next save. Returns list of the new record keys.
+    There is no duplicate check here, use add_linelist_cases() for that.
+    The cases are kept aside (shot['data_appended']) until the linelist is read, so an import of many chunks
+    or many cases added one by one does not copy the whole linelist each time (see get_linelist()).
+    """
+    if shot['data_appended']:
+        first_key = int(shot['data_appended'][-1].index[-1]) + 1
+    else:
+        linelist = get_linelist()
+        first_key = int(linelist.index.max()) + 1 if len(linelist) > 0 else 0
+    new_keys = list(range(first_key, first_key + len(new_cases)))
+    new_cases = new_cases.set_axis(new_keys)
+    shot['data_appended'].append(new_cases)
+    update_epicurve_cube(new_cases, 1)
+    for key in new_keys:
+        mark_record_changed('data', key)
+    return new_keys
+   
+
+# tab_outbreak_intro = 'Outbreak Overview'
+# outbreak_info = {}
+# outbreak_info['created'] = '2020-05-09'
+# outbreak_info['outbreak began'] = '2020-05-01'
+# outbreak_info['outbreak ended'] = 'N/A'
+# outbreak_info['type'] = 'influenza typeB'
+# outbreak_info['outbreak'] = f"{outbreak_info['type']} outbreak {outbreak_info['outbreak began']}"
+# outbreak_info['basename'] = f"{outbreak_info['outbreak began']}_{outbreak_info['type']}"
+# outbreak_info['filename'] = f"{outbreak_info['basename']}.out"
+# outbreak_info['datafile'] = f"{outbreak_info['basename']}.csv"
+
+
+
+
+# OUTBREAK COMPARISON (Statistics > Outbreak comparison)
+# Each outbreak file is reduced to a small summary in a process pool worker (see summarize_outbreak_file()),
+# so comparing this season with the last ten outbreaks parses ten files at once, and never on the GUI thread.
+# The summaries are then aligned on day since onset (first sample date).
+
+def hospital_room_count(hospital_dict):
+    """
+    Returns int (number of unique rooms of a hospital, e.g. hospital['MadeUp Hospital'] or shot['hospital'])
+    Counted by unique room id (see hospital_room_ids()), so room 101 in two buildings is two rooms.
+    """
+    return len(hospital_room_ids(hospital_dict))
+
+
+def summarize_outbreak_file(my_outbreak_file, population=None):
+    """
+    Reduces an outbreak file to a compact summary. Runs in process pool workers, see compare_outbreak_files()
+    population (dict or None) maps hospital name => population at risk (number of rooms, see hospital_room_count())
+    Returns dict with keys: file, ok, title, hospital, infection type, cases, onset (first sample date, str),
+    duration (days), attack_rate (cases per room, None if the hospital is unknown) and
+    daily (numpy array of cases per day since onset).
+    """
+    summary = {
+              'file': str(my_outbreak_file), 'ok': False, 'title': Path(my_outbreak_file).name, 'hospital': '', 'infection type': '',
+              'cases': 0, 'onset': None, 'duration': 0, 'attack_rate': None, 'daily': np.zeros(0, dtype=np.int64)
+              }
+    
+    try:
+        records = read_outbreak_file(my_outbreak_file)
+    except ValueError:
+        records = None # encrypted with another password
+    if records is None:
+        return summary
+    return summarize_outbreak_records(summary, records, population)
+
+
+def summarize_outbreak_records(summary, records, population=None):
+    """
+    Fills in summary (dict, see summarize_outbreak_file()) from the records (dict, see read_outbreak_file()) of its file
+    Returns summary, with 'ok' set.
+    """
+    summary['ok'] = True
+    
+    outbreak_info = records['admin'][min(records['admin'])] if records['admin'] else {}
+    for info_type in 'title', 'hospital', 'infection type':
+        if outbreak_info.get(info_type): summary[info_type] = outbreak_info[info_type]
+    
+    sample_dates = records['data']['sample_date'].dropna().to_numpy(dtype='datetime64[D]')
+    if len(sample_dates) == 0:
+        return summary
+    
+    onset = sample_dates.min()
+    days_since_onset = (sample_dates - onset).astype(np.int64)
+    summary['daily'] = np.bincount(days_since_onset)
+    summary['cases'] = len(sample_dates)
+    summary['onset'] = str(onset)
+    
+    # Outbreaks without an end date (N/A) last until the last case
+    last_day = int(days_since_onset.max())
+    outbreak_end = pd.to_datetime(outbreak_info.get('end', ''), errors='coerce')
+    if not pd.isna(outbreak_end):
+        last_day = max(last_day, int((np.datetime64(outbreak_end.date(), 'D') - onset).astype(np.int64)))
+    summary['duration'] = last_day + 1
+    
+    if population and population.get(summary['hospital'], 0) > 0:
+        summary['attack_rate'] = summary['cases'] / population[summary['hospital']]
+    
+    return summary
+
+
+def align_outbreak_summaries(summaries):
+    """
+    Aligns the daily case counts of summaries (from summarize_outbreak_file()) on day since onset
+    Returns DataFrame (index: day since onset, one column per outbreak, 0 after an outbreak's last case)
+    """
+    aligned_days = max([ len(summary['daily']) for summary in summaries ], default=0)
+    aligned = {}
+    for summary in summaries:
+        column = summary['title'] if summary['title'] not in aligned else summary['file']
+        aligned[column] = np.pad(summary['daily'], (0, aligned_days - len(summary['daily'])))
+    return pd.DataFrame(aligned, index=pd.RangeIndex(aligned_days, name='day'))
+
+
+def compare_outbreak_files(outbreak_files, processes=None, progress=None):
+    """
+    Summarizes outbreak_files (list) in parallel using a process pool of processes workers (None == number of CPUs)
+    progress (callable or None) is called with (files done, files total) as summaries come in.
+    returns summaries (list, same order as outbreak_files) and aligned daily counts (DataFrame, see align_outbreak_summaries())
+    """
+    population = { hospital_id: hospital_room_count(hospital[hospital_id]) for hospital_id in hospital.keys() }
+    summaries = [ None ] * len(outbreak_files)
+    
+    # Workers get the password of encrypted outbreak files, since they do not share shot with us
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=set_encryption_password, initargs=(shot.get('encryption_password'),)) as pool:
+        pending = { pool.submit(summarize_outbreak_file, outbreak_file, population): n for n, outbreak_file in enumerate(outbreak_files) }
+        for files_done, finished in enumerate(concurrent.futures.as_completed(pending), 1):
+            summaries[pending[finished]] = finished.result()
+            if progress is not None: progress(files_done, len(outbreak_files))
+    
+    return summaries, align_outbreak_summaries(summaries)
+
+
+def popup_outbreak_comparison(summaries, aligned):
+    """
+    Shows outbreak comparison: a summary table of the outbreaks and their cases per day since onset
+    """
+    summary_headings = [shot['msg_outbreak'], shot['msg_hospital_name'], shot['msg_onset'], shot['msg_cases'], shot['msg_duration_days'], shot['msg_attack_rate']]
+    summary_rows = []
+    for summary in summaries:
+        attack_rate = 'N/A' if summary['attack_rate'] is None else f"{summary['attack_rate']*100:0.1f}%"
+        summary_rows.append([summary['title'], summary['hospital'], summary['onset'] or 'N/A', summary['cases'], summary['duration'], attack_rate])
+    
+    aligned_headings = [shot['msg_day_since_onset']] + [ str(column) for column in aligned.columns ]
+    aligned_rows = [ [day] + counts for day, counts in zip(aligned.index, aligned.values.tolist()) ] or [[ '' for heading in aligned_headings ]]
+    
+    comparison_win = [
+                     [sg.Table(values=summary_rows or [[ '' for heading in summary_headings ]], headings=summary_headings, auto_size_columns=True, num_rows=min(10, max(1, len(summary_rows))))],
+                     [sg.Table(values=aligned_rows, headings=aligned_headings, auto_size_columns=True, num_rows=min(25, len(aligned_rows)))],
+                     [sg.Button('OK')]
+                     ]
+    comparison = sg.Window(shot['stats_compare'], layout=comparison_win, margins=(2, 2), resizable=True, keep_on_top=True)
+    comparison.read()
+    comparison.close()
+
+
+# Note on MERGING
+# Copies of an outbreak file get edited in parallel, one nurse per copy. merge_outbreak_records() reconciles two copies
+# (ours and theirs) against the common ancestor they were copied from (base), as a three-way merge.
+# Records are matched by identity: rec_type, author and tstamp, plus the fields in merge_identity_fields, since an import
+# stamps all its cases alike. Records are compared by a hash of all their fields, so finding what changed is one pass
+# over each copy with dict lookups, no pairwise diffing. Records alike in identity are paired by hash first, so an unchanged
+# record pairs with itself whatever was deleted or added next to it, and only the changed ones left are paired in file order
+# (see merge_pair_records()).
+# Changing an identity field (e.g. the sample date of a case) counts as deleting the record and adding a new one.
+# A record added, changed or deleted in one copy only gets that change, and so does a record changed the same way in both.
+# Records changed differently in both copies are conflicts: the version changed last (ch_tstamp, or tstamp if never changed)
+# is kept, a changed record wins over a deleted one, and every conflict is listed for the user to check.
+
+# layout => fields identifying records besides rec_type, author and tstamp (see Note on MERGING)
+merge_identity_fields = { 'data': ('fnr', 'sample_date', 'sample_type'), 'events': ('date', 'title'), 'tseries': ('title', 'start') }
+
+
+def merge_record_hashes(records):
+    """
+    Returns dict identity => list of (content hash, CSV row, position) of the records alike (dict like shot, see read_outbreak_file())
+    identity is tuple (rec_type, author, tstamp, <merge_identity_fields> ..), and position (int) counts all records in file order.
+    """
+    record_hashes = {}
+    position = 0
+    for rec_type, (target, layout) in shot['rec_types'].items():
+        fields = shot['headers'][layout]
+        identity_columns = [ 1, fields.index('tstamp') ] + [ fields.index(field) for field in merge_identity_fields.get(layout, ()) ]
+        for row in outbreak_rows(target, records=records)[1]:
+            identity = (rec_type,) + tuple( row[column] for column in identity_columns )
+            record_hashes.setdefault(identity, []).append((hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=16).digest(), row, position))
+            position += 1
+    return record_hashes
+
+
+def merge_pair_records(base_records, our_records, their_records):
+    """
+    Pairs records alike in identity (lists from merge_record_hashes()) of base, ours and theirs (see Note on MERGING)
+    Returns list of [base, ours, theirs] records (None where a copy has none): a record of a copy pairs with a base record
+    of the same hash (unchanged), or else with the base records left in file order (changed). Records left are added,
+    and pair with a record added the same in the other copy.
+    """
+    paired = [ [record, None, None] for record in base_records ]
+    for copy_n, copy_records in (1, our_records), (2, their_records):
+        unchanged = {}
+        for pair in paired:
+            if pair[0] is not None:
+                unchanged.setdefault(pair[0][0], []).append(pair)
+        left = []
+        for record in copy_records:
+            if unchanged.get(record[0]):
+                unchanged[record[0]].pop(0)[copy_n] = record
+            else:
+                left.append(record)
+        changed = [ pair for pair in paired if pair[0] is not None and pair[copy_n] is None ]
+        for pair, record in zip(changed, left):
+            pair[copy_n] = record
+        for record in left[len(changed):]:
+            added = next(( pair for pair in paired if pair[0] is None and pair[copy_n] is None and pair[1][0] == record[0] ), None)
+            if added is None:
+                paired.append([None, record, None] if copy_n == 1 else [None, None, record])
+            else:
+                added[copy_n] = record
+    return paired
+
+
+def merge_change_stamp(row):
+    """
+    Returns when the record in CSV row was changed last (ch_tstamp, or tstamp if it has never been changed) as str
+    """
+    fields = shot['headers'][shot['rec_types'][row[0]][1]]
+    if 'ch_tstamp' in fields and row[fields.index('ch_tstamp')] != '':
+        return row[fields.index('ch_tstamp')]
+    return row[fields.index('tstamp')]
+
+
+def merge_outbreak_records(base, ours, theirs):
+    """
+    Three-way merge of the records (dicts like shot, see read_outbreak_file()) of two copies of an outbreak file,
+    ours and theirs, made from base (see Note on MERGING).
+    Returns merged records (dict like read_outbreak_records() returns) and list of conflicts,
+    each a dict with keys: identity (see merge_record_hashes(), plus n counting records alike), base, ours and theirs
+    (CSV rows or None if deleted) and kept ('ours' or 'theirs').
+    """
+    base_hashes = merge_record_hashes(base)
+    our_hashes = merge_record_hashes(ours)
+    their_hashes = merge_record_hashes(theirs)
+    
+    # Pairs in our file order, then theirs (for records we deleted or they added), like the copies read
+    paired = []
+    for identity in dict.fromkeys(list(our_hashes) + list(their_hashes) + list(base_hashes)):
+        for n, records in enumerate(merge_pair_records(base_hashes.get(identity, []), our_hashes.get(identity, []), their_hashes.get(identity, []))):
+            order = (0, records[1][2]) if records[1] is not None else (1, records[2][2]) if records[2] is not None else (2, records[0][2])
+            paired.append((order, identity + (n,), records))
+    paired.sort(key=lambda pair: pair[0])
+    
+    merged_rows = []
+    conflicts = []
+    for order, identity, records in paired:
+        base_hash, base_row = (None, None) if records[0] is None else records[0][:2]
+        our_hash, our_row = (None, None) if records[1] is None else records[1][:2]
+        their_hash, their_row = (None, None) if records[2] is None else records[2][:2]
+        
+        if our_hash == their_hash or their_hash == base_hash:
+            merged_row = our_row # same in both, or only changed by us
+        elif our_hash == base_hash:
+            merged_row = their_row # only changed by them
+        else:
+            if their_row is None or (our_row is not None and merge_change_stamp(our_row) >= merge_change_stamp(their_row)):
+                kept = 'ours'
+            else:
+                kept = 'theirs'
+            merged_row = our_row if kept == 'ours' else their_row
+            conflicts.append({ 'identity': identity, 'base': base_row, 'ours': our_row, 'theirs': their_row, 'kept': kept })
+        
+        if merged_row is not None: merged_rows.append(merged_row)
+    
+    # Route merged rows by rec_type, like read_outbreak_records() does
+    merged = { target: {} for target, layout in shot['rec_types'].values() }
+    linelist_rows = []
+    for row in merged_rows:
+        target, layout = shot['rec_types'][row[0]]
+        if target == 'data':
+            linelist_rows.append(row[1:])
+        else:
+            merged[target][len(merged[target])] = dict(zip(shot['headers'][layout], row))
+    merged['data'] = linelist_from_rows(linelist_rows)
+    merged['skipped'] = 0
+    return merged, conflicts
+
+
+def merge_into_outbreak(base_file, their_file):
+    """
+    Three-way merges their_file (another copy) into the loaded outbreak, with base_file as their common ancestor
+    The merged records replace the loaded ones, and the next save rewrites the outbreak file in full.
+    Returns list of conflicts (see merge_outbreak_records()), or None if base_file or their_file could not be read.
+    """
+    try:
+        base = read_outbreak_file(base_file)
+        theirs = read_outbreak_file(their_file)
+    except ValueError:
+        return None # encrypted with another password
+    if base is None or theirs is None:
+        return None
+    
+    close_outbreak_map()
+    ours = { target: shot[target] for target in ('admin', 'data', 'events', 'tseries') }
+    merged, conflicts = merge_outbreak_records(base, ours, theirs)
+    for target in 'admin', 'data', 'events', 'tseries':
+        shot[target] = merged[target]
+    
+    # Record keys are renumbered by the merge, so the journal (or database rows) of the open file no longer apply
+    reset_record_changes()
+    records_replaced()
+    shot['save_full_next'] = True
+    return conflicts
+
+
+def popup_merge_conflicts(conflicts):
+    """
+    Shows conflicts of a merge (see merge_outbreak_records()): which records were changed in both copies, and which version was kept
+    """
+    conflict_headings = [shot['msg_merge_record'], shot['msg_user'], shot['msg_merge_tstamp'], shot['msg_merge_kept']]
+    conflict_rows = []
+    for conflict in conflicts:
+        rec_type, author, tstamp = conflict['identity'][:3]
+        conflict_rows.append([rec_type, author, tstamp, shot['msg_merge_ours'] if conflict['kept'] == 'ours' else shot['msg_merge_theirs']])
+    
+    conflicts_win = [
+                    [sg.Text(f"{len(conflicts)} {shot['msg_merge_conflicts']}")],
+                    [sg.Table(values=conflict_rows, headings=conflict_headings, auto_size_columns=True, num_rows=min(20, max(1, len(conflict_rows))))],
+                    [sg.Button('OK')]
+                    ]
+    conflicts_popup = sg.Window(shot['file_merge'], layout=conflicts_win, margins=(2, 2), resizable=True, keep_on_top=True)
+    conflicts_popup.read()
+    conflicts_popup.close()
+
+
+# LINELIST tab functions
+
+# Note on DUPLICATES
+# Lab exports get re-imported all the time, so cases are checked for duplicates when added (imported or by hand).
+# A case is a duplicate if the linelist has a case with the same fnr, sample date and sample type (see case_index_keys()).
+# shot['case_index'] maps those keys to record keys (dict, so each check is O(1)). It is built when first needed,
+# kept up to date by add_linelist_cases(), edit_linelist_case() and remove_linelist_case(), and dropped (None)
+# whenever the linelist is replaced (opening, merging, renumbering). Cases without fnr are never duplicates.
+#
+# shot['data_version'] counts changes to the linelist, so anything computed from it can tell whether it is stale.
+
+def case_index_keys(linelist):
+    """
+    Returns list of duplicate keys (fnr, sample date as YYYY-MM-DD, sample type) of the cases in linelist (DataFrame)
+    fnr and sample type are compared without surrounding blanks, and sample type regardless of upper/lower case.
+    """
+    fnrs = linelist['fnr'].astype(str).str.strip()
+    sample_dates = linelist['sample_date'].dt.strftime('%Y-%m-%d').fillna('')
+    sample_types = linelist['sample_type'].astype(object).where(linelist['sample_type'].notna(), '').astype(str).str.strip().str.casefold()
+    return list(zip(fnrs, sample_dates, sample_types))
+
+
+def get_case_index():
+    """
+    Returns the duplicate index (dict: duplicate key => record key, see Note on DUPLICATES), building it if needed
+    """
+    if shot.get('case_index') is None:
+        linelist = get_linelist()
+        shot['case_index'] = { case_key: key for case_key, key in zip(case_index_keys(linelist), linelist.index) if case_key[0] != '' }
+    return shot['case_index']
+
+
+def linelist_changed(replaced=False):
+    """
+    Registers that the linelist changed (see Note on DUPLICATES on shot['data_version'])
+    Set replaced=True when the linelist was replaced as a whole, or its record keys changed:
+    drops the duplicate index and the live epicurve cube (see Note on EPICURVE).
+    """
+    shot['data_version'] += 1
+    if replaced:
+        shot['case_index'] = None
+        shot['epicurve_cube'] = None
+
+
+def records_replaced():
+    """
+    Registers that the loaded records were replaced as a whole (opening, merging, renumbering), see linelist_changed()
+    The time series records are counted as changed as well (see Note on TIME SERIES),
+    and cases appended to the old linelist but not joined to it yet are dropped (see append_linelist()).
+    """
+    shot['data_appended'] = []
+    linelist_changed(replaced=True)
+    shot['tseries_version'] += 1
+
+
+def change_stamp():
+    """
+    Returns author and time stamp (str) of a change made now, e.g. for ch_auth and ch_tstamp
+    """
+    return shot.get('username') or shot.get('conf_user') or '', datetime.datetime.now().isoformat()
+
+
+def linelist_strings(linelist):
+    """
+    Returns linelist (DataFrame) with all fields as strings, as in the outbreak file (see linelist_to_rows())
+    """
+    return pd.DataFrame([ row[1:] for row in linelist_to_rows(linelist) ], columns=shot['headers']['data'][1:], index=linelist.index)
+
+
+def merge_case_fields():
+    """
+    Returns list of the case fields filled from duplicates (all but who added or changed the case, and when)
+    """
+    return [ field for field in shot['headers']['data'][1:] if field not in ('author', 'tstamp', 'ch_auth', 'ch_tstamp') ]
+
+
+def first_case_values(cases, labels):
+    """
+    Returns cases (linelist DataFrame) as strings with one row per label in labels (list, one label per case, in order),
+    holding the first non-empty value of each field among the cases with that label
+    """
+    return linelist_strings(cases).set_axis(labels).replace('', np.nan).groupby(level=0, sort=False).first().fillna('')
+
+
+def merge_linelist_cases(keys, new_cases):
+    """
+    Fills the empty fields of cases keys (list) from the duplicates in new_cases (linelist DataFrame, in the same order),
+    e.g. when re-importing a lab export that has since got more details. Only cases that get new details are changed.
+    A case with several duplicates gets the first value found of each field.
+    Returns int (number of cases changed)
+    """
+    case_fields = merge_case_fields()
+    new_cases = first_case_values(new_cases, keys) # one row per case
+    cases = linelist_strings(get_linelist().loc[new_cases.index])
+    fill = (cases[case_fields] == '') & (new_cases[case_fields] != '')
+    changed = fill.any(axis=1)
+    if not changed.any():
+        return 0
+    
+    cases = cases[changed]
+    cases[case_fields] = cases[case_fields].where(~fill[changed], new_cases.loc[changed, case_fields])
+    cases['ch_auth'], cases['ch_tstamp'] = change_stamp()
+    replace_linelist_cases(linelist_set_types(cases))
+    return len(cases)
+
+
+def add_linelist_cases(new_cases, duplicates='reject'):
+    """
+    Adds new_cases (linelist DataFrame) to the linelist, checking each case against the duplicate index (see Note on DUPLICATES)
+    duplicates: 'reject' skips duplicates, 'merge' fills empty fields of the existing case from the duplicate (merge_linelist_cases())
+    Duplicates within new_cases are skipped as well, or (merge) fill the empty fields of the first of them.
+    Returns list of the new record keys and number of duplicates found.
+    """
+    case_index = get_case_index()
+    batch_index = {} # duplicate key => position of the first case with it in new_cases
+    is_new = []
+    duplicate_keys = []
+    duplicate_positions = []
+    batch_firsts = []
+    batch_duplicate_positions = []
+    for position, case_key in enumerate(case_index_keys(new_cases)):
+        if case_key[0] != '' and (case_key in case_index or case_key in batch_index):
+            is_new.append(False)
+            if case_key in case_index:
+                duplicate_keys.append(case_index[case_key])
+                duplicate_positions.append(position)
+            else:
+                batch_firsts.append(batch_index[case_key])
+                batch_duplicate_positions.append(position)
+            continue
+        if case_key[0] != '': batch_index[case_key] = position
+        is_new.append(True)
+    duplicates_found = is_new.count(False)
+    
+    if duplicates == 'merge' and duplicate_keys:
+        merge_linelist_cases(duplicate_keys, new_cases.iloc[duplicate_positions])
+    
+    if duplicates == 'merge' and batch_duplicate_positions:
+        # The first case keeps its own values, its duplicates only fill its empty fields (as merge_linelist_cases() does)
+        first_positions = sorted(set(batch_firsts))
+        merged = first_case_values(new_cases.iloc[first_positions + batch_duplicate_positions], first_positions + batch_firsts)
+        first_cases = linelist_strings(new_cases.iloc[first_positions]).set_axis(first_positions)
+        first_cases[merge_case_fields()] = merged.loc[first_positions, merge_case_fields()]
+        new_cases = new_cases.reset_index(drop=True)
+        new_cases = linelist_concat([new_cases.drop(index=first_positions), linelist_set_types(first_cases)]).sort_index()
+    
+    new_cases = new_cases[is_new]
+    if len(new_cases) == 0:
+        return [], duplicates_found
+    
+    new_keys = append_linelist(new_cases)
+    new_case_keys = case_index_keys(new_cases)
+    for case_key, key in zip(new_case_keys, new_keys):
+        if case_key[0] != '': case_index[case_key] = key
+    return new_keys, duplicates_found
+
+
+def add_linelist_case(case, duplicates='reject'):
+    """
+    Adds one case to the linelist. Built to spec (see legend below)
+    case (dict) maps fields of shot['headers']['data'] to values as in the outbreak file (strings, dates as YYYY-MM-DD).
+    Author and time stamp are set if missing. duplicates: see add_linelist_cases()
+    Returns record key of the new case, or None if it was a duplicate.
+    """
+    author, tstamp = change_stamp()
+    case = { 'author': author, 'tstamp': tstamp, **case }
+    new_keys, duplicates_found = add_linelist_cases(linelist_from_rows([[ str(case.get(field, '')) for field in shot['headers']['data'][1:] ]]), duplicates)
+    return new_keys[0] if new_keys else None
+    
+    # LEGEND OF DATABASE FIELDS (by spec)
+    #
+    # NO                        EN              Tool tip
+    # ID <auto increment>
+    # P-Dato                    Sample date     Dato prøvetaking (bærerskap), eller symptom start (illness onset)
+    # P-Mat                     Sample type     Prøvematriale, select from drop-down corresponding to infection type OR freetext
+    # Fnr                       SSN             
+    # Etternavn
+    # Fornavn 
+    # Fødselsdato               DOB             Fra FNR på Norsk
+    # Alder                     Age             Fra FNR på Norsk
+    # Kjønn                     Sex             Fra FNR på Norsk
+    # Fam. kode                                 ???
+    # Status                    Status          Pasient, pårørende, ansatt, ekstern
+    # Avdeling                  Dept
+    # Arbeids team              Team
+    # Rom                       Room            Choose from hospital settings
+    # Seng                      Bed             Choose from hospital settings
+    # Spa-type                                  Type MRSA (sjekk "spa type" på engelsk)
+    # Risikofaktorer            Risk factors    Factors that amplify risk for infection or outcome
+    
+    # NOTA BENE
+    # P-mat avhengig av infeksjonstype
+    # Hvilken sykdom det er snakk om
+    # 
+    # Noro - oppkast, diare
+    # Influensa - dyp neseprøve
+    # ESBL - 
+    # 
+    #
+    #
+    #
+
+
+def edit_linelist_case(key, changes):
+    """
+    Changes fields of case key. changes (dict) maps fields of shot['headers']['data'] to new values as in the outbreak file
+    (strings, dates as YYYY-MM-DD). The change is stamped (ch_auth, ch_tstamp) and the duplicate index kept up to date.
+    """
+    case = linelist_strings(get_linelist().loc[[key]])
+    for field, value in changes.items():
+        case[field] = str(value)
+    case['ch_auth'], case['ch_tstamp'] = change_stamp()
+    replace_linelist_cases(linelist_set_types(case))
+
+
+def replace_linelist_cases(edited_cases):
+    """
+    Replaces the cases in the linelist that have the record keys of edited_cases (linelist DataFrame) with edited_cases
+    Registers the changes for the next save and keeps the duplicate index and live epicurve cube up to date.
+    The cases are changed in place, column by column, so the cost does not grow with the linelist.
+    """
+    linelist = get_linelist()
+    keys = list(edited_cases.index)
+    old_case_keys = case_index_keys(linelist.loc[keys])
+    update_epicurve_cube(linelist.loc[keys], -1)
+    update_epicurve_cube(edited_cases, 1)
+    for column in edited_cases.columns:
+        if isinstance(linelist[column].dtype, pd.CategoricalDtype):
+            # A category column only takes values it has a category for
+            new_categories = pd.Index(edited_cases[column].dropna().unique()).difference(linelist[column].cat.categories)
+            if len(new_categories) > 0: linelist[column] = linelist[column].cat.add_categories(new_categories)
+            linelist.loc[keys, column] = edited_cases[column].astype(object)
+        else:
+            linelist.loc[keys, column] = edited_cases[column]
+    for key in keys:
+        mark_record_changed('data', key)
+    
+    if shot.get('case_index') is not None:
+        for case_key, key in zip(old_case_keys, keys):
+            if shot['case_index'].get(case_key) == key: del shot['case_index'][case_key]
+        for case_key, key in zip(case_index_keys(edited_cases), keys):
+            if case_key[0] != '': shot['case_index'][case_key] = key
+
+
+def remove_linelist_case(key):
+    """
+    Removes case key from the linelist (and the duplicate index)
+    """
+    linelist = get_linelist()
+    case_key = case_index_keys(linelist.loc[[key]])[0]
+    update_epicurve_cube(linelist.loc[[key]], -1)
+    shot['data'] = linelist.drop(index=[key])
+    mark_record_changed('data', key, deleted=True)
+    if shot.get('case_index') is not None and shot['case_index'].get(case_key) == key:
+        del shot['case_index'][case_key]
+
+
+
 #     Graphical User Interface
 WIN_W: int = 90
 WIN_H: int = 25
@@ -2459,6 +6316,7 @@ def set_gui_strings(language):
     shot['file_save'] = 'Save'
     shot['file_save_as'] = 'Save As ...'
     shot['file_import'] = 'Import from spreadsheet'
+    shot['file_merge'] = 'Merge copies ..'
     shot['file_export_sheet'] = 'Export data spreadsheet'
     shot['file_export_image'] = 'Export plot image'
     shot['file_print'] = 'Print'
@@ -2469,6 +6327,8 @@ def set_gui_strings(language):
     shot['stats_epicurve'] = 'Epicurve'
     shot['stats_gchart'] = 'G-Chart'
     shot['stats_compare'] = 'Outbreak comparison'
+    shot['stats_exposure'] = 'Exposure'
+    shot['stats_contacts'] = 'Contact clusters'
     shot['stats_filtering'] = 'Filtering'
     
     # Settings
@@ -2514,6 +6374,8 @@ def set_gui_strings(language):
     shot['status_printed'] = 'Printed'
     shot['status_saving'] = 'Saving'
     shot['status_saved'] = 'Saved'
+    shot['status_importing'] = 'Importing'
+    shot['status_imported'] = 'Imported'
     
     
     # Strings for tab headers and tab tooltips
@@ -2525,7 +6387,37 @@ def set_gui_strings(language):
     shot['tab_events'] = 'Events'
     shot['tip_events'] = 'View or add pertinent events to timeline'
     shot['tip_epicurve'] = 'Plot the data from the linelist'
+    shot['msg_epicurve_bucket'] = 'Cases per'
+    shot['msg_epicurve_no_cases'] = 'No cases with a sample date'
+    shot['msg_tseries_skipped'] = 'time series periods without readable dates are not shown' # preceded by a number
+    shot['msg_epicurve_cases'] = 'cases'
+    shot['msg_bucket_day'] = 'Day'
+    shot['msg_bucket_week'] = 'Week'
+    shot['msg_bucket_month'] = 'Month'
+    shot['msg_epicurve_strata'] = 'Stratify by'
+    shot['msg_strata_none'] = 'Nothing'
+    shot['msg_strata_role'] = 'Role'
+    shot['msg_strata_gender'] = 'Gender'
+    shot['msg_unknown'] = 'Unknown'
+    shot['msg_other'] = 'Other'
+    shot['msg_filter_dates'] = 'Sample date (YYYY-MM-DD)'
+    shot['msg_filter_ages'] = 'Age'
+    shot['msg_filter_risks'] = 'Risk factors (any of, comma separated)'
+    shot['msg_filter_clear'] = 'Clear filter'
+    shot['msg_filter_cases'] = 'cases'
+    shot['err_filter_value'] = 'Please enter dates as YYYY-MM-DD and ages as numbers'
+    shot['status_filtered'] = 'Filter:'
+    shot['status_filter_off'] = 'Filter cleared'
+    shot['status_exported'] = 'Exported'
+    shot['err_matplotlib_missing'] = 'Chart images need matplotlib (pip install matplotlib)'
+    shot['err_print_failed'] = 'Could not print'
     shot['tip_g-chart'] = 'Plot data from linelist in g-chart'
+    shot['msg_sample_type'] = 'Sample type'
+    shot['msg_gchart_baseline'] = 'Limits from preceding gaps'
+    shot['msg_gchart_all'] = 'All'
+    shot['msg_gchart_few_cases'] = 'At least two cases with a sample date are needed'
+    shot['msg_linelist_previous'] = 'Previous'
+    shot['msg_linelist_next'] = 'Next'
     
     # General application strings
     shot['msg_change'] = 'Change'
@@ -2563,6 +6455,20 @@ def set_gui_strings(language):
     shot['err_no_headers'] = 'Incorrect file type. File did not contain any headers..'
     shot['err_weird_data_string'] = 'Weird. Cannot convert input file string to Path object.'
     shot['err_input_notafile'] = 'Incorrect input. Input is not a file.'
+    shot['err_import_no_columns'] = 'Could not find any linelist columns in the spreadsheet header.'
+    shot['err_save_failed'] = 'Could not save'
+    shot['err_encryption_unavailable'] = 'Encrypted outbreak files need the Python package cryptography.'
+    shot['err_encryption_password'] = 'Wrong password, or the file is damaged.'
+    shot['err_encryption_mismatch'] = 'The passwords do not match.'
+    shot['err_encryption_database'] = 'Outbreak databases (.sqlite, .db) cannot be encrypted. Save as CSV instead, or turn encryption off.'
+    shot['msg_encryption_password'] = 'Password of encrypted outbreak files:'
+    shot['msg_encryption_new_password'] = 'Save outbreak files encrypted with password (leave empty to turn encryption off):'
+    shot['msg_encryption_repeat'] = 'Repeat password:'
+    shot['msg_encryption_on'] = 'This outbreak will be saved encrypted.'
+    shot['msg_encryption_off'] = 'This outbreak will be saved unencrypted.'
+    shot['msg_import_skipped'] = 'rows without a sample date were skipped' # preceded by a number
+    shot['msg_import_bad_dates'] = 'rows with a sample date that is not a date (YYYY-MM-DD or DD.MM.YYYY) were skipped' # preceded by a number
+    shot['msg_import_duplicates'] = 'rows were already in the linelist (same fnr, sample date and sample type)' # preceded by a number
     shot['msg_unsaved_changes'] = 'There are unsaved changes in ' # completed by <file> or <hospital name> etc.
     
     # Hospital admin strings
@@ -2611,6 +6517,42 @@ def set_gui_strings(language):
     shot['msg_hospital_room_status_custom'] = 'Custom status'
     shot['msg_hospital_room_status_spec'] = 'Specify' # Used with Other
     
+    # Statistics strings
+    shot['status_comparing'] = 'Comparing'
+    shot['status_merged'] = 'Merged'
+    shot['msg_conflicts'] = 'conflicts'
+    shot['msg_merge_base'] = 'Common ancestor (the copy both were made from)'
+    shot['msg_merge_other'] = 'Copy to merge into the open outbreak'
+    shot['msg_merge_conflicts'] = 'conflicts: records changed in both copies. The version changed last was kept.'
+    shot['msg_merge_record'] = 'Record'
+    shot['msg_merge_tstamp'] = 'Created'
+    shot['msg_merge_kept'] = 'Kept'
+    shot['msg_merge_ours'] = 'Open file'
+    shot['msg_merge_theirs'] = 'Other copy'
+    shot['msg_outbreak'] = 'Outbreak'
+    shot['msg_cases'] = 'Cases'
+    shot['msg_onset'] = 'Onset'
+    shot['msg_duration_days'] = 'Duration (days)'
+    shot['msg_attack_rate'] = 'Attack rate'
+    shot['msg_attack_rate_per_room'] = 'Cases per room'
+    shot['msg_rooms_with_cases'] = 'Rooms with cases'
+    shot['msg_confidence_interval'] = '95% CI'
+    shot['msg_day_since_onset'] = 'Day'
+    shot['msg_exposed_cases'] = 'Cases exposed'
+    shot['msg_exposure_case'] = 'Case'
+    shot['msg_exposure_window'] = 'Exposure window'
+    shot['msg_exposure_person'] = 'Stayed with' # the case itself, or another person
+    shot['msg_exposure_stay'] = 'Stay'
+    shot['err_no_incubation'] = 'Set the incubation period of the outbreak to find exposures'
+    shot['msg_contacts_place'] = 'In contact in the same'
+    shot['msg_contacts_bed'] = 'Bed'
+    shot['msg_contacts_cluster'] = 'Cluster'
+    shot['msg_contacts_people'] = 'People'
+    shot['msg_contacts_from'] = 'From'
+    shot['msg_contacts_to'] = 'To'
+    shot['msg_contacts_chain'] = 'Shortest chain'
+    shot['msg_contacts_no_chain'] = 'No chain of contacts between them'
+    
     # Medical strings
     # TODO
     
@@ -2627,6 +6569,7 @@ def set_gui_strings(language):
         shot['file_save'] = 'Lagre'
         shot['file_save_as'] = 'Lagre som ..'
         shot['file_import'] = 'Importer fra regneark'
+        shot['file_merge'] = 'Slå sammen kopier ..'
         shot['file_export_sheet'] = 'Eksporter regneark'
         shot['file_export_image'] = 'Eksporter bilde'
         shot['file_print'] = 'Skriv ut'
@@ -2637,6 +6580,8 @@ def set_gui_strings(language):
         shot['stats_epicurve'] = 'Epikurve'
         shot['stats_gchart'] = 'G-kurve'
         shot['stats_compare'] = 'Sammenligne utbrudd'
+        shot['stats_exposure'] = 'Eksponering'
+        shot['stats_contacts'] = 'Kontaktklynger'
         shot['stats_filtering'] = 'Filter'
         
         shot['settings_settings'] = 'Innstillinger'
@@ -2678,6 +6623,11 @@ def set_gui_strings(language):
         shot['status_printed'] = 'Skrev ut'
         shot['status_saving'] = 'Lagrer'
         shot['status_saved'] = 'Lagret'
+        shot['status_importing'] = 'Importerer'
+        shot['status_imported'] = 'Importerte'
+        shot['msg_import_duplicates'] = 'rader fantes allerede i linjelisten (samme fnr, prøvedato og prøvemateriale)'
+        shot['msg_import_skipped'] = 'rader uten prøvedato ble hoppet over'
+        shot['msg_import_bad_dates'] = 'rader med en prøvedato som ikke er en dato (ÅÅÅÅ-MM-DD eller DD.MM.ÅÅÅÅ) ble hoppet over'
         
         # Strings for tab headers and tab tooltips
         shot['tab_welcome'] = 'Velkommen'
@@ -2688,7 +6638,37 @@ def set_gui_strings(language):
         shot['tab_events'] = 'Hendelser'
         shot['tip_events'] = 'Rediger eller legg til hendelser som er relevante for utbruddet'
         shot['tip_epicurve'] = 'Plott en epikurve av linelisten'
+        shot['msg_epicurve_bucket'] = 'Tilfeller per'
+        shot['msg_epicurve_no_cases'] = 'Ingen tilfeller med prøvedato'
+        shot['msg_tseries_skipped'] = 'tidsserieperioder uten lesbare datoer vises ikke'
+        shot['msg_epicurve_cases'] = 'tilfeller'
+        shot['msg_bucket_day'] = 'Dag'
+        shot['msg_bucket_week'] = 'Uke'
+        shot['msg_bucket_month'] = 'Måned'
+        shot['msg_epicurve_strata'] = 'Fordel på'
+        shot['msg_strata_none'] = 'Ingenting'
+        shot['msg_strata_role'] = 'Rolle'
+        shot['msg_strata_gender'] = 'Kjønn'
+        shot['msg_unknown'] = 'Ukjent'
+        shot['msg_other'] = 'Andre'
+        shot['msg_filter_dates'] = 'Prøvedato (ÅÅÅÅ-MM-DD)'
+        shot['msg_filter_ages'] = 'Alder'
+        shot['msg_filter_risks'] = 'Risikofaktorer (en av, kommaseparert)'
+        shot['msg_filter_clear'] = 'Fjern filter'
+        shot['msg_filter_cases'] = 'tilfeller'
+        shot['err_filter_value'] = 'Skriv datoer som ÅÅÅÅ-MM-DD og alder som tall'
+        shot['status_filtered'] = 'Filter:'
+        shot['status_filter_off'] = 'Filter fjernet'
+        shot['status_exported'] = 'Eksporterte'
+        shot['err_matplotlib_missing'] = 'Grafbilder krever matplotlib (pip install matplotlib)'
+        shot['err_print_failed'] = 'Kunne ikke skrive ut'
         shot['tip_g-chart'] = 'Plott en G chart graf av linelisten'
+        shot['msg_sample_type'] = 'Prøvetype'
+        shot['msg_gchart_baseline'] = 'Grenser fra foregående mellomrom'
+        shot['msg_gchart_all'] = 'Alle'
+        shot['msg_gchart_few_cases'] = 'Trenger minst to tilfeller med prøvedato'
+        shot['msg_linelist_previous'] = 'Forrige'
+        shot['msg_linelist_next'] = 'Neste'
         
         # Some general warnings and errors
         shot['msg_user'] = 'Bruker'
@@ -2708,6 +6688,51 @@ def set_gui_strings(language):
         shot['err_incorrect_delim'] = 'Feil filtype. Filen har ikke riktig delimiter.'
         shot['err_no_headers'] = 'Feil filtype. Filen har ingen overskrifter.'
         shot['err_input_notafile'] = 'Feil objekt. Inndata er ikke en fil.'
+        shot['err_save_failed'] = 'Kunne ikke lagre'
+        shot['err_encryption_unavailable'] = 'Krypterte utbruddsfiler krever Python-pakken cryptography.'
+        shot['err_encryption_password'] = 'Feil passord, eller filen er skadet.'
+        shot['err_encryption_mismatch'] = 'Passordene er ikke like.'
+        shot['err_encryption_database'] = 'Utbruddsdatabaser (.sqlite, .db) kan ikke krypteres. Lagre som CSV i stedet, eller skru av kryptering.'
+        shot['msg_encryption_password'] = 'Passord for krypterte utbruddsfiler:'
+        shot['msg_encryption_new_password'] = 'Lagre utbruddsfiler kryptert med passord (la stå tomt for å skru av kryptering):'
+        shot['msg_encryption_repeat'] = 'Gjenta passord:'
+        shot['msg_encryption_on'] = 'Dette utbruddet blir lagret kryptert.'
+        shot['msg_encryption_off'] = 'Dette utbruddet blir lagret ukryptert.'
+        
+        shot['status_comparing'] = 'Sammenligner'
+        shot['status_merged'] = 'Slo sammen'
+        shot['msg_conflicts'] = 'konflikter'
+        shot['msg_merge_base'] = 'Felles opphav (kopien begge ble laget fra)'
+        shot['msg_merge_other'] = 'Kopi som skal slås sammen med åpent utbrudd'
+        shot['msg_merge_conflicts'] = 'konflikter: poster endret i begge kopier. Sist endrede versjon ble beholdt.'
+        shot['msg_merge_record'] = 'Post'
+        shot['msg_merge_tstamp'] = 'Opprettet'
+        shot['msg_merge_kept'] = 'Beholdt'
+        shot['msg_merge_ours'] = 'Åpen fil'
+        shot['msg_merge_theirs'] = 'Annen kopi'
+        shot['msg_outbreak'] = 'Utbrudd'
+        shot['msg_cases'] = 'Tilfeller'
+        shot['msg_onset'] = 'Start'
+        shot['msg_duration_days'] = 'Varighet (dager)'
+        shot['msg_attack_rate'] = 'Angrepsrate'
+        shot['msg_attack_rate_per_room'] = 'Tilfeller per rom'
+        shot['msg_rooms_with_cases'] = 'Rom med tilfeller'
+        shot['msg_confidence_interval'] = '95% KI'
+        shot['msg_day_since_onset'] = 'Dag'
+        shot['msg_exposed_cases'] = 'Eksponerte tilfeller'
+        shot['msg_exposure_case'] = 'Tilfelle'
+        shot['msg_exposure_window'] = 'Eksponeringsvindu'
+        shot['msg_exposure_person'] = 'Oppholdt seg med'
+        shot['msg_exposure_stay'] = 'Opphold'
+        shot['err_no_incubation'] = 'Angi inkubasjonstiden for utbruddet for å finne eksponering'
+        shot['msg_contacts_place'] = 'I kontakt i samme'
+        shot['msg_contacts_bed'] = 'Seng'
+        shot['msg_contacts_cluster'] = 'Klynge'
+        shot['msg_contacts_people'] = 'Personer'
+        shot['msg_contacts_from'] = 'Fra'
+        shot['msg_contacts_to'] = 'Til'
+        shot['msg_contacts_chain'] = 'Korteste kjede'
+        shot['msg_contacts_no_chain'] = 'Ingen kontaktkjede mellom dem'
         
         
         
@@ -2737,6 +6762,15 @@ def set_gui_strings(language):
         shot['msg_hospital_room'] = 'Rom'
         shot['msg_hospital_rooms'] = 'Rom'
         shot['msg_hospital_rooms_add'] = 'Legg til rom'
+        shot['msg_hospital_room_status_title'] = 'Valgfri romstatus'
+        shot['msg_hospital_room_status_none'] = 'Ingen'
+        shot['msg_hospital_room_status_contaminated'] = 'Kontaminert'
+        shot['msg_hospital_room_status_atrisk'] = 'Utsatt'
+        shot['msg_hospital_room_status_empty'] = 'Tomt'
+        shot['msg_hospital_room_status_niu'] = 'Ikke i bruk'
+        shot['msg_hospital_room_status_other'] = 'Annet'
+        shot['msg_hospital_room_status_custom'] = 'Egen status'
+        shot['msg_hospital_room_status_spec'] = 'Angi' # Used with Other
         shot['msg_hospital_rooms_req'] = 'For å kunne legge til rom kreves det en bygning og en avdeling.'
         shot['msg_hospital_rooms_coverage'] = 'Dekning' # how many rooms are spoken of
         shot['msg_hospital_rooms_contaminated'] = 'Kontaminerte rom (estimat)'
@@ -2839,11 +6873,51 @@ except:
     print('recent files set to 5')
     shot['show_recent_files'] = 5
 
+# Saving only appends changes to a journal next to the outbreak file (see save_outbreak_file())
+# Set save_mode to 'full' to rewrite the outbreak file on every save.
+shot['save_mode'] = 'journal'
+shot['journal_compact_rows'] = 1000
+
+# Password the loaded outbreak is saved with, None for plaintext (see Note on ENCRYPTION)
+shot['outbreak_password'] = None
+
+# Outbreak files larger than this are memory-mapped, and cases decoded on demand (see open_outbreak_map())
+shot['lazy_open_bytes'] = 20 * 1024 * 1024
+
+# Spreadsheet imports are read and validated this many rows at a time (see import_from_csv())
+# Duplicates of cases already in the linelist are 'reject'ed, or 'merge'd into them (see add_linelist_cases())
+shot['import_chunk_rows'] = 50000
+shot['import_duplicates'] = 'reject'
+
+# Cases per page of the Linelist tab (see update_linelist_tab())
+shot['linelist_page_rows'] = 50
+
+# Counts changes to the linelist (see Note on DUPLICATES)
+shot['data_version'] = 0
+shot['data_appended'] = [] # new cases not joined to shot['data'] yet (see append_linelist())
+shot['tseries_version'] = 0
+
+# Size (pixels) of the epicurve graph (see tab_epicurve()), and bar colours of the largest strata (see draw_epicurve())
+shot['epicurve_graph_size'] = (640, 320)
+shot['epicurve_colours'] = ('steelblue', 'darkorange', 'forestgreen', 'firebrick', 'mediumpurple', 'sienna', 'hotpink', 'olivedrab') # Tk and matplotlib colour names
+
+# Size (pixels) of the G-chart graph, and the rolling baselines (number of preceding gaps) to choose from (see Note on G-CHART)
+shot['gchart_graph_size'] = (640, 320)
+shot['gchart_baselines'] = (10, 25, 50, 100)
+
+# Size (pixels) of chart images shown, exported and printed, and how many of them are kept (see Note on CHART IMAGES)
+shot['chart_image_size'] = (960, 480)
+shot['chart_image_cache'] = 16
+
+# File types of outbreak files in file dialogs (.csv.gz and .csv.xz are compressed, see open_csv_stream(), .sqlite and .db see read_outbreak_database())
+shot['outbreak_file_types'] = (('Outbreak CSV', '*.csv'), ('Outbreak CSV (compressed)', '*.csv.gz *.csv.xz'), ('Outbreak database', '*.sqlite *.db'))
+
 
 # Set GUI dependining on config (if any)
 #set_gui_strings('Norwegian')
 set_gui_strings(shot['conf_lang'])
 set_gui_icons()
+set_outbreak_headers()
 
 
 
@@ -2890,409 +6964,595 @@ def popup_language():
 #file_new: str = 'New............(CTRL+N)'
 
 
-# WORKAROUND
-# TODO fix these color stuff
-COLOR_SYSTEM_DEFAULT = '#CCCCCC' # workaround
-icon_bkg = '#FFFFFF' # workaround
-#icon_bkg = sg.theme_background_color()
+def main():
+    """
+    Builds the main window and runs the event loop
+    Kept out of module level, so shots.py can be imported (e.g. by process pool workers) without opening a window.
+    """
 
-assert icon_bkg is not None, 'icon_bkg variable set to None (must not happen)'
-# assert icon_bkg == COLOR_SYSTEM_DEFAULT, 'icon_bkg variable set to system default (must not happen)'
+    global outbreak_filename
 
-# WORKAROUND ^ 
 
+    # WORKAROUND
+    # TODO fix these color stuff
+    COLOR_SYSTEM_DEFAULT = '#CCCCCC' # workaround
+    icon_bkg = '#FFFFFF' # workaround
+    #icon_bkg = sg.theme_background_color()
 
+    assert icon_bkg is not None, 'icon_bkg variable set to None (must not happen)'
+    # assert icon_bkg == COLOR_SYSTEM_DEFAULT, 'icon_bkg variable set to system default (must not happen)'
 
-# Setup top menu
-# Using string variables allows for easier translations
+    # WORKAROUND ^ 
 
-menu_layout = [
-               [shot['file_file'], [shot['file_new'], shot['file_open'], shot['file_save'], shot['file_save_as'], shot['file_close'], shot['file_import'], shot['file_export_sheet'], shot['file_export_image'], shot['file_print'], shot['file_exit']]],
-               [shot['stats_stats'], [shot['stats_epicurve'], shot['stats_gchart'], shot['stats_compare'], shot['stats_filtering']]],
-               [shot['settings_settings'], [shot['settings_encryption'], shot['settings_hospital'], [shot['settings_hospital_manage'], shot['settings_hospital_rooms'], 'testing_stuff'], shot['settings_language'], shot['settings_user_change']]], # TODO remove 'testing_stuff'
-               [shot['help_help'], [shot['help_help_help'], shot['help_online'], shot['help_license'], shot['help_participate'], shot['help_about']]]
-               ]
 
 
+    # Setup top menu
+    # Using string variables allows for easier translations
 
-# menu_layout = [
-               # [file_file, [file_new, file_open, file_save, file_save_as, file_import, file_export_sheet, file_export_image, file_print, file_exit]],
-               # [stats_stats, [stats_epicurve, stats_compare, stats_filtering]],
-               # [settings_settings, [settings_encryption, settings_hospital, [settings_hospital_manage, settings_hospital_rooms], settings_language]],
-               # [help_help, [help_help_help, help_online, help_license, help_participate, help_about]]
-               # ]
-menu_menu = [sg.Menu(menu_layout)]
+    menu_layout = [
+                   [shot['file_file'], [shot['file_new'], shot['file_open'], shot['file_save'], shot['file_save_as'], shot['file_close'], shot['file_import'], shot['file_merge'], shot['file_export_sheet'], shot['file_export_image'], shot['file_print'], shot['file_exit']]],
+                   [shot['stats_stats'], [shot['stats_epicurve'], shot['stats_gchart'], shot['stats_compare'], shot['stats_exposure'], shot['stats_contacts'], shot['stats_filtering']]],
+                   [shot['settings_settings'], [shot['settings_encryption'], shot['settings_hospital'], [shot['settings_hospital_manage'], shot['settings_hospital_rooms'], 'testing_stuff'], shot['settings_language'], shot['settings_user_change']]], # TODO remove 'testing_stuff'
+                   [shot['help_help'], [shot['help_help_help'], shot['help_online'], shot['help_license'], shot['help_participate'], shot['help_about']]]
+                   ]
 
-# Setup sub menu (icons)
-# Using base64 encoded PNG files (32x32 px)
-# menu_icons = [ sg.Button('', image_data=shot['icon_bin_new'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_new']),
-               # sg.Button('', image_data=shot['icon_bin_open'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_open']),
-               # sg.Button('', image_data=shot['icon_bin_save'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_save']),
-               # sg.Button('', image_data=shot['icon_bin_list'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_list']),
-               # sg.Button('', image_data=shot['icon_bin_plot'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_plot']),
-               # sg.Button('', image_data=shot['icon_bin_image'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_image']),
-               # sg.Button('', image_data=shot['icon_bin_print'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_print'])
-             # ]
 
-menu_icons = [ sg.Button('', image_data=shot['icon_bin_new'],   border_width=0, key=shot['icon_key_new']),
-               sg.Button('', image_data=shot['icon_bin_open'],  border_width=0, key=shot['icon_key_open']),
-               sg.Button('', image_data=shot['icon_bin_save'],  border_width=0, key=shot['icon_key_save']),
-               sg.Button('', image_data=shot['icon_bin_list'],  border_width=0, key=shot['icon_key_list']),
-               sg.Button('', image_data=shot['icon_bin_plot'],  border_width=0, key=shot['icon_key_plot']),
-               sg.Button('', image_data=shot['icon_bin_image'], border_width=0, key=shot['icon_key_image']),
-               sg.Button('', image_data=shot['icon_bin_print'], border_width=0, key=shot['icon_key_print'])
-             ]
-    
 
-# Setup tabs
-# These are the focus windows' layouts
+    # menu_layout = [
+                   # [file_file, [file_new, file_open, file_save, file_save_as, file_import, file_export_sheet, file_export_image, file_print, file_exit]],
+                   # [stats_stats, [stats_epicurve, stats_compare, stats_filtering]],
+                   # [settings_settings, [settings_encryption, settings_hospital, [settings_hospital_manage, settings_hospital_rooms], settings_language]],
+                   # [help_help, [help_help_help, help_online, help_license, help_participate, help_about]]
+                   # ]
+    menu_menu = [sg.Menu(menu_layout)]
+
+    # Setup sub menu (icons)
+    # Using base64 encoded PNG files (32x32 px)
+    # menu_icons = [ sg.Button('', image_data=shot['icon_bin_new'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_new']),
+                   # sg.Button('', image_data=shot['icon_bin_open'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_open']),
+                   # sg.Button('', image_data=shot['icon_bin_save'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_save']),
+                   # sg.Button('', image_data=shot['icon_bin_list'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_list']),
+                   # sg.Button('', image_data=shot['icon_bin_plot'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_plot']),
+                   # sg.Button('', image_data=shot['icon_bin_image'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_image']),
+                   # sg.Button('', image_data=shot['icon_bin_print'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_print'])
+                 # ]
+
+    menu_icons = [ sg.Button('', image_data=shot['icon_bin_new'],   border_width=0, key=shot['icon_key_new']),
+                   sg.Button('', image_data=shot['icon_bin_open'],  border_width=0, key=shot['icon_key_open']),
+                   sg.Button('', image_data=shot['icon_bin_save'],  border_width=0, key=shot['icon_key_save']),
+                   sg.Button('', image_data=shot['icon_bin_list'],  border_width=0, key=shot['icon_key_list']),
+                   sg.Button('', image_data=shot['icon_bin_plot'],  border_width=0, key=shot['icon_key_plot']),
+                   sg.Button('', image_data=shot['icon_bin_image'], border_width=0, key=shot['icon_key_image']),
+                   sg.Button('', image_data=shot['icon_bin_print'], border_width=0, key=shot['icon_key_print'])
+                 ]
+
+
+    # Setup tabs
+    # These are the focus windows' layouts
 
-#expand(expand_x=False,
-#    expand_y=False,
-#    expand_row=True)
+    #expand(expand_x=False,
+    #    expand_y=False,
+    #    expand_row=True)
 
 
-# dummy data
-# idea: __dict__ read from shelve file + dict read from csv file(s)
-tab_outbreak_intro = 'Outbreak Overview'
-outbreak_info = {}
-outbreak_info['created'] = '2020-05-09' # dummy
-outbreak_info['outbreak began'] = '2020-05-01' # dummy
-outbreak_info['outbreak ended'] = 'N/A' # dummy
-outbreak_info['type'] = 'influenza typeB' # dummy
+    # dummy data
+    # idea: __dict__ read from shelve file + dict read from csv file(s)
+    tab_outbreak_intro = 'Outbreak Overview'
+    outbreak_info = {}
+    outbreak_info['created'] = '2020-05-09' # dummy
+    outbreak_info['outbreak began'] = '2020-05-01' # dummy
+    outbreak_info['outbreak ended'] = 'N/A' # dummy
+    outbreak_info['type'] = 'influenza typeB' # dummy
 
 
-outbreak_info['basename'] = f"{outbreak_info['outbreak began']}_{outbreak_info['type']}"
-outbreak_info['outbreak'] = f"{outbreak_info['type']} outbreak {outbreak_info['outbreak began']}"
-outbreak_info['filename'] = f"{outbreak_info['basename']}.out"
-outbreak_info['datafile'] = f"{outbreak_info['basename']}.csv"
+    outbreak_info['basename'] = f"{outbreak_info['outbreak began']}_{outbreak_info['type']}"
+    outbreak_info['outbreak'] = f"{outbreak_info['type']} outbreak {outbreak_info['outbreak began']}"
+    outbreak_info['filename'] = f"{outbreak_info['basename']}.out"
+    outbreak_info['datafile'] = f"{outbreak_info['basename']}.csv"
 
 
-# TODO swap columns with table
-# It can specify "layout" like old html tables
+    # TODO swap columns with table
+    # It can specify "layout" like old html tables
 
-# Column layout - create outbreak
-add_outbreak_cols = '' # TODO use sg.Input instead of sg.Text on col2
-#                     [sg.Text('Date:'), sg.Input('col input 2')],
-#                     [sg.Text('Type:'), sg.Input('col input 3')],
+    # Column layout - create outbreak
+    add_outbreak_cols = '' # TODO use sg.Input instead of sg.Text on col2
+    #                     [sg.Text('Date:'), sg.Input('col input 2')],
+    #                     [sg.Text('Type:'), sg.Input('col input 3')],
 
-# Column layout - show outbreak info
-tab_outbreak_overview = [[sg.Text(tab_outbreak_intro)],
-                        [sg.Text(' ')]] #spacer
+    # Column layout - show outbreak info
+    tab_outbreak_overview = [[sg.Text(tab_outbreak_intro)],
+                            [sg.Text(' ')]] #spacer
 
-for idx, info_type in enumerate(outbreak_info):
-    tab_outbreak_overview.append([sg.Text(str(info_type.capitalize()+':')), sg.Text(outbreak_info[info_type])])
+    for idx, info_type in enumerate(outbreak_info):
+        tab_outbreak_overview.append([sg.Text(str(info_type.capitalize()+':')), sg.Text(outbreak_info[info_type])])
+    tab_outbreak_overview += [[sg.Text(' ')]] + tab_attack_rates()
 
 
-# OBSOLETED
-    #tab_outbreak_overview = [[sg.Text(tab_outbreak_intro)],
-    #                         [sg.Text(' ')], #spacer
-     #                        [sg.Text('Outbreak:'), sg.T(outbreak_inf)],
-    #                         [sg.Text('Status:'), 
-    #                         [sg.Text('Date:'), sg.Input('col input 2')],
-    #                         [sg.Text('Type:'), sg.Input('col input 3')],
-    #                         [sg.Text(''), sg.Input('col input 4')],
-    #                         [sg.Text(' ')], # spacer
-    #                         [sg.Text('Infected:'), sg.Input('col input 5')],
-     #                        [sg.Text('col Row 7'), sg.Input('col input 6')]
-      #                      ]
-# OBSOLETED
+    # OBSOLETED
+        #tab_outbreak_overview = [[sg.Text(tab_outbreak_intro)],
+        #                         [sg.Text(' ')], #spacer
+         #                        [sg.Text('Outbreak:'), sg.T(outbreak_inf)],
+        #                         [sg.Text('Status:'), 
+        #                         [sg.Text('Date:'), sg.Input('col input 2')],
+        #                         [sg.Text('Type:'), sg.Input('col input 3')],
+        #                         [sg.Text(''), sg.Input('col input 4')],
+        #                         [sg.Text(' ')], # spacer
+        #                         [sg.Text('Infected:'), sg.Input('col input 5')],
+         #                        [sg.Text('col Row 7'), sg.Input('col input 6')]
+          #                      ]
+    # OBSOLETED
 
 
 
 
-### OBSOLETE
-    # Create default (mostly empty and invisible) tabs
-    # legend: name, frame_title, tooltip, content type, default visibility
-### OBSOLETE
+    ### OBSOLETE
+        # Create default (mostly empty and invisible) tabs
+        # legend: name, frame_title, tooltip, content type, default visibility
+    ### OBSOLETE
 
 
-# Testing new idea:
-shot['tab'] = {}
-shot['tab']['title'] = {}
-shot['tab']['tip'] = {}
-shot['tab']['show'] = {}
-shot['tab']['contents'] = {}
+    # Testing new idea:
+    shot['tab'] = {}
+    shot['tab']['title'] = {}
+    shot['tab']['tip'] = {}
+    shot['tab']['show'] = {}
+    shot['tab']['contents'] = {}
 
-shot['tab']['title']['welcome'] = shot['tab_welcome']
-shot['tab']['tip']['welcome'] = shot['tip_welcome']
-shot['tab']['show']['welcome'] = True
+    shot['tab']['title']['welcome'] = shot['tab_welcome']
+    shot['tab']['tip']['welcome'] = shot['tip_welcome']
+    shot['tab']['show']['welcome'] = True
 
 
-shot['tab']['title']['overview'] = shot['tab_overview']
-shot['tab']['tip']['overview'] = shot['tip_overview']
-shot['tab']['show']['overview'] = True
+    shot['tab']['title']['overview'] = shot['tab_overview']
+    shot['tab']['tip']['overview'] = shot['tip_overview']
+    shot['tab']['show']['overview'] = True
 
 
-shot['tab']['title']['epicurve'] = shot['tab_epicurve']
-shot['tab']['tip']['epicurve']= shot['tip_epicurve']
-shot['tab']['show']['epicurve'] = False
+    shot['tab']['title']['epicurve'] = shot['tab_epicurve']
+    shot['tab']['tip']['epicurve']= shot['tip_epicurve']
+    shot['tab']['show']['epicurve'] = False
 
-shot['tab']['title']['linelist'] = shot['tab_linelist']
-shot['tab']['tip']['linelist'] = shot['tip_linelist']
-shot['tab']['show']['linelist'] = True
+    shot['tab']['title']['linelist'] = shot['tab_linelist']
+    shot['tab']['tip']['linelist'] = shot['tip_linelist']
+    shot['tab']['show']['linelist'] = True
 
-shot['tab']['title']['events'] = shot['tab_events']
-shot['tab']['tip']['events']= shot['tip_events']
-shot['tab']['show']['events'] = False
+    shot['tab']['title']['events'] = shot['tab_events']
+    shot['tab']['tip']['events']= shot['tip_events']
+    shot['tab']['show']['events'] = False
 
 
-shot['tab']['title']['g-chart'] = shot['tab_g-chart']
-shot['tab']['tip']['g-chart'] = shot['tip_g-chart']
-shot['tab']['show']['g-chart'] = True
+    shot['tab']['title']['g-chart'] = shot['tab_g-chart']
+    shot['tab']['tip']['g-chart'] = shot['tip_g-chart']
+    shot['tab']['show']['g-chart'] = True
 
 
-#tab_welcome_contents = print(tab_welcome)
-#tab_welcome_tooltip = tab_welcome.tooltip()
+    #tab_welcome_contents = print(tab_welcome)
+    #tab_welcome_tooltip = tab_welcome.tooltip()
 
-#tab_outbreak_title = 'Outbreak'
-#tab_outbreak_tip = 'Outbreak Overview'
-#tab_outbreak =
-#tab_outbreak = tab_outbreak_overview
-#tab_overview = tab_outbreak
+    #tab_outbreak_title = 'Outbreak'
+    #tab_outbreak_tip = 'Outbreak Overview'
+    #tab_outbreak =
+    #tab_outbreak = tab_outbreak_overview
+    #tab_overview = tab_outbreak
 
-# Uses dummy data from for-loop construction above:
-shot['tab']['contents']['overview'] = tab_outbreak_overview
+    # Uses dummy data from for-loop construction above:
+    shot['tab']['contents']['overview'] = tab_outbreak_overview
 
 
-#tab_linelist_title = 'Linelist'
-#tab_linelist_tip = 'View or add cases to the linelist'
-#tab_linelist = [[sg.T('Linelist')], [sg.In(key='LIST_in')]]
+    #tab_linelist_title = 'Linelist'
+    #tab_linelist_tip = 'View or add cases to the linelist'
+    #tab_linelist = [[sg.T('Linelist')], [sg.In(key='LIST_in')]]
 
-# Dummy contents for tabs here
-shot['tab']['contents']['linelist'] = [[sg.T('Linelist')], [sg.In(key='LIST_in')]]
+    # Dummy contents for tabs here
+    shot['tab']['contents']['linelist'] = tab_linelist()
 
-shot['tab']['contents']['g-chart'] = [[sg.T('G-chart')], [sg.In(key='GCHART_in')]]
+    shot['tab']['contents']['g-chart'] = tab_gchart()
 
-shot['tab']['contents']['epicurve'] = [[sg.T('Epicurve')], [sg.In(key='EPI_in')]]
+    shot['tab']['contents']['epicurve'] = tab_epicurve()
 
-shot['tab']['contents']['events'] = [[sg.T('Events')], [sg.In(key='EVE_in')]]
+    shot['tab']['contents']['events'] = [[sg.T('Events')], [sg.In(key='EVE_in')]]
 
-#shot['tab']['contents']['welcome'] = [[sg.T(shot['tab']['tip']['welcome'])],
-#                                       [sg.T('Creating a new or opening an existing outbreak file is required in order to proceed.')],
-#                                       [sg.T(' ')],
-#                                       [sg.Button('This is a button', image_data=shot['icon_bin_new'])],
-#                                       [sg.T(' ')],
-#                                       [sg.Button('', image_data=shot['icon_bin_new'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_new']), sg.T(shot['icon_new_str'], font=("Helvetica", 16))],
-#                                       [sg.T(' ')],
-#                                       [sg.Button('', image_data=shot['icon_bin_open'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_open']), sg.T(shot['icon_open_str'], font=("Helvetica", 16))]
-#                                       ]
+    #shot['tab']['contents']['welcome'] = [[sg.T(shot['tab']['tip']['welcome'])],
+    #                                       [sg.T('Creating a new or opening an existing outbreak file is required in order to proceed.')],
+    #                                       [sg.T(' ')],
+    #                                       [sg.Button('This is a button', image_data=shot['icon_bin_new'])],
+    #                                       [sg.T(' ')],
+    #                                       [sg.Button('', image_data=shot['icon_bin_new'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_new']), sg.T(shot['icon_new_str'], font=("Helvetica", 16))],
+    #                                       [sg.T(' ')],
+    #                                       [sg.Button('', image_data=shot['icon_bin_open'], button_color=(icon_bkg,icon_bkg), border_width=0, key=shot['icon_key_open']), sg.T(shot['icon_open_str'], font=("Helvetica", 16))]
+    #                                       ]
 
-# TEST
-shot['tab']['contents']['welcome'] = tab_welcome(outbreak_filename)
-# TEST
+    # TEST
+    shot['tab']['contents']['welcome'] = tab_welcome(outbreak_filename)
+    # TEST
 
 
-# font=("Helvetica", 25)
+    # font=("Helvetica", 25)
 
-# Attempt at table below
+    # Attempt at table below
 
 
-#tab_epicurve_title = 'Epicurve'
-#tab_epicurve_tip = 'Plot the data from the linelist'
-#tab_epicurve = 
+    #tab_epicurve_title = 'Epicurve'
+    #tab_epicurve_tip = 'Plot the data from the linelist'
+    #tab_epicurve = 
 
 
 
-# Testing:
+    # Testing:
 
-menu_tabs = [sg.TabGroup(          # line 3..n
-            [
+    menu_tabs = [sg.TabGroup(          # line 3..n
                 [
-                sg.Tab(shot['tab']['title']['welcome'],  shot['tab']['contents']['welcome'],  key=shot['tab']['title']['welcome'],  tooltip=shot['tab']['tip']['welcome'],  visible=shot['tab']['show']['welcome'], pad=(2,2)),
-                sg.Tab(shot['tab']['title']['overview'], shot['tab']['contents']['overview'], key=shot['tab']['title']['overview'], tooltip=shot['tab']['tip']['overview'], visible=shot['tab']['show']['overview']),
-                sg.Tab(shot['tab']['title']['linelist'], shot['tab']['contents']['linelist'], key=shot['tab']['title']['linelist'], tooltip=shot['tab']['tip']['linelist'], visible=shot['tab']['show']['linelist']),
-                sg.Tab(shot['tab']['title']['events'],   shot['tab']['contents']['events'],   key=shot['tab']['title']['events'],   tooltip=shot['tab']['tip']['events'],   visible=shot['tab']['show']['events']),
-                sg.Tab(shot['tab']['title']['g-chart'],  shot['tab']['contents']['g-chart'],  key=shot['tab']['title']['g-chart'],  tooltip=shot['tab']['tip']['g-chart'],  visible=shot['tab']['show']['g-chart']),
-                sg.Tab(shot['tab']['title']['epicurve'], shot['tab']['contents']['epicurve'], key=shot['tab']['title']['epicurve'], tooltip=shot['tab']['tip']['epicurve'], visible=shot['tab']['show']['epicurve'])
+                    [
+                    sg.Tab(shot['tab']['title']['welcome'],  shot['tab']['contents']['welcome'],  key=shot['tab']['title']['welcome'],  tooltip=shot['tab']['tip']['welcome'],  visible=shot['tab']['show']['welcome'], pad=(2,2)),
+                    sg.Tab(shot['tab']['title']['overview'], shot['tab']['contents']['overview'], key=shot['tab']['title']['overview'], tooltip=shot['tab']['tip']['overview'], visible=shot['tab']['show']['overview']),
+                    sg.Tab(shot['tab']['title']['linelist'], shot['tab']['contents']['linelist'], key=shot['tab']['title']['linelist'], tooltip=shot['tab']['tip']['linelist'], visible=shot['tab']['show']['linelist']),
+                    sg.Tab(shot['tab']['title']['events'],   shot['tab']['contents']['events'],   key=shot['tab']['title']['events'],   tooltip=shot['tab']['tip']['events'],   visible=shot['tab']['show']['events']),
+                    sg.Tab(shot['tab']['title']['g-chart'],  shot['tab']['contents']['g-chart'],  key=shot['tab']['title']['g-chart'],  tooltip=shot['tab']['tip']['g-chart'],  visible=shot['tab']['show']['g-chart']),
+                    sg.Tab(shot['tab']['title']['epicurve'], shot['tab']['contents']['epicurve'], key=shot['tab']['title']['epicurve'], tooltip=shot['tab']['tip']['epicurve'], visible=shot['tab']['show']['epicurve'])
+                    ]
+                ], key='MAIN_tabs', enable_events=True # values['MAIN_tabs'] is the selected tab (see selected_chart())
+                )
                 ]
-            ]
-            )
+
+
+
+
+    text_size_cols = 90
+    text_size_rows = 25
+
+    status_message = None # Will display 'Ready' string at bootup
+    menu_status = [sg.StatusBar(get_status_line(), relief='flat')]
+
+
+
+    # Build Main window from blocks above
+    layout = [
+            menu_menu,  # line 1
+            menu_icons, # line 2
+    #        [sg.Text(' ')], # empty line
+            menu_tabs,  # line 3...n
+    #        [sg.Text(' ')], # empty line
+            menu_status # line -1
             ]
 
 
 
+    # TODO
+    # We need to move window creation to a function, in order to destroy and re-start window upon change of language
 
-text_size_cols = 90
-text_size_rows = 25
 
-status_message = None # Will display 'Ready' string at bootup
-menu_status = [sg.StatusBar(get_status_line(), relief='flat')]
+    # Set window properties
+    # Get title from file name
+    if outbreak_filename is None:
+        gui_window_title = 'Simple Hospital Outbreak Tracker'
+    else:
+        gui_window_title = f'{outbreak_filename} - Simple Hospital Outbreak Tracker'
 
+    gui_window_title_set = gui_window_title
 
+    # Get screen size and determine sane dimensons
+    screen_width, screen_height = sg.Window.get_screen_size()
+    window_width = screen_width//3
+    if window_width < 800: window_width = screen_width//2
+    window_height = int(screen_height/1.5)
 
-# Build Main window from blocks above
-layout = [
-        menu_menu,  # line 1
-        menu_icons, # line 2
-#        [sg.Text(' ')], # empty line
-        menu_tabs,  # line 3...n
-#        [sg.Text(' ')], # empty line
-        menu_status # line -1
-        ]
+    window = sg.Window(gui_window_title, layout=layout, margins=(0, 0), size=(window_width,window_height), resizable=True, return_keyboard_events=True)
+    window.read(timeout=1)
+    #window.maximize()
+    #window['_BODY_'].expand(expand_x=True, expand_y=True)
 
 
+    # Expand one of the tabs for great justice
+    #window.FindElement(shot['tab']['title']['welcome']).expand(expand_y=True)
 
-# TODO
-# We need to move window creation to a function, in order to destroy and re-start window upon change of language
 
+    # FOR STATUS MESSAGE SEE THIS: Updating elements in active window
+    # https://pysimplegui.readthedocs.io/en/latest/#updating-elements-changing-elements-values-in-an-active-window
 
-# Set window properties
-# Get title from file name
-if outbreak_filename is None:
-    gui_window_title = 'Simple Hospital Outbreak Tracker'
-else:
-    gui_window_title = f'{outbreak_filename} - Simple Hospital Outbreak Tracker'
 
-gui_window_title_set = gui_window_title
+    # FOR ini filer (se eksempelvis shot.ini)
+    # https://docs.python.org/3/library/configparser.html
 
-# Get screen size and determine sane dimensons
-screen_width, screen_height = sg.Window.get_screen_size()
-window_width = screen_width//3
-if window_width < 800: window_width = screen_width//2
-window_height = int(screen_height/1.5)
 
-window = sg.Window(gui_window_title, layout=layout, margins=(0, 0), size=(window_width,window_height), resizable=True, return_keyboard_events=True)
-window.read(timeout=1)
-#window.maximize()
-#window['_BODY_'].expand(expand_x=True, expand_y=True)
+    # TODO rewrite event conditionals to use this format:
+    #  if sect in ('OPTIONS', 'RECENT'):
 
 
-# Expand one of the tabs for great justice
-#window.FindElement(shot['tab']['title']['welcome']).expand(expand_y=True)
+    linelist_page = 0 # shown in the Linelist tab (see update_linelist_tab())
+    while True:             # Event Loop
+        if outbreak_filename is None:
+            for tab_keys in shot['tab']['title'].keys():
+                if tab_keys == 'welcome': continue
+                window.FindElement(shot['tab']['title'][str(tab_keys)]).Update(disabled=True)
 
+            # Empty welcome tab info bars (file and username strings)
+            window['welcome_tab_file_loaded_infobar'].update(shot['msg_no_file_loaded'])
+            window['welcome_tab_file_loaded_ok'].update(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            window['welcome_tab_username_infokey'].update(' ' * (len(shot['msg_user']) + 3 )) # blank space to write over
+            window['welcome_tab_username_infoval'].update(' ' * (len('shot[username] here'))) # blank space to write over
 
-# FOR STATUS MESSAGE SEE THIS: Updating elements in active window
-# https://pysimplegui.readthedocs.io/en/latest/#updating-elements-changing-elements-values-in-an-active-window
+            # Set <empty> window title string
+            gui_window_title = 'Simple Hospital Outbreak Tracker'
 
 
-# FOR ini filer (se eksempelvis shot.ini)
-# https://docs.python.org/3/library/configparser.html
+        else:
+            for tab_keys in shot['tab']['title'].keys():
+                if tab_keys == 'welcome': continue
+                # TODO check if num cases >2 for graphical plots (otherwise, it's a chore)
+                # If there is 0-1 data record(s), show/activate linelist
+                window.FindElement(shot['tab']['title'][str(tab_keys)]).Update(disabled=False)
 
+            # Set window title string
+            gui_window_title = f'{Path(outbreak_filename).name} - Simple Hospital Outbreak Tracker'
 
-# TODO if __name__ == '__main__' all of the runtime stuff
 
-# TODO rewrite event conditionals to use this format:
-#  if sect in ('OPTIONS', 'RECENT'):
+        # Set window title
+        # TODO think this is tkinter only
+        if gui_window_title != gui_window_title_set:
+            window.TKroot.title(gui_window_title) # Might give errors on non-tkinter
+            gui_window_title_set = gui_window_title
 
+        # Poll while the writer thread is saving, otherwise wait for the user
+        event, values = window.read(timeout=200 if save_pending() else None)
+        #print(event, values) # use for debugging (remove when finished)
 
-while True:             # Event Loop
-    if outbreak_filename is None:
-        for tab_keys in shot['tab']['title'].keys():
-            if tab_keys == 'welcome': continue
-            window.FindElement(shot['tab']['title'][str(tab_keys)]).Update(disabled=True)
-        
-        # Empty welcome tab info bars (file and username strings)
-        window['welcome_tab_file_loaded_infobar'].update(shot['msg_no_file_loaded'])
-        window['welcome_tab_file_loaded_ok'].update(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
-        window['welcome_tab_username_infokey'].update(' ' * (len(shot['msg_user']) + 3 )) # blank space to write over
-        window['welcome_tab_username_infoval'].update(' ' * (len('shot[username] here'))) # blank space to write over
-        
-        # Set <empty> window title string
-        gui_window_title = 'Simple Hospital Outbreak Tracker'
+        # Saves finish on the writer thread (see save_writer()), report them here
+        show_save_results(menu_status[0])
+        if event == sg.TIMEOUT_KEY:
+            continue
 
-                
-    else:
-        for tab_keys in shot['tab']['title'].keys():
-            if tab_keys == 'welcome': continue
-            # TODO check if num cases >2 for graphical plots (otherwise, it's a chore)
-            # If there is 0-1 data record(s), show/activate linelist
-            window.FindElement(shot['tab']['title'][str(tab_keys)]).Update(disabled=False)
+        print(f'event is:   {event}')
+        print(f'values are: {values}')
 
-        # Set window title string
-        gui_window_title = f'{Path(outbreak_filename).name} - Simple Hospital Outbreak Tracker'
-    
-    
-    # Set window title
-    # TODO think this is tkinter only
-    if gui_window_title != gui_window_title_set:
-        window.TKroot.title(gui_window_title) # Might give errors on non-tkinter
-        gui_window_title_set = gui_window_title
-    
-    event, values = window.read()
-    #print(event, values) # use for debugging (remove when finished)
-    
-    print(f'event is:   {event}')
-    print(f'values are: {values}')
-    
-    if event in (None, 'Exit', shot['file_exit']):
-        break
-    elif event in shot['settings_language']:
-        popup_language()
-    elif event in shot['settings_user_change']:
-        popup_uinput_single_string('username')
-    elif event in shot['settings_hospital_manage']:
-        try:
-            shot['conf_hosp']
-            shot['hospital']
-        except:
+        if event in (None, 'Exit', shot['file_exit']):
+            break
+        elif event in shot['settings_language']:
+            popup_language()
+        elif event in shot['settings_user_change']:
+            popup_uinput_single_string('username')
+        elif event in (shot['settings_encryption'],):
+            if AESGCM is None:
+                popup_some_error(shot['err_encryption_unavailable'])
+            else:
+                popup_encryption_password(new_password=True)
+        elif event in shot['settings_hospital_manage']:
+            try:
+                shot['conf_hosp']
+                shot['hospital']
+            except:
+                popup_select_hospital()
+            popup_show_hospital_info()            
+            if outbreak_filename is not None: update_overview_tab(window, values['OV_level']) # rooms may have changed
+        elif event in 'testing_stuff':
+            popup_select_hospital()
+        elif event in (shot['stats_compare'],):
+            compare_files = sg.popup_get_file(shot['stats_compare'], title=shot['stats_compare'], save_as=False, multiple_files=True, file_types=shot['outbreak_file_types'], no_window=True, keep_on_top=True)
+            if compare_files:
+                # With no_window=True we get the tuple of askopenfilenames(), with a window the files joined by ;
+                compare_files = compare_files.split(sep=';') if type(compare_files) is str else list(compare_files)
+                
+                def show_compare_progress(files_done, files_total):
+                    menu_status[0].Update(value=f"{shot['status_comparing']} {files_done}/{files_total}")
+                    window.refresh()
+                
+                popup_outbreak_comparison(*compare_outbreak_files(compare_files, progress=show_compare_progress))
+        elif event in (shot['stats_epicurve'], 'EPI_bucket', 'EPI_strata'):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                shot['tab']['show']['epicurve'] = True
+                window[shot['tab']['title']['epicurve']].update(visible=True)
+                window[shot['tab']['title']['epicurve']].select()
+                update_epicurve_tab(window, values['EPI_bucket'], values['EPI_strata'])
+        elif event in ('OV_level',):
+            if outbreak_filename is not None: update_overview_tab(window, values['OV_level'])
+        elif event in ('MAIN_tabs',):
+            if outbreak_filename is not None: update_selected_tab(window, values)
+        elif event in ('LIST_previous', 'LIST_next'):
+            if outbreak_filename is not None: linelist_page = update_linelist_tab(window, linelist_page + (1 if event == 'LIST_next' else -1))
+        elif event in (shot['stats_gchart'], 'GCHART_sample_type', 'GCHART_baseline'):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                window[shot['tab']['title']['g-chart']].select()
+                update_gchart_tab(window, values['GCHART_sample_type'], values['GCHART_baseline'])
+        elif event in (shot['stats_exposure'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            elif incubation_period() is None:
+                popup_some_error(shot['err_no_incubation'])
+            else:
+                popup_exposure(exposure_contacts())
+        elif event in (shot['stats_contacts'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                popup_contact_clusters()
+        elif event in (shot['stats_filtering'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            elif popup_filter():
+                if shot['tab']['show']['epicurve']: update_epicurve_tab(window, values['EPI_bucket'], values['EPI_strata'])
+                if shot['tab']['show']['g-chart']: update_gchart_tab(window, values['GCHART_sample_type'], values['GCHART_baseline'])
+                update_overview_tab(window, values['OV_level'])
+                selection = get_filter_selection()
+                if selection is None:
+                    menu_status[0].Update(value=shot['status_filter_off'])
+                else:
+                    menu_status[0].Update(value=f"{shot['status_filtered']} {int(selection.sum())}/{len(selection)} {shot['msg_filter_cases']}")
+                continue # keep the filter in the status bar
+        elif event in (shot['file_export_sheet'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                export_file = sg.popup_get_file(shot['file_export_sheet'], title=shot['file_export_sheet'], save_as=True, file_types=(('CSV', '*.csv'),), no_window=True, keep_on_top=True)
+                if type(export_file) is str and export_file != '':
+                    try:
+                        cases_exported = export_linelist_sheet(export_file, get_filter_selection())
+                    except OSError as export_error:
+                        popup_some_error(f"{shot['err_save_failed']} {export_file}: {export_error}")
+                    else:
+                        menu_status[0].Update(value=f"{shot['status_exported']} {Path(export_file).name} ({cases_exported})")
+                        continue # keep the export result in the status bar
+        elif event in (shot['icon_key_plot'], shot['icon_key_image'], shot['file_export_image'], shot['icon_key_print'], shot['file_print']):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            elif Figure is None:
+                popup_some_error(shot['err_matplotlib_missing'])
+            else:
+                chart, chart_options = selected_chart(values)
+                chart_title = shot['stats_gchart'] if chart == 'gchart' else shot['stats_epicurve']
+                if event in (shot['icon_key_plot'],):
+                    popup_chart_image(chart_title, get_chart_image(chart, chart_options))
+                elif event in (shot['icon_key_print'], shot['file_print']):
+                    menu_status[0].Update(value=get_status_line(s='Print', f=chart_title))
+                    window.refresh()
+                    try:
+                        print_chart_image(get_chart_image(chart, chart_options, 'pdf'))
+                    except (OSError, subprocess.CalledProcessError) as print_error:
+                        popup_some_error(f"{shot['err_print_failed']}: {print_error}")
+                    else:
+                        menu_status[0].Update(value=f"{shot['status_printed']} {chart_title}")
+                        continue # keep the print result in the status bar
+                else:
+                    image_file = sg.popup_get_file(shot['file_export_image'], title=shot['file_export_image'], save_as=True, file_types=(('PNG', '*.png'), ('SVG', '*.svg'), ('PDF', '*.pdf')), no_window=True, keep_on_top=True)
+                    if type(image_file) is str and image_file != '':
+                        image_format = Path(image_file).suffix.lower().lstrip('.')
+                        if image_format not in chart_image_formats:
+                            image_format = 'png'
+                            image_file = f"{image_file}.png"
+                        image = get_chart_image(chart, chart_options, image_format)
+                        try:
+                            atomic_write_file(image_file, lambda my_image_file: my_image_file.write(image))
+                        except OSError as export_error:
+                            popup_some_error(f"{shot['err_save_failed']} {image_file}: {export_error}")
+                        else:
+                            menu_status[0].Update(value=f"{shot['status_exported']} {Path(image_file).name}")
+                            continue # keep the export result in the status bar
+        elif event in shot['file_new'] or event in f"-{shot['icon_key_new']}-" or event in shot['icon_key_new']:
+            # try:
+                # if len(shot['hospital']) == 0: popup_some_error(shot['msg_hospital_no_hospitals'])
+            # except KeyError:
+                # popup_some_error(shot['msg_hospital_no_hospitals'])
+
+            # Select or create hospital
             popup_select_hospital()
-        popup_show_hospital_info()            
-    elif event in 'testing_stuff':
-        popup_select_hospital()
-    elif event in shot['stats_epicurve']:
-        shot['tab']['show']['epicurve'] = True # TODO live update
-    elif event in shot['icon_key_print'] or event in shot['file_print']:
-        print('Changing status_message')
-        window.Finalize()
-        status_message = 'Printing ..'
-    elif event in shot['file_new'] or event in f"-{shot['icon_key_new']}-" or event in shot['icon_key_new']:
-        # try:
-            # if len(shot['hospital']) == 0: popup_some_error(shot['msg_hospital_no_hospitals'])
-        # except KeyError:
-            # popup_some_error(shot['msg_hospital_no_hospitals'])
-        
-        # Select or create hospital
-        popup_select_hospital()
-        
-        #
-        # TODO create new file workflow
-
-        # debug setting:
-        outbreak_filename = None
-    
-    elif event in shot['file_close']:
-        # todo
-        popup_some_error('Will prompt user to save if changes were made, then re-set and file = None')
-        outbreak_filename = None
-        
-    elif event in shot['file_open'] or event in f"-{shot['icon_key_open']}-" or event in shot['icon_key_open']:
-        
-        if outbreak_filename is not None:
-            # TODO check if changes have been made to open file
-            # if so, prompt to save these to file
-            # if no changes, just close the file.
-            pass
-        
-        if popup_open_outbreak_file():
-            window['welcome_tab_file_loaded_infobar'].update(str(outbreak_filename))
-            window['welcome_tab_file_loaded_ok'].update(shot['msg_file_loaded_ok'])
-            window['welcome_tab_username_infokey'].update(shot['msg_user'])
-            window['welcome_tab_username_infoval'].update('shot[username] here')
-            
 
-    
-    # Required for status bar
-    window.Finalize()
-    
-    # Update status bar string
-    if status_message is None: status_message = event
-    if outbreak_filename is None:
-        menu_status[0].Update(value=get_status_line(s=event))
-    else:
-        menu_status[0].Update(value=get_status_line(s=event, f=outbreak_filename))
-    
+            #
+            # TODO create new file workflow
 
-window.close()
+            # debug setting:
+            outbreak_filename = None
+            shot['outbreak_password'] = None # a new outbreak is saved as plaintext until encryption is turned on (see Note on ENCRYPTION)
 
+        elif event in (shot['file_save'], shot['icon_key_save'], f"-{shot['icon_key_save']}-", shot['file_save_as']):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+                continue
+            save_file = outbreak_filename
+            if event == shot['file_save_as']:
+                save_file = sg.popup_get_file(shot['file_save_as'], title=shot['file_save_as'], save_as=True, multiple_files=False, file_types=shot['outbreak_file_types'], no_window=True, keep_on_top=True)
+                if type(save_file) is not str or save_file == '': continue # user clicked cancel
+            save_outbreak_file(save_file)
+            outbreak_filename = save_file # Save As continues in the new file
+            menu_status[0].Update(value=get_status_line(s='Saving', f=Path(save_file).name))
+            continue # status is updated when the writer thread is done
+
+        elif event in (shot['file_merge'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                base_file = sg.popup_get_file(shot['msg_merge_base'], title=shot['msg_merge_base'], save_as=False, multiple_files=False, file_types=shot['outbreak_file_types'], no_window=True, keep_on_top=True)
+                their_file = None
+                if type(base_file) is str and base_file != '':
+                    their_file = sg.popup_get_file(shot['msg_merge_other'], title=shot['msg_merge_other'], save_as=False, multiple_files=False, file_types=shot['outbreak_file_types'], no_window=True, keep_on_top=True)
+                if type(their_file) is str and their_file != '':
+                    merge_conflicts = merge_into_outbreak(base_file, their_file)
+                    if merge_conflicts is None:
+                        popup_some_error(shot['err_wrong_data_format'])
+                    else:
+                        if merge_conflicts: popup_merge_conflicts(merge_conflicts)
+                        if shot['tab']['show']['epicurve']: update_epicurve_tab(window, values['EPI_bucket'], values['EPI_strata'])
+                        if shot['tab']['show']['g-chart']: update_gchart_tab(window, values['GCHART_sample_type'], values['GCHART_baseline'])
+                        update_overview_tab(window, values['OV_level'])
+                        linelist_page = update_linelist_tab(window, linelist_page)
+                        menu_status[0].Update(value=f"{shot['status_merged']} {Path(their_file).name} ({len(merge_conflicts)} {shot['msg_conflicts']})")
+                        continue # keep the merge result in the status bar
+
+        elif event in (shot['file_import'],):
+            if outbreak_filename is None:
+                popup_some_error(f"{shot['msg_no_file_loaded']} {shot['msg_no_file_tip']}")
+            else:
+                import_file = sg.popup_get_file(shot['file_import'], title=shot['file_import'], save_as=False, multiple_files=False, file_types=(('CSV', '*.csv'), ('Text', '*.txt'), ('CSV (compressed)', '*.csv.gz *.csv.xz')), no_window=True, keep_on_top=True)
+                if type(import_file) is str and import_file != '':
+                    import_name = Path(import_file).name
 
+                    def show_import_progress(rows_read):
+                        menu_status[0].Update(value=get_status_line(s='Import', f=import_name, n=rows_read))
+                        window.refresh()
 
+                    import_result = import_from_csv(import_file, progress=show_import_progress)
+                    if import_result is None:
+                        popup_some_error(shot['err_import_no_columns'])
+                    else:
+                        rows_imported, rows_skipped, rows_bad_dates, rows_duplicate = import_result
+                        if rows_skipped > 0: popup_some_error(f"{rows_skipped} {shot['msg_import_skipped']}")
+                        if rows_bad_dates > 0: popup_some_error(f"{rows_bad_dates} {shot['msg_import_bad_dates']}")
+                        if rows_duplicate > 0: sg.popup(f"{rows_duplicate} {shot['msg_import_duplicates']}", title=shot['file_import'], keep_on_top=True)
+                        if shot['tab']['show']['epicurve']: update_epicurve_tab(window, values['EPI_bucket'], values['EPI_strata'])
+                        if shot['tab']['show']['g-chart']: update_gchart_tab(window, values['GCHART_sample_type'], values['GCHART_baseline'])
+                        update_overview_tab(window, values['OV_level'])
+                        linelist_page = update_linelist_tab(window, linelist_page)
+                        menu_status[0].Update(value=f"{shot['status_imported']} {import_name} ({rows_imported})")
+                        continue # keep the import result in the status bar
+
+        elif event in shot['file_close']:
+            # todo
+            popup_some_error('Will prompt user to save if changes were made, then re-set and file = None')
+            outbreak_filename = None
+
+        elif event in shot['file_open'] or event in f"-{shot['icon_key_open']}-" or event in shot['icon_key_open']:
+
+            if outbreak_filename is not None:
+                # TODO check if changes have been made to open file
+                # if so, prompt to save these to file
+                # if no changes, just close the file.
+                pass
 
+            if popup_open_outbreak_file():
+                if open_outbreak_file():
+                    window['welcome_tab_file_loaded_infobar'].update(str(outbreak_filename))
+                    window['welcome_tab_file_loaded_ok'].update(shot['msg_file_loaded_ok'])
+                    window['welcome_tab_username_infokey'].update(shot['msg_user'])
+                    window['welcome_tab_username_infoval'].update('shot[username] here')
+                    linelist_page = update_linelist_tab(window)
+                    update_selected_tab(window, values) # the others when selected
+                else:
+                    outbreak_filename = None # sane header but unreadable records
 
 
 
+        # Required for status bar
+        window.Finalize()
 
+        # Update status bar string
+        if status_message is None: status_message = event
+        if outbreak_filename is None:
+            menu_status[0].Update(value=get_status_line(s=event))
+        else:
+            menu_status[0].Update(value=get_status_line(s=event, f=outbreak_filename))
 
 
+    # Let the writer thread finish pending saves before we go
+    if save_pending(): shot['save_jobs'].join()
+    window.close()
 
 
+if __name__ == '__main__':
+    arguments = cli_arguments()
+    if arguments.report is None:
+        main()
+    else:
+        if arguments.password: set_encryption_password(getpass.getpass(f"{shot['msg_encryption_password']} "))
+        report_options = { 'bucket': arguments.bucket, 'strata': arguments.strata, 'baseline': arguments.baseline, 'image_format': arguments.format }
+        sys.exit(batch_report(arguments.report, arguments.output, report_options, arguments.processes))
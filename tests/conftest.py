@@ -0,0 +1,45 @@
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import shots
+
+
+@pytest.fixture
+def shot():
+    """
+    The shots.shot settings dict with an empty outbreak loaded, restored after the test
+    """
+    saved_shot = copy.copy(shots.shot)
+    saved_hospital = copy.copy(shots.hospital)
+    saved_filename = shots.outbreak_filename
+    shots.shot.update({ 'data': shots.linelist_from_rows([]), 'data_positions': None, 'mmap': None, 'index': None,
+                        'admin': {}, 'events': {}, 'tseries': {}, 'hospital': {}, 'filter': {} })
+    shots.reset_record_changes()
+    shots.records_replaced()
+    yield shots.shot
+    shots.close_outbreak_map()
+    shots.shot.clear()
+    shots.shot.update(saved_shot)
+    shots.hospital.clear()
+    shots.hospital.update(saved_hospital)
+    shots.outbreak_filename = saved_filename
+
+
+def data_row(**fields):
+    """
+    Returns an outbreak file row (list of str) of a case with fields (by name in shot['headers']['data'])
+    """
+    return ['data'] + [ fields.get(field, '') for field in shots.shot['headers']['data'][1:] ]
+
+
+def write_outbreak_lines(my_outbreak_file, lines):
+    """
+    Writes an outbreak file: the generic header, then lines (rows as lists of str, or raw lines as str)
+    """
+    lines = [shots.shot['headers']['generic']] + list(lines)
+    Path(my_outbreak_file).write_text(''.join( (line if type(line) is str else ';'.join(line)) + '\n' for line in lines ), encoding='utf-8')
@@ -0,0 +1,49 @@
+import shots
+
+
+settings = """[OPTIONS]
+user = nurse
+language = English
+hospital = Madeup
+
+[Madeup]
+name = Madeup
+legal = Madeup University Hospital
+created = 2020-05-01T10:00:00
+created-by = nurse
+updated = 2020-05-01T10:00:00
+updated-by = nurse
+version = 0.1
+buildings = MadeupBld
+departments = MadeupDep
+
+[MadeupBld]
+main = 101,102
+east = 101,201
+
+[MadeupDep]
+icu = 101,102
+surgery = 101,201
+"""
+
+
+def test_rooms_shared_by_buildings_are_counted_apart(shot, tmp_path):
+    (tmp_path / 'settings.ini').write_text(settings, encoding='utf-8')
+    shots.read_config_from(tmp_path / 'settings.ini')
+    assert shots.hospital_room_count(shots.hospital['Madeup']) == 4
+    assert sorted( room_id for room_id in shots.hospital['Madeup'] if room_id not in ('info', 'bld', 'dep') ) == ['Madeup_east_101', 'Madeup_east_201', 'Madeup_main_101', 'Madeup_main_102']
+    assert shots.hospital['Madeup']['Madeup_east_101']['dep'] == 'surgery'
+    
+    shot['hospital'] = shots.hospital['Madeup']
+    for fnr in '01', '02', '03':
+        shots.add_linelist_case({ 'fnr': fnr, 'sample_date': '2020-05-01', 'department': 'surgery', 'room': '101' })
+    shots.add_linelist_case({ 'fnr': '04', 'sample_date': '2020-05-01', 'department': 'icu', 'room': '102' })
+    
+    buildings = shots.attack_rates('building')
+    assert buildings.loc['Madeup', 'rooms'] == 4 and buildings.loc['Madeup', 'cases'] == 4
+    assert list(buildings.loc[['main', 'east'], 'cases']) == [1, 3]
+    assert list(buildings.loc[['main', 'east'], 'rooms_with_cases']) == [1, 1]
+    departments = shots.attack_rates('department')
+    assert list(departments.loc[['icu', 'surgery'], 'rooms']) == [2, 2]
+    assert list(departments.loc[['icu', 'surgery'], 'cases']) == [1, 3]
+    assert shots.get_room_heatmap()['cells'][('bld', 'east')]['cases'] == 3
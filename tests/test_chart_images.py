@@ -0,0 +1,47 @@
+import shots
+
+
+def count_renders(monkeypatch):
+    """
+    Replaces render_chart_image() by a stand-in that notes what it renders, returns the list of (chart, options) rendered.
+    The image cache starts empty.
+    """
+    rendered = []
+    shots.shot.pop('chart_images', None)
+    monkeypatch.setattr(shots, 'Figure', object) # as if matplotlib were installed, nothing is drawn
+    monkeypatch.setattr(shots, 'render_chart_image', lambda chart, options, image_format='png', size=None: rendered.append((chart, options)) or repr((chart, options)).encode())
+    return rendered
+
+
+def test_least_recently_used_chart_image_is_dropped(shot, monkeypatch):
+    rendered = count_renders(monkeypatch)
+    shot['chart_image_cache'] = 2
+    epicurve, gchart, weekly = ('epicurve', ('day', None)), ('gchart', (None, None)), ('epicurve', ('week', None))
+    
+    assert shots.get_chart_image(*epicurve) == repr(epicurve).encode()
+    shots.get_chart_image(*gchart)
+    shots.get_chart_image(*epicurve) # from the cache, and now the most recently used
+    assert rendered == [epicurve, gchart]
+    
+    shots.get_chart_image(*weekly) # one too many: the G-chart goes
+    assert len(shot['chart_images']) == 2
+    shots.get_chart_image(*epicurve)
+    assert rendered == [epicurve, gchart, weekly]
+    shots.get_chart_image(*gchart)
+    assert rendered == [epicurve, gchart, weekly, gchart]
+    assert [ image_key[:2] for image_key in shot['chart_images'] ] == [epicurve, gchart]
+
+
+def test_chart_image_is_rendered_again_when_the_outbreak_changes(shot, monkeypatch):
+    rendered = count_renders(monkeypatch)
+    epicurve = ('epicurve', ('day', None))
+    shots.get_chart_image(*epicurve)
+    shots.get_chart_image(*epicurve, image_format='svg')
+    shots.get_chart_image(*epicurve)
+    assert len(rendered) == 2
+    
+    shots.add_linelist_case({ 'sample_date': '2020-03-01', 'fnr': '01' })
+    shots.get_chart_image(*epicurve)
+    shot['filter'] = { 'department': ('ICU',) }
+    shots.get_chart_image(*epicurve)
+    assert len(rendered) == 4
@@ -0,0 +1,74 @@
+import pandas as pd
+
+import shots
+from conftest import data_row
+
+
+def two_building_hospital():
+    """
+    Returns a hospital where room 101 is in both buildings: ICU in Main, Surgery in East
+    """
+    return { 'info': { 'name': 'Madeup' }, 'bld': { 'Main': [101, 102], 'East': [101, 201] }, 'dep': { 'ICU': [101, 102], 'Surgery': [101, 201] } }
+
+
+def cases(*stays):
+    """
+    Returns linelist of cases (fnr, sample date, department, room)
+    """
+    return shots.linelist_from_rows([ data_row(fnr=fnr, sample_date=day, department=department, room=room)[1:] for fnr, day, department, room in stays ])
+
+
+def test_rooms_in_several_buildings_are_placed_by_department(shot):
+    shot['hospital'] = two_building_hospital()
+    linelist = cases(('01', '2020-05-01', 'ICU', '101'), ('02', '2020-05-01', 'Surgery', '101'), ('03', '2020-05-01', '', '101'),
+                     ('04', '2020-05-01', 'ICU', '102'), ('05', '2020-05-01', 'ICU', '999'))
+    assert list(shots.unique_room_ids(linelist)) == ['Madeup_Main_101', 'Madeup_East_101', '', 'Madeup_Main_102', 'Madeup__999']
+    
+    # the same room number in two buildings is no contact
+    graph = shots.build_contact_graph(linelist, margin_days=0)
+    assert len(graph['edges']) == 0
+
+
+def test_contact_graph_matches_every_pair_of_stays(shot):
+    shot['hospital'] = two_building_hospital()
+    rooms = (('ICU', '101'), ('Surgery', '101'), ('ICU', '102'), ('Surgery', '201'))
+    linelist = cases(*[ (f"{n % 9:02d}", f"2020-05-{1 + (n * 7) % 20:02d}", *rooms[n % 4]) for n in range(36) ])
+    graph = shots.build_contact_graph(linelist, margin_days=3)
+    
+    place_ids = shots.unique_room_ids(linelist)
+    stays = { }
+    for (key, case), place_id in zip(linelist.iterrows(), place_ids):
+        first, last = stays.get((case['fnr'], place_id), (case['sample_date'], case['sample_date']))
+        stays[(case['fnr'], place_id)] = (min(first, case['sample_date']), max(last, case['sample_date']))
+    expected = set()
+    for (a, place_a), (first_a, last_a) in stays.items():
+        for (b, place_b), (first_b, last_b) in stays.items():
+            if a < b and place_a == place_b and first_a - pd.Timedelta(days=3) <= last_b and first_b - pd.Timedelta(days=3) <= last_a:
+                expected.add((a, b))
+    people = graph['people']
+    assert expected and set(zip(people[graph['edges']['a']], people[graph['edges']['b']])) == expected
+
+
+def test_contact_clusters_view_finds_clusters_and_chains(shot, monkeypatch):
+    for fnr, day, room in ('01', '2020-05-01', '101'), ('02', '2020-05-01', '101'), ('02', '2020-05-03', '102'), ('03', '2020-05-03', '102'), ('04', '2020-05-09', '201'):
+        shots.add_linelist_case({ 'fnr': fnr, 'sample_date': day, 'room': room })
+    
+    events = [ ('CONTACT_chain', { 'CONTACT_from': '01', 'CONTACT_to': '03' }), ('CONTACT_chain', { 'CONTACT_from': '01', 'CONTACT_to': '04' }), (None, None) ]
+    class FakeWindow(dict):
+        def __init__(self, title, layout, **kwargs):
+            for row in layout:
+                for element in row:
+                    if element.Key is not None: self[element.Key] = element
+            windows.append(self)
+        def read(self):
+            return events.pop(0)
+        def close(self):
+            pass
+    windows = []
+    shown = []
+    monkeypatch.setattr(shots.sg, 'Window', FakeWindow)
+    monkeypatch.setattr(shots.sg.Text, 'update', lambda element, value=None, **kwargs: shown.append(value))
+    shots.popup_contact_clusters()
+    
+    assert windows[0]['CONTACT_clusters'].Values == [[1, 3, '01, 02, 03']]
+    assert shown == ['01 - 02 - 03', shot['msg_contacts_no_chain']]
@@ -0,0 +1,65 @@
+import numpy as np
+
+import shots
+from conftest import data_row
+
+
+def load_cases(cases):
+    """
+    Loads cases (list of dicts of fields) as the linelist of the empty outbreak, as opening an outbreak file does
+    """
+    shots.shot['data'] = shots.linelist_from_rows([ data_row(**fields)[1:] for fields in cases ])
+    shots.records_replaced()
+
+
+def binned_from_scratch(bucket, selection=None):
+    """
+    Returns bucket starts and counts (lists) of the loaded linelist, binned without the cube
+    """
+    bucket_starts, counts = shots.epicurve_bins(shots.get_linelist(), bucket, selection=selection)
+    return [list(bucket_starts), list(counts)]
+
+
+def test_live_cube_matches_binning_from_scratch(shot):
+    load_cases([
+        { 'sample_date': '2020-02-28', 'fnr': '01', 'department': 'ICU' },
+        { 'sample_date': '2020-03-02', 'fnr': '02', 'department': 'Surgery' },
+        { 'sample_date': '', 'fnr': '03', 'department': 'ICU' }, # no sample date (yet), not on the curve
+        { 'sample_date': '2020-03-16', 'fnr': '04' }
+        ])
+    for bucket in shots.epicurve_buckets:
+        assert [ list(values) for values in shots.epicurve_live_bins(bucket) ] == binned_from_scratch(bucket)
+    
+    # The cube is kept up to date case by case, so it must still match after edits
+    shots.edit_linelist_case(2, { 'sample_date': '2020-03-03' })
+    shots.edit_linelist_case(0, { 'sample_date': '' })
+    shots.remove_linelist_case(1)
+    shots.add_linelist_case({ 'sample_date': '2020-04-01', 'fnr': '05', 'department': 'ICU' })
+    shots.add_linelist_case({ 'sample_date': '', 'fnr': '06', 'department': 'ICU' })
+    for bucket in shots.epicurve_buckets:
+        assert [ list(values) for values in shots.epicurve_live_bins(bucket) ] == binned_from_scratch(bucket)
+    
+    bucket_starts, counts, strata_counts = shots.epicurve_cube_bins('week', strata='department')
+    assert list(counts) == [1, 0, 1, 0, 1]
+    assert { stratum: list(stratum_counts) for stratum, stratum_counts in strata_counts.items() } == { 'ICU': [1, 0, 0, 0, 1], '': [0, 0, 1, 0, 0] }
+    assert sum(strata_counts.values()).tolist() == list(counts)
+
+
+def test_filtered_epicurve_matches_binning_the_selected_cases(shot):
+    load_cases([ { 'sample_date': sample_date, 'fnr': f"{number:02}", 'department': department, 'gender': gender } for number, (sample_date, department, gender) in
+                 enumerate([('2020-03-02', 'ICU', 'F'), ('2020-03-02', 'ICU', 'M'), ('2020-03-09', 'Surgery', 'F'), ('2020-03-10', 'ICU', 'F'), ('', 'ICU', 'F')], 1) ])
+    shot['filter'] = { 'gender': ('F',) }
+    selection = shots.get_filter_selection()
+    assert selection.tolist() == (shots.get_linelist()['gender'] == 'F').tolist()
+    
+    for bucket in shots.epicurve_buckets:
+        bucket_starts, counts, strata_counts = shots.current_epicurve(bucket, 'department')
+        assert [list(bucket_starts), list(counts)] == binned_from_scratch(bucket, selection)
+        assert sum(strata_counts.values()).tolist() == list(counts)
+    bucket_starts, counts, strata_counts = shots.current_epicurve('day', 'department')
+    assert bucket_starts[0] == np.datetime64('2020-03-02') and list(counts) == [1, 0, 0, 0, 0, 0, 0, 1, 1]
+    assert list(strata_counts['Surgery']) == [0, 0, 0, 0, 0, 0, 0, 1, 0]
+    
+    # Without the filter the same cases come from the cube
+    shot['filter'] = {}
+    assert list(shots.current_epicurve('day')[1]) == [2, 0, 0, 0, 0, 0, 0, 1, 1]
@@ -0,0 +1,45 @@
+import itertools
+
+import pandas as pd
+
+import shots
+from conftest import data_row
+
+
+def test_exposure_contacts_match_every_stay_against_every_window(shot):
+    shot['admin'] = { 0: { 'incubation start': '2', 'incubation end': '4' } }
+    days = pd.date_range('2020-05-01', periods=12).strftime('%Y-%m-%d')
+    rows = [ data_row(fnr=f"{n % 7:02d}", sample_date=days[(n * 5) % 12], department=('ICU', 'Surgery')[n % 2], room=str(100 + n % 3))[1:] for n in range(40) ]
+    rows.append(data_row(fnr='99', department='ICU', room='100')[1:]) # no sample date, no window
+    linelist = shots.linelist_from_rows(rows)
+    
+    contacts = shots.exposure_contacts(linelist)
+    stays = shots.linelist_stays(linelist)
+    expected = set()
+    for (key, case), stay in itertools.product(linelist.iterrows(), stays.itertuples(index=False)):
+        if pd.isna(case['sample_date']): continue
+        if stay.start <= case['sample_date'] - pd.Timedelta(days=2) and stay.end >= case['sample_date'] - pd.Timedelta(days=4):
+            expected.add((key, stay.fnr, stay.department, stay.room))
+    assert set(zip(contacts['case'], contacts['contact'], contacts['department'], contacts['room'])) == expected
+    assert len(contacts) == len(expected)
+
+
+def test_exposure_view_lists_places_and_stays(shot, monkeypatch):
+    shot['admin'] = { 0: { 'incubation mid': '3' } }
+    for fnr, day, room in ('01', '2020-05-01', '101'), ('02', '2020-05-04', '101'), ('03', '2020-05-04', '102'):
+        shots.add_linelist_case({ 'fnr': fnr, 'sample_date': day, 'department': 'ICU', 'room': room })
+    
+    shown = []
+    class FakeWindow:
+        def __init__(self, title, layout, **kwargs):
+            shown.append(layout)
+        def read(self):
+            return None, None
+        def close(self):
+            pass
+    monkeypatch.setattr(shots.sg, 'Window', FakeWindow)
+    shots.popup_exposure(shots.exposure_contacts())
+    
+    places, stays = shown[0][0][0].Values, shown[0][1][0].Values
+    assert places == [['ICU', '101', 2]] # 02 and 03 were exposed on 2020-05-01, when 01 was sampled there
+    assert stays == [ [fnr, '2020-05-01 - 2020-05-01', '01', 'ICU', '101', '2020-05-01 - 2020-05-01'] for fnr in ('02', '03') ]
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import shots
+from conftest import data_row
+
+
+def load_random_cases(number_of_cases, seed=1):
+    """
+    Loads number_of_cases made-up cases as the linelist, returns them as a plain DataFrame of strings (one column per field)
+    """
+    rng = np.random.default_rng(seed)
+    cases = pd.DataFrame({
+                          'sample_date': [ '' if day < 0 else str(np.datetime64('2020-05-01') + day) for day in rng.integers(-5, 60, number_of_cases) ],
+                          'fnr': [ f"{n:011d}" for n in range(number_of_cases) ],
+                          'lastname': rng.choice(['Hansen', 'Olsen', ' Berg ', ''], number_of_cases),
+                          'age': [ '' if age < 0 else str(age) for age in rng.integers(-10, 100, number_of_cases) ],
+                          'gender': rng.choice(['F', 'M', ''], number_of_cases),
+                          'department': rng.choice(['ICU', 'Surgery', 'Medicine', ''], number_of_cases),
+                          'room': rng.choice(['101', '102', '201', ' 202', ''], number_of_cases),
+                          'risks': rng.choice(['Catheter', 'catheter, dialysis', 'Dialysis', ''], number_of_cases)
+                          })
+    shots.shot['data'] = shots.linelist_from_rows([ data_row(**case)[1:] for case in cases.to_dict('records') ])
+    shots.records_replaced()
+    return cases
+
+
+def pandas_mask(cases, filter_spec):
+    """
+    Returns the cases (plain DataFrame of strings) that filter_spec keeps, as a pandas mask (bool Series), see Note on FILTERING
+    """
+    mask = pd.Series(True, index=cases.index)
+    for field, condition in filter_spec.items():
+        if field in shots.filter_date_fields or field in shots.filter_range_fields:
+            values = pd.to_datetime(cases[field], errors='coerce') if field in shots.filter_date_fields else pd.to_numeric(cases[field], errors='coerce')
+            bounds = [ None if bound in (None, '') else (pd.Timestamp(bound) if field in shots.filter_date_fields else bound) for bound in condition ]
+            if bounds[0] is not None: mask &= values >= bounds[0]
+            if bounds[1] is not None: mask &= values <= bounds[1]
+        elif field in shots.filter_word_fields:
+            mask &= pd.concat([ cases[field].str.casefold().str.contains(word.casefold(), regex=False) for word in condition ], axis=1).any(axis=1)
+        else:
+            mask &= cases[field].str.strip().isin(condition)
+    return mask
+
+
+def test_filter_selection_matches_a_pandas_mask(shot):
+    cases = load_random_cases(500)
+    for filter_spec in [
+            { 'department': ('ICU',) },
+            { 'department': ('ICU', 'Surgery'), 'gender': ('F',) },
+            { 'department': ('',) }, # cases without a department
+            { 'room': ('202', 'no such room') },
+            { 'lastname': ('Berg',) }, # not a category field
+            { 'risks': ('DIALYSIS',) },
+            { 'sample_date': ('2020-05-10', '2020-06-01'), 'age': (18, 67) },
+            { 'sample_date': (None, '2020-05-15'), 'age': ('', 40), 'risks': ('catheter', 'dialysis'), 'room': ('101', '') }
+            ]:
+        shot['filter'] = filter_spec
+        assert shots.get_filter_selection().tolist() == pandas_mask(cases, filter_spec).tolist(), filter_spec
+
+
+def test_filter_bitmaps_follow_the_changed_linelist(shot):
+    cases = load_random_cases(50)
+    shot['filter'] = { 'department': ('Pediatrics', 'ICU') }
+    assert shots.get_filter_selection().tolist() == pandas_mask(cases, shot['filter']).tolist()
+    
+    # A new category and a removed case must both show, not the bitmaps of the linelist before
+    shots.edit_linelist_case(0, { 'department': 'Pediatrics' })
+    shots.remove_linelist_case(1)
+    cases.loc[0, 'department'] = 'Pediatrics'
+    cases = cases.drop(index=1)
+    linelist = shots.get_linelist()
+    assert shots.get_filter_selection().tolist() == pandas_mask(cases.loc[linelist.index], shot['filter']).tolist()
+    assert shots.get_filter_bitmap(linelist, 'department', 'Pediatrics').tolist() == (linelist.index == 0).tolist()
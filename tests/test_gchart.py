@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+import shots
+from conftest import data_row
+
+
+def geometric_limits(g_bar):
+    """
+    Returns LCL and UCL (float) of g_bar, worked out by hand from the geometric distribution
+    """
+    q = 1 - 1 / (g_bar + 1)
+    return max(math.log(1 - shots.gchart_alpha) / math.log(q) - 1, 0), math.log(shots.gchart_alpha) / math.log(q) - 1
+
+
+def test_limits_without_a_baseline_use_the_mean_of_all_gaps():
+    g_bar, lcl, ucl = shots.gchart_limits([0, 3, 6])
+    assert g_bar.tolist() == [3.0, 3.0, 3.0]
+    assert lcl.tolist() == pytest.approx([geometric_limits(3)[0]] * 3)
+    assert ucl.tolist() == pytest.approx([geometric_limits(3)[1]] * 3)
+    assert ucl[0] == pytest.approx(21.97, abs=0.005)
+    
+    assert [ limits.tolist() for limits in shots.gchart_limits([]) ] == [[], [], []]
+
+
+def test_limits_with_a_baseline_use_the_preceding_gaps_only():
+    g_bar, lcl, ucl = shots.gchart_limits([4, 0, 2, 10, 8], baseline=2)
+    assert np.isnan(g_bar[0]) and np.isnan(lcl[0]) and np.isnan(ucl[0]) # nothing to judge the first gap against
+    assert g_bar[1:].tolist() == [4.0, 2.0, 1.0, 6.0]
+    assert lcl[1:].tolist() == pytest.approx([ geometric_limits(mean)[0] for mean in (4, 2, 1, 6) ])
+    assert ucl[1:].tolist() == pytest.approx([ geometric_limits(mean)[1] for mean in (4, 2, 1, 6) ])
+    
+    # Every case on the same day: g-bar 0, and so are the limits
+    g_bar, lcl, ucl = shots.gchart_limits([0, 0, 5], baseline=5)
+    assert g_bar[1:].tolist() == [0.0, 0.0] and lcl[1:].tolist() == ucl[1:].tolist() == [0.0, 0.0]
+
+
+def test_gaps_of_the_loaded_cases_follow_sample_type_and_filter(shot):
+    shot['data'] = shots.linelist_from_rows([ data_row(sample_date=sample_date, fnr=f"0{number}", sample_type=sample_type, department=department)[1:]
+                                              for number, (sample_date, sample_type, department) in enumerate([
+                                                  ('2020-03-10', 'Faeces', 'ICU'), ('2020-03-01', 'Faeces', 'ICU'), ('2020-03-01', 'Blood', 'ICU'),
+                                                  ('', 'Faeces', 'ICU'), ('2020-03-04', 'Faeces', 'Surgery'), ('2020-03-04', 'Faeces', 'ICU')], 1) ])
+    shots.records_replaced()
+    days, gaps = shots.get_gchart_gaps()
+    assert days.astype(str).tolist() == ['2020-03-01', '2020-03-01', '2020-03-04', '2020-03-04', '2020-03-10'] # no blank dates
+    assert gaps.tolist() == [0, 3, 0, 6]
+    assert shots.get_gchart_gaps('Faeces')[1].tolist() == [3, 0, 6]
+    
+    shot['filter'] = { 'department': ('ICU',) }
+    assert shots.get_gchart_gaps('Faeces')[1].tolist() == [3, 6]
+    days, gaps, g_bar, lcl, ucl = shots.current_gchart('Faeces', baseline=1)
+    assert g_bar[1:].tolist() == [3.0] and ucl[1] == pytest.approx(geometric_limits(3)[1])
+    
+    shots.edit_linelist_case(3, { 'sample_date': '2020-03-05' }) # a new gap, not the cached gaps
+    assert shots.get_gchart_gaps('Faeces')[1].tolist() == [3, 1, 5]
@@ -0,0 +1,66 @@
+import shots
+
+
+def hospital_with_rooms():
+    """
+    Returns a hospital with rooms 101 and 102 (ICU) in Main, and 201 (Surgery) in East
+    """
+    hospital_info = { 'info': { 'name': 'Madeup' }, 'bld': { 'Main': [101, 102], 'East': [201] }, 'dep': { 'ICU': [101, 102], 'Surgery': [201] } }
+    for building, department, room in ('Main', 'ICU', 101), ('Main', 'ICU', 102), ('East', 'Surgery', 201):
+        hospital_info[f"Madeup_{building}_{room}"] = { 'status': None, 'bld': building, 'dep': department }
+    return hospital_info
+
+
+def rebuilt_cells():
+    """
+    Returns the heatmap cells of the configured hospital and loaded linelist, counted from scratch
+    """
+    return shots.build_room_heatmap(shots.shot['hospital'], shots.room_id_case_counts(shots.get_linelist()))['cells']
+
+
+def test_heatmap_follows_cases_and_room_status(shot):
+    shot['hospital'] = hospital_with_rooms()
+    for fnr, room in ('01', '101'), ('02', '101'), ('03', '201'):
+        shots.add_linelist_case({ 'fnr': fnr, 'sample_date': '2020-05-01', 'room': room })
+    
+    heatmap = shots.get_room_heatmap()
+    assert heatmap['cells'] == rebuilt_cells()
+    assert heatmap['cells'][('bld', 'Main')] == { 'rooms': 2, 'rooms_with_status': 0, 'rooms_with_cases': 1, 'contaminated': 1, 'cases': 2 }
+    
+    shots.set_room_status('Madeup_Main_102', 'contaminated')
+    shots.add_linelist_case({ 'fnr': '04', 'sample_date': '2020-05-02', 'room': '201' })
+    assert shots.get_room_heatmap() is heatmap # updated, not rebuilt
+    assert heatmap['cells'] == rebuilt_cells()
+    assert heatmap['contaminated'] == { 'Madeup_Main_101', 'Madeup_Main_102', 'Madeup_East_201' }
+    assert heatmap['cells'][('dep', 'ICU')]['rooms_with_status'] == 1
+    assert heatmap['cells'][('hospital', '')]['cases'] == 4
+
+
+def test_room_status_is_stored_as_a_code_and_shown_in_the_gui_language(shot, monkeypatch):
+    hospital_info = hospital_with_rooms()
+    shown = []
+    
+    class FakeWindow(dict):
+        def __init__(self, title, layout, **kwargs):
+            shown.append([ element for row in layout for element in row ])
+            for element in shown[-1]:
+                element.update = lambda **kwargs: None
+                self[element.Key] = element
+        def read(self):
+            return 'OK', { 'status_room': 'Madeup_Main_102', 'status_custom': False, 'custom_status': '', 'status_NONE': False,
+                           **{ f"status_{status}": status == 'atrisk' for status in shots.room_status_codes } }
+        def close(self):
+            pass
+    monkeypatch.setattr(shots.sg, 'Window', FakeWindow)
+    
+    room_id, status = shots.popup_room_status(hospital_info)
+    assert (room_id, status) == ('Madeup_Main_102', 'atrisk')
+    shots.set_room_status(room_id, status, hospital_info, shots.build_room_heatmap(hospital_info))
+    assert hospital_info['Madeup_Main_102']['status'] == 'atrisk'
+    
+    english = shots.room_status_label('atrisk')
+    shots.set_gui_strings('Norwegian')
+    assert shots.room_status_label('atrisk') == shot['msg_hospital_room_status_atrisk'] != english
+    assert shots.room_status_label('Vasket 12.05') == 'Vasket 12.05'
+    radio_texts = [ element.Text for element in shown[0] if element.Key == 'status_atrisk' ]
+    assert radio_texts == [english]
@@ -0,0 +1,76 @@
+import pandas as pd
+
+import shots
+from conftest import data_row
+
+
+def test_import_reads_norwegian_and_iso_dates_in_every_chunk(shot, tmp_path):
+    spreadsheet = tmp_path / 'lab_export.csv'
+    spreadsheet.write_text('P-Dato;Fødselsdato;SSN\n'
+                           '2020-02-01;;01\n'
+                           '01.02.2020;24.12.1950;02\n'
+                           '13.02.2020;;03\n'
+                           '25.02.2020;;04\n'
+                           'sometime;;05\n'
+                           ';;06\n', encoding='utf-8')
+    shot['import_chunk_rows'] = 2 # ISO and DD.MM.YYYY in one chunk, only DD.MM.YYYY in the next
+    
+    assert shots.import_from_csv(spreadsheet) == (4, 1, 1, 0)
+    linelist = shots.get_linelist().set_index('fnr')
+    assert list(linelist['sample_date'].dt.strftime('%Y-%m-%d')) == ['2020-02-01', '2020-02-01', '2020-02-13', '2020-02-25']
+    assert linelist.loc['02', 'DOB'] == pd.Timestamp('1950-12-24')
+
+
+def test_import_merges_several_duplicates_of_one_case(shot):
+    case = { 'sample_date': '2020-02-01', 'sample_type': 'nasal', 'fnr': '01012000001' }
+    key = shots.add_linelist_case({ **case, 'department': 'ICU' })
+    duplicates = shots.linelist_from_rows([ data_row(room='5', **case)[1:], data_row(room='6', team='A', **case)[1:] ])
+    
+    assert shots.add_linelist_cases(duplicates, 'merge') == ([], 2)
+    merged = shots.linelist_strings(shots.get_linelist())
+    assert len(merged) == 1
+    assert list(merged.loc[key, ['department', 'room', 'team']]) == ['ICU', '5', 'A']
+
+
+def test_added_cases_are_joined_once_and_edits_change_the_linelist_in_place(shot):
+    keys = [ shots.add_linelist_case({ 'sample_date': '2020-02-0' + str(day), 'fnr': '0' + str(day), 'room': '101' }) for day in range(1, 4) ]
+    assert keys == [0, 1, 2]
+    assert len(shot['data_appended']) == 3 and shots.count_linelist_cases() == 3
+    
+    linelist = shots.get_linelist()
+    assert shot['data_appended'] == [] and list(linelist.index) == keys
+    shots.edit_linelist_case(1, { 'room': '999', 'sample_type': 'saliva' })
+    assert shots.get_linelist() is linelist
+    assert list(linelist['room'].astype(str)) == ['101', '999', '101']
+    assert linelist.loc[1, 'sample_type'] == 'saliva' and isinstance(linelist['room'].dtype, pd.CategoricalDtype)
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-02', 'fnr': '02', 'sample_type': 'saliva' }) is None
+
+
+def test_import_reads_encrypted_spreadsheets_with_short_rows(shot, tmp_path):
+    spreadsheet = tmp_path / 'lab_export.csv.gz'
+    shots.set_encryption_password('correct horse')
+    with open(spreadsheet, 'wb') as spreadsheet_file, shots.outbreak_writer_stream(spreadsheet_file, spreadsheet, 'correct horse') as spreadsheet_text:
+        spreadsheet_text.write('SSN,P-Dato,Avdeling,Kommentar\n'
+                               '01,2020-02-01,ICU,first\n'
+                               '02,2020-02-02\n'
+                               '03,2020-02-03,Surgery,\n')
+    shot['import_chunk_rows'] = 2
+    
+    assert shots.import_from_csv(spreadsheet) == (3, 0, 0, 0)
+    linelist = shots.linelist_strings(shots.get_linelist())
+    assert list(linelist['fnr']) == ['01', '02', '03']
+    assert list(linelist['department']) == ['ICU', '', 'Surgery']
+
+
+def test_import_merges_duplicates_within_one_batch(shot):
+    case = { 'sample_date': '2020-02-01', 'sample_type': 'nasal', 'fnr': '01012000001' }
+    other = { 'sample_date': '2020-02-02', 'fnr': '01012000002', 'room': '7' }
+    new_cases = shots.linelist_from_rows([ data_row(department='ICU', **case)[1:], data_row(**other)[1:],
+                                           data_row(department='Surgery', room='5', **case)[1:], data_row(team='A', **case)[1:] ])
+    
+    new_keys, duplicates_found = shots.add_linelist_cases(new_cases, 'merge')
+    assert (len(new_keys), duplicates_found) == (2, 2)
+    merged = shots.linelist_strings(shots.get_linelist())
+    assert list(merged['fnr']) == ['01012000001', '01012000002']
+    assert list(merged.loc[new_keys[0], ['department', 'room', 'team']]) == ['ICU', '5', 'A']
+    assert merged.loc[new_keys[1], 'room'] == '7'
@@ -0,0 +1,76 @@
+import shots
+from conftest import data_row, write_outbreak_lines
+
+
+def open_outbreak(my_outbreak_file):
+    """
+    Opens my_outbreak_file as the GUI does, returns the fnr of its cases (list of str) in record key order
+    """
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    return list(shots.get_linelist().sort_index()['fnr'])
+
+
+def save_changes_to_journal(my_outbreak_file):
+    """
+    Appends the unsaved changes to the journal of my_outbreak_file, as the writer thread does on a journal save
+    """
+    shots.append_outbreak_journal(my_outbreak_file, shots.journal_rows_from_changes())
+    shots.reset_record_changes()
+
+
+def test_journal_is_replayed_after_a_crash_before_compaction(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr=fnr) for fnr in ('01', '02', '03') ])
+    assert open_outbreak(my_outbreak_file) == ['01', '02', '03']
+    
+    shots.edit_linelist_case(0, { 'room': '101' })
+    shots.remove_linelist_case(1)
+    shots.add_linelist_case({ 'sample_date': '2020-02-02', 'fnr': '04' })
+    save_changes_to_journal(my_outbreak_file)
+    
+    # SHOT dies here: the outbreak file was never rewritten, the journal holds the changes
+    assert open_outbreak(my_outbreak_file) == ['01', '03', '04']
+    assert shots.get_linelist().loc[0, 'room'] == '101'
+    assert shot['journal_rows'] == 3
+
+
+def test_journal_of_another_file_version_is_ignored(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr='01') ])
+    open_outbreak(my_outbreak_file)
+    shots.add_linelist_case({ 'sample_date': '2020-02-02', 'fnr': '02' })
+    save_changes_to_journal(my_outbreak_file)
+    
+    # Compacted (or replaced by a copy) without the journal being removed, e.g. SHOT died in between
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr=fnr) for fnr in ('01', '05') ])
+    assert open_outbreak(my_outbreak_file) == ['01', '05']
+    assert shot['journal_rows'] == 0
+
+
+def test_corrupt_journal_rows_are_skipped(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr=fnr) for fnr in ('01', '02') ])
+    fingerprint = shots.outbreak_file_fingerprint(my_outbreak_file)
+    shots.journal_filename(my_outbreak_file).write_text('\n'.join([
+        f"journal;{fingerprint}",
+        ';'.join(['upsert', '2'] + data_row(sample_date='2020-02-03', fnr='03')),
+        'upsert;x;data;garbage',
+        'delete;0;no such rec_type',
+        '',
+        'upsert;9', # cut short
+        'delete;1;data',
+        'upsert;3;data;2020-02-04;' # cut short by a crash halfway through the row
+        ]), encoding='utf-8')
+    
+    assert open_outbreak(my_outbreak_file) == ['01', '03']
+    assert shot['journal_rows'] == 2
+
+
+def test_journal_with_a_broken_header_is_ignored(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr='01') ])
+    shots.journal_filename(my_outbreak_file).write_bytes(b'\x00\x00garbage;\n' + ';'.join(['delete', '0', 'data']).encode() + b'\n')
+    
+    assert open_outbreak(my_outbreak_file) == ['01']
+    assert shot['journal_rows'] == 0
@@ -0,0 +1,37 @@
+import pandas as pd
+
+import shots
+from conftest import data_row
+
+
+def test_linelist_columns_are_typed_and_written_back_as_read(shot):
+    rows = [ data_row(sample_date='2020-02-01', fnr='01012000001', DOB='1950-12-24', age='70', gender='F', room='101')[1:],
+             data_row(sample_date='', fnr='00012', age='', role='staff')[1:] ]
+    linelist = shots.linelist_from_rows(rows)
+    
+    assert linelist['sample_date'].dtype == 'datetime64[ns]' and pd.isna(linelist.loc[1, 'sample_date'])
+    assert str(linelist['age'].dtype) == 'Int16' and pd.isna(linelist.loc[1, 'age'])
+    assert isinstance(linelist['room'].dtype, pd.CategoricalDtype)
+    assert list(linelist['fnr']) == ['01012000001', '00012'] # kept as strings, with their leading zeroes
+    assert [ row[1:] for row in shots.linelist_to_rows(linelist) ] == rows
+
+
+def test_duplicate_index_follows_added_edited_and_removed_cases(shot):
+    first = shots.add_linelist_case({ 'sample_date': '2020-02-01', 'sample_type': 'Nasal ', 'fnr': ' 01012000001' })
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-01', 'sample_type': 'nasal', 'fnr': '01012000001' }) is None
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-02', 'sample_type': 'nasal', 'fnr': '01012000001' }) is not None
+    for no_fnr in range(2): # cases without fnr are never duplicates
+        assert shots.add_linelist_case({ 'sample_date': '2020-02-01', 'sample_type': 'nasal' }) is not None
+    
+    shots.edit_linelist_case(first, { 'sample_date': '2020-02-03' })
+    assert ('01012000001', '2020-02-01', 'nasal') not in shots.get_case_index()
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-01', 'sample_type': 'nasal', 'fnr': '01012000001' }) is not None
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-03', 'sample_type': 'nasal', 'fnr': '01012000001' }) is None
+    
+    shots.remove_linelist_case(first)
+    assert shots.add_linelist_case({ 'sample_date': '2020-02-03', 'sample_type': 'nasal', 'fnr': '01012000001' }) is not None
+    
+    # The index kept up to date is the index built from scratch
+    index_kept = dict(shots.get_case_index())
+    shots.linelist_changed(replaced=True)
+    assert shots.get_case_index() == index_kept
@@ -0,0 +1,28 @@
+import shots
+from conftest import data_row
+
+
+def outbreak_copy(*cases):
+    """
+    Returns records (dict like shot) of an outbreak copy with cases (rows from data_row())
+    """
+    return { 'admin': {}, 'events': {}, 'tseries': {}, 'data': shots.linelist_from_rows([ case[1:] for case in cases ]) }
+
+
+def test_merge_pairs_records_alike_by_content(shot):
+    imported = { 'author': 'nurse', 'tstamp': '2020-05-01 10:00', 'fnr': '01012000001', 'sample_date': '2020-05-01', 'sample_type': 'nasal' }
+    case_a = data_row(department='ICU', **imported)
+    case_b = data_row(department='Surgery', **imported)
+    case_b_moved = data_row(department='Surgery', room='12', ch_auth='doctor', ch_tstamp='2020-05-02 09:00', **imported)
+    
+    # we delete A, they move B: both changes apply, and nothing conflicts
+    merged, conflicts = shots.merge_outbreak_records(outbreak_copy(case_a, case_b), outbreak_copy(case_b), outbreak_copy(case_a, case_b_moved))
+    assert conflicts == []
+    assert shots.linelist_to_rows(merged['data']) == [case_b_moved]
+    
+    # we both change A differently, B is left alone
+    case_a_ours = data_row(department='ICU', room='1', ch_tstamp='2020-05-02 09:00', **imported)
+    case_a_theirs = data_row(department='ICU', room='2', ch_tstamp='2020-05-03 09:00', **imported)
+    merged, conflicts = shots.merge_outbreak_records(outbreak_copy(case_a, case_b), outbreak_copy(case_b, case_a_ours), outbreak_copy(case_a_theirs, case_b))
+    assert [ conflict['kept'] for conflict in conflicts ] == ['theirs']
+    assert shots.linelist_to_rows(merged['data']) == [case_b, case_a_theirs]
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import shots
+from conftest import data_row, write_outbreak_lines
+
+
+def test_batch_report_does_not_read_its_own_reports(shot, tmp_path):
+    write_outbreak_lines(tmp_path / 'noro.csv', [ data_row(sample_date=f"2020-02-0{n}", fnr=f"0101200000{n}") for n in (1, 2, 3) ])
+    
+    assert shots.batch_report(tmp_path, processes=1) == 0
+    assert (tmp_path / 'reports' / 'summary.csv').is_file()
+    assert (tmp_path / 'reports' / 'noro_table.csv').is_file()
+    
+    for run in 1, 2: # reports written next to the outbreak files
+        assert shots.batch_report(tmp_path, tmp_path, processes=1) == 0
+    assert len((tmp_path / 'summary.csv').read_text(encoding='utf-8').splitlines()) == 2 # header and noro.csv
+
+
+def test_report_command_reads_compressed_outbreak_files(shot, tmp_path):
+    outbreak_folder = tmp_path / 'outbreaks'
+    outbreak_folder.mkdir()
+    for outbreak_name, departments in ('noro.csv.gz', ['ICU', 'ICU', 'Surgery']), ('flu.csv.xz', ['Surgery']):
+        shot['data'] = shots.linelist_from_rows([ data_row(sample_date=f"2020-02-0{n}", fnr=f"0{n}", department=department)[1:] for n, department in enumerate(departments, 1) ])
+        shots.write_outbreak_file(outbreak_folder / outbreak_name)
+    assert (outbreak_folder / 'noro.csv.gz').read_bytes()[:2] == b'\x1f\x8b'
+    assert (outbreak_folder / 'flu.csv.xz').read_bytes()[:6] == b'\xfd7zXZ\x00'
+    
+    report_command = [sys.executable, str(Path(shots.__file__)), '--report', str(outbreak_folder), '--bucket', 'day', '--strata', 'department', '--processes', '1']
+    report_run = subprocess.run(report_command, cwd=tmp_path, capture_output=True, text=True, timeout=300)
+    assert report_run.returncode == 0, report_run.stdout + report_run.stderr
+    
+    report_folder = outbreak_folder / 'reports'
+    summary = pd.read_csv(report_folder / 'summary.csv', sep=';')
+    assert list(summary['title']) == ['flu.csv.xz', 'noro.csv.gz'] and list(summary['cases']) == [1, 3]
+    assert summary['ok'].all()
+    noro_table = pd.read_csv(report_folder / 'noro_table.csv', sep=';')
+    assert list(noro_table['ICU']) == [1, 1, 0] and list(noro_table['Surgery']) == [0, 0, 1]
+    if shots.Figure is not None:
+        assert (report_folder / 'flu_epicurve.png').read_bytes()[:4] == b'\x89PNG'
+        assert (report_folder / 'noro_gchart.png').is_file()
@@ -0,0 +1,73 @@
+import pytest
+
+import shots
+from conftest import data_row, write_outbreak_lines
+
+
+def test_failed_atomic_write_leaves_the_file_as_it_was(tmp_path):
+    my_file = tmp_path / 'outbreak.csv'
+    my_file.write_bytes(b'old contents\n')
+    
+    def write_halfway(temp_file):
+        temp_file.write(b'new con')
+        raise OSError('disk full')
+    with pytest.raises(OSError):
+        shots.atomic_write_file(my_file, write_halfway)
+    assert my_file.read_bytes() == b'old contents\n'
+    assert list(tmp_path.iterdir()) == [my_file] # no temporary file left behind
+
+
+def test_failed_full_write_leaves_the_outbreak_file_as_it_was(shot, tmp_path, monkeypatch):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr='01') ])
+    old_contents = my_outbreak_file.read_bytes()
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    shots.add_linelist_case({ 'sample_date': '2020-02-02', 'fnr': '02' })
+    
+    def outbreak_rows_failing(target, keys=None, records=None):
+        if target == 'events': raise ValueError('not writable')
+        return outbreak_rows(target, keys, records)
+    outbreak_rows = shots.outbreak_rows
+    monkeypatch.setattr(shots, 'outbreak_rows', outbreak_rows_failing)
+    with pytest.raises(ValueError):
+        shots.write_outbreak_snapshot(my_outbreak_file, shots.snapshot_outbreak_records())
+    assert my_outbreak_file.read_bytes() == old_contents
+
+
+class FakeStatusBar:
+    def Update(self, value):
+        self.value = value
+
+
+def test_save_error_on_the_writer_thread_is_shown(shot, tmp_path, monkeypatch):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr='01') ])
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    shots.add_linelist_case({ 'sample_date': '2020-02-02', 'fnr': '02' })
+    
+    errors = []
+    monkeypatch.setattr(shots, 'popup_some_error', errors.append)
+    def write_outbreak_snapshot_failing(my_file, records):
+        raise OSError('the share went away')
+    monkeypatch.setattr(shots, 'write_outbreak_snapshot', write_outbreak_snapshot_failing)
+    shot['save_mode'] = 'full'
+    shots.save_outbreak_file(my_outbreak_file)
+    shot['save_jobs'].join()
+    
+    status_bar = FakeStatusBar()
+    shots.show_save_results(status_bar)
+    assert len(errors) == 1 and 'the share went away' in errors[0] and str(my_outbreak_file) in errors[0]
+    assert status_bar.value == shot['status_ready']
+    assert shot['save_full_next'] # the next save writes everything again
+    
+    # The next save works, and says so
+    monkeypatch.undo()
+    shot['save_mode'] = 'journal'
+    shots.save_outbreak_file(my_outbreak_file)
+    shot['save_jobs'].join()
+    shots.show_save_results(status_bar)
+    assert status_bar.value == shots.get_status_line(s='Save', f=my_outbreak_file.name)
+    assert not shots.journal_filename(my_outbreak_file).is_file() # written in full
+    assert shots.read_outbreak_file(my_outbreak_file)['data']['fnr'].tolist() == ['01', '02']
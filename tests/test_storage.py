@@ -0,0 +1,169 @@
+import shots
+from conftest import data_row, write_outbreak_lines
+
+
+def test_lazy_open_skips_blank_and_unknown_lines(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    cases = [ data_row(sample_date=f"2020-02-0{n}", fnr=f"0101200000{n}") for n in (1, 2, 3) ]
+    write_outbreak_lines(my_outbreak_file, [cases[0], '', cases[1], 'junk;line;here', '', cases[2]])
+    
+    with open(my_outbreak_file, newline='', encoding='utf-8') as outbreak_file:
+        read_cases = shots.read_outbreak_records(outbreak_file)['data']
+    assert shots.open_outbreak_map(my_outbreak_file)
+    assert shots.count_linelist_cases() == 3
+    assert len(shots.get_linelist_rows(0, 10)) == 3
+    assert list(shots.get_linelist()['fnr']) == list(read_cases['fnr']) == ['01012000001', '01012000002', '01012000003']
+
+
+class FakeElement:
+    def update(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeWindow(dict):
+    def __missing__(self, key):
+        self[key] = FakeElement()
+        return self[key]
+
+
+def test_linelist_view_pages_without_decoding_all_cases(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr=f"{n:011d}") for n in range(120) ])
+    shot['lazy_open_bytes'] = 0
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    
+    shot['tab'] = { 'title': { tab: shot[f"tab_{tab}"] for tab in ('welcome', 'overview', 'g-chart', 'epicurve') }, 'show': { 'epicurve': False } }
+    window = FakeWindow()
+    assert shots.update_linelist_tab(window, 5) == 2 # the last page
+    shots.update_selected_tab(window, { 'MAIN_tabs': shot['tab_welcome'] })
+    assert shot['data'] is None # still on disk
+    assert len(window['LIST_table'].values) == 20
+    assert window['LIST_table'].values[0][shots.linelist_view_fields.index('fnr')] == f"{100:011d}"
+    assert window['LIST_position'].value == '101-120 / 120'
+
+
+def test_database_filter_is_looked_up_read_only(shot, tmp_path, monkeypatch):
+    my_outbreak_file = tmp_path / 'outbreak.sqlite'
+    shot['data'] = shots.linelist_from_rows([ data_row(sample_date=day, department=department, room=room, fnr=f"{n:011d}")[1:]
+                                              for n, (day, department, room) in enumerate([('2020-05-01', 'ICU', '101'), ('2020-05-03', 'ICU', '102'),
+                                                                                           ('', 'ICU', '101'), ('2020-05-04', 'Surgery', '101'),
+                                                                                           ('2020-06-01', 'ICU', '101')]) ])
+    shots.write_outbreak_database(my_outbreak_file, shots.snapshot_outbreak_records())
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    
+    lookups = []
+    query = shots.query_outbreak_database
+    monkeypatch.setattr(shots, 'query_outbreak_database', lambda *args, **kwargs: lookups.append(kwargs) or query(*args, **kwargs))
+    shot['filter'] = { 'department': ('ICU',), 'room': ('101', '102'), 'sample_date': ('2020-05-01', '2020-05-31') }
+    selection = shots.get_filter_selection()
+    assert lookups and list(selection) == list(shots.filter_selection(shots.get_linelist(), shot['filter'])) == [True, True, False, False, False]
+    
+    shot['filter'] = { 'gender': ('F',) } # not indexed, filtered in memory
+    shots.get_filter_selection()
+    assert len(lookups) == 1
+
+
+def test_open_keeps_the_hospital_unless_the_outbreak_names_one(shot, tmp_path):
+    configured = { 'name': 'Madeup hospital', 'bld': { 'Main': ['101'] }, 'dep': { 'ICU': ['101'] } }
+    other = { 'name': 'Other hospital', 'bld': { 'East': ['201'] }, 'dep': { 'Surgery': ['201'] } }
+    shots.hospital.update({ configured['name']: configured, other['name']: other })
+    shot['hospital'] = configured
+    case = data_row(sample_date='2020-02-01', fnr='01012000001', room='101')
+    
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [case])
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file()
+    assert shot['hospital'] is configured
+    
+    header = ['outbreak'] + [ { 'hospital': other['name'] }.get(field, '') for field in shot['headers']['outbreak'][1:] ]
+    write_outbreak_lines(my_outbreak_file, [header, case])
+    assert shots.open_outbreak_file()
+    assert shot['hospital'] is other
+
+
+def test_cache_is_hashed_while_reading_and_takes_a_new_mtime(shot, tmp_path, monkeypatch):
+    my_outbreak_file = tmp_path / 'outbreak.csv.gz'
+    shot['data'] = shots.linelist_from_rows([ data_row(sample_date='2020-02-01', fnr='01012000001')[1:] ])
+    shots.write_outbreak_file(my_outbreak_file)
+    file_hash = shots.outbreak_file_hash(my_outbreak_file)
+    
+    def outbreak_file_hash_once(my_file):
+        monkeypatch.setattr(shots, 'outbreak_file_hash', None) # a second hash would fail
+        return file_hash
+    monkeypatch.setattr(shots, 'outbreak_file_hash', None) # parsing hashes the file as it goes
+    assert list(shots.read_outbreak_file(my_outbreak_file)['data']['fnr']) == ['01012000001']
+    
+    file_stat = my_outbreak_file.stat()
+    new_times = (file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9)
+    shots.os.utime(my_outbreak_file, ns=new_times) # same contents, e.g. copied
+    monkeypatch.setattr(shots, 'outbreak_file_hash', outbreak_file_hash_once)
+    assert list(shots.read_outbreak_cache(my_outbreak_file)['data']['fnr']) == ['01012000001']
+    assert list(shots.read_outbreak_cache(my_outbreak_file)['data']['fnr']) == ['01012000001']
+
+
+def test_open_maps_cached_files_and_keeps_the_outbreak_if_the_next_file_fails(shot, tmp_path, monkeypatch):
+    errors = []
+    monkeypatch.setattr(shots, 'popup_some_error', errors.append)
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    write_outbreak_lines(my_outbreak_file, [ data_row(sample_date='2020-02-01', fnr='01012000001') ])
+    shots.outbreak_filename = str(my_outbreak_file)
+    assert shots.open_outbreak_file() # parsed, and cached
+    assert shots.cache_filename(my_outbreak_file).is_file()
+    
+    shot['lazy_open_bytes'] = 0
+    assert shots.open_outbreak_file()
+    assert shot['data'] is None and shot['mmap'] is not None # mapped all the same
+    
+    broken_file = tmp_path / 'broken.csv'
+    broken_file.write_bytes(b'\xff\xfe not an outbreak file\n')
+    shots.outbreak_filename = str(broken_file)
+    assert not shots.open_outbreak_file()
+    shot['lazy_open_bytes'] = 10**9
+    assert not shots.open_outbreak_file()
+    assert len(errors) == 2
+    assert list(shots.get_linelist()['fnr']) == ['01012000001']
+
+
+def test_encryption_belongs_to_the_open_outbreak(shot, tmp_path):
+    encrypted_file, plaintext_file = tmp_path / 'secret.csv', tmp_path / 'plain.csv'
+    write_outbreak_lines(plaintext_file, [ data_row(sample_date='2020-02-01', fnr='01012000001') ])
+    shots.set_outbreak_password('correct horse')
+    shots.write_outbreak_file(encrypted_file)
+    assert shots.outbreak_file_encrypted(encrypted_file)
+    
+    shots.outbreak_filename = str(plaintext_file)
+    assert shots.open_outbreak_file()
+    assert shot['outbreak_password'] is None
+    shots.write_outbreak_snapshot(plaintext_file, shots.snapshot_outbreak_records())
+    assert not shots.outbreak_file_encrypted(plaintext_file)
+    
+    shots.outbreak_filename = str(encrypted_file)
+    assert shots.open_outbreak_file() # the password is still known for reading
+    assert shot['outbreak_password'] == 'correct horse'
+
+
+def test_records_are_routed_by_rec_type_and_decoded_alike_from_the_record_index(shot, tmp_path):
+    my_outbreak_file = tmp_path / 'outbreak.csv'
+    header = ['outbreak'] + [ { 'title': 'Noro ward 5' }.get(field, '') for field in shot['headers']['outbreak'][1:] ]
+    event = ['event', 'anne', '2020-02-02', '', '', '2020-02-02', 'Ward closed', '"Closed; cleaned\nreopened 2020-02-05"']
+    tseries = ['time series', 'anne', '2020-02-02', '', '', 'isolation', '2020-02-01', '2020-02-04', '']
+    cases = [ data_row(sample_date=f"2020-02-0{n}", fnr=f"0{n}", age=str(40 + n), room='101') for n in (1, 2) ]
+    write_outbreak_lines(my_outbreak_file, [header, cases[0], ';'.join(event), 'bogus;row', ';'.join(tseries), cases[1]])
+    
+    with open(my_outbreak_file, newline='', encoding='utf-8') as outbreak_file:
+        records = shots.read_outbreak_records(outbreak_file)
+    assert records['skipped'] == 1
+    assert records['admin'][0]['title'] == 'Noro ward 5'
+    assert records['events'][0]['contents'] == 'Closed; cleaned\nreopened 2020-02-05'
+    assert records['tseries'][0]['start'] == '2020-02-01'
+    assert list(records['data']['fnr']) == ['01', '02'] and list(records['data']['age']) == [41, 42]
+    
+    # The record index keeps the event's line break inside its record, and decodes every record as the streaming reader does
+    assert shots.open_outbreak_map(my_outbreak_file)
+    assert list(shot['index']['rec_type']) == [ list(shot['rec_types']).index(rec_type) for rec_type in ('outbreak', 'data', 'event', 'time series', 'data') ]
+    assert (shot['admin'], shot['events'], shot['tseries']) == (records['admin'], records['events'], records['tseries'])
+    assert shots.get_linelist_rows(1, 2).equals(records['data'].iloc[1:2])
+    assert shots.get_linelist().equals(records['data'])
@@ -0,0 +1,33 @@
+import shots
+
+
+def test_tseries_dates_are_parsed_one_by_one(shot, capsys):
+    shot['tseries'] = {
+                      0: { 'title': 'closed', 'start': '2020-05-01', 'end': '2020-05-03' },
+                      1: { 'title': 'isolation', 'start': '02.05.2020', 'end': '04.05.2020' },
+                      2: { 'title': 'cleaning', 'start': '2020-05-06T08:00', 'end': 'N/A' },
+                      3: { 'title': 'typo', 'start': 'sometime', 'end': '2020-05-03' },
+                      4: { 'title': 'backwards', 'start': '2020-05-09', 'end': '2020-05-08' }
+                      }
+    shot['tseries_version'] += 1
+    
+    tseries_index = shots.get_tseries_index()
+    assert list(tseries_index['keys']) == [0, 1, 2]
+    assert list(tseries_index['start'].astype('datetime64[D]').astype(str)) == ['2020-05-01', '2020-05-02', '2020-05-06']
+    assert tseries_index['end'][1] == shots.tseries_day_number('2020-05-04')
+    assert tseries_index['end'][2] == shots.tseries_open_end
+    assert tseries_index['skipped'] == 2
+    assert 'skipped 2 time series records' in capsys.readouterr().out
+    assert shots.tseries_overlapping('2020-05-04', '2020-05-05') == [1]
+
+
+def test_tseries_index_follows_replaced_records(shot):
+    shot['tseries'] = { 0: { 'title': 'closed', 'start': '2020-05-01', 'end': '2020-05-03' } }
+    shots.records_replaced()
+    assert shots.tseries_overlapping('2020-05-02', '2020-05-02') == [0]
+    
+    # Another file opened: new records, and nothing else to tell them apart by
+    shot['tseries'] = { 0: { 'title': 'isolation', 'start': '2020-06-01', 'end': '2020-06-03' } }
+    shots.records_replaced()
+    assert shots.tseries_overlapping('2020-05-02', '2020-05-02') == []
+    assert shots.tseries_overlapping('2020-06-02', '2020-06-02') == [0]